@@ -0,0 +1,4 @@
+-- VerifAI D1 schema – record which detector model version scored a report
+-- Applies to: verifai-db (after 0001_init.sql)
+
+ALTER TABLE reports ADD COLUMN model_version TEXT;
@@ -1,5 +1,8 @@
 import { Env } from "./types";
 
+// D1 accepts at most 100 bound parameters per statement.
+const MAX_BOUND_PARAMETERS = 100;
+
 export interface JobRow {
   id: string;
   created_at: string;
@@ -17,6 +20,7 @@ export interface ReportRow {
   ai_likelihood: number | null;
   confidence: "high" | "medium" | "low" | null;
   verdict_text: string | null;
+  model_version: string | null;
   evidence_json: string;
   metadata_json: string;
   provenance_json: string;
@@ -58,23 +62,47 @@ export async function getJob(env: Env, jobId: string): Promise<JobRow | null> {
   return result ?? null;
 }
 
-export async function updateJobStatus(
+export async function getJobs(
+  env: Env,
+  jobIds: string[],
+): Promise<Map<string, JobRow>> {
+  const jobs = new Map<string, JobRow>();
+  for (let i = 0; i < jobIds.length; i += MAX_BOUND_PARAMETERS) {
+    const chunk = jobIds.slice(i, i + MAX_BOUND_PARAMETERS);
+    const placeholders = chunk.map(() => "?").join(", ");
+    const { results } = await env.DB.prepare(
+      `SELECT * FROM jobs WHERE id IN (${placeholders})`,
+    )
+      .bind(...chunk)
+      .all<JobRow>();
+    for (const job of results) {
+      jobs.set(job.id, job);
+    }
+  }
+  return jobs;
+}
+
+export function updateJobStatusStatement(
   env: Env,
   jobId: string,
   status: JobRow["status"],
   errorMessage?: string,
-): Promise<void> {
+): D1PreparedStatement {
   if (errorMessage !== undefined) {
-    await env.DB.prepare(
+    return env.DB.prepare(
       `UPDATE jobs SET status = ?, error_message = ? WHERE id = ?`,
-    )
-      .bind(status, errorMessage, jobId)
-      .run();
-  } else {
-    await env.DB.prepare(`UPDATE jobs SET status = ? WHERE id = ?`)
-      .bind(status, jobId)
-      .run();
+    ).bind(status, errorMessage, jobId);
   }
+  return env.DB.prepare(`UPDATE jobs SET status = ? WHERE id = ?`).bind(status, jobId);
+}
+
+export async function updateJobStatus(
+  env: Env,
+  jobId: string,
+  status: JobRow["status"],
+  errorMessage?: string,
+): Promise<void> {
+  await updateJobStatusStatement(env, jobId, status, errorMessage).run();
 }
 
 export async function updateJobHash(
@@ -99,24 +127,30 @@ export async function findJobByHash(
   return result ?? null;
 }
 
+export function createReportStatement(
+  env: Env,
+  report: Omit<ReportRow, "created_at">,
+): D1PreparedStatement {
+  return env.DB.prepare(
+    `INSERT INTO reports (job_id, ai_likelihood, confidence, verdict_text, model_version, evidence_json, metadata_json, provenance_json, limitations_json) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)`,
+  ).bind(
+    report.job_id,
+    report.ai_likelihood,
+    report.confidence,
+    report.verdict_text,
+    report.model_version,
+    report.evidence_json,
+    report.metadata_json,
+    report.provenance_json,
+    report.limitations_json,
+  );
+}
+
 export async function createReport(
   env: Env,
   report: Omit<ReportRow, "created_at">,
 ): Promise<void> {
-  await env.DB.prepare(
-    `INSERT INTO reports (job_id, ai_likelihood, confidence, verdict_text, evidence_json, metadata_json, provenance_json, limitations_json) VALUES (?, ?, ?, ?, ?, ?, ?, ?)`,
-  )
-    .bind(
-      report.job_id,
-      report.ai_likelihood,
-      report.confidence,
-      report.verdict_text,
-      report.evidence_json,
-      report.metadata_json,
-      report.provenance_json,
-      report.limitations_json,
-    )
-    .run();
+  await createReportStatement(env, report).run();
 }
 
 export async function getReportByJobId(
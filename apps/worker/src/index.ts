@@ -1,7 +1,11 @@
 import { Env } from "./types";
 import { handleToken, handleUpload, handleFinalize } from "./routes/upload";
 import { handleGetReport } from "./routes/report";
-import { handleInternalReport } from "./routes/internal";
+import {
+  handleInternalImage,
+  handleInternalReport,
+  handleInternalReportBatch,
+} from "./routes/internal";
 import { handleScheduled } from "./cron";
 
 // ---------------------------------------------------------------------------
@@ -76,11 +80,21 @@ async function handleRequest(request: Request, env: Env, ctx: ExecutionContext):
     return withCors(await handleGetReport(jobId, env));
   }
 
+  // GET /api/internal/image (signed URL, see signing.ts)
+  if (method === "GET" && pathname === "/api/internal/image") {
+    return withCors(await handleInternalImage(request, env));
+  }
+
   // POST /api/internal/report
   if (method === "POST" && pathname === "/api/internal/report") {
     return withCors(await handleInternalReport(request, env));
   }
 
+  // POST /api/internal/report/batch
+  if (method === "POST" && pathname === "/api/internal/report/batch") {
+    return withCors(await handleInternalReportBatch(request, env));
+  }
+
   // 404 – no matching route
   return withCors(
     new Response(JSON.stringify({ error: "Not found" }), {
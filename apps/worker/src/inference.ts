@@ -1,11 +1,26 @@
 import { Env } from "./types";
 import { updateJobStatus } from "./db";
-import { getObject } from "./r2";
+import { headObject } from "./r2";
+import { signImageUrl } from "./signing";
+
+// The inference service answers 503/429 with Retry-After when its pipeline
+// queue is full. We retry a few times, but never wait longer than
+// MAX_RETRY_DELAY_SECONDS per attempt so we stay within waitUntil limits.
+const MAX_DISPATCH_ATTEMPTS = 3;
+const MAX_RETRY_DELAY_SECONDS = 10;
+
+// Lifetime of the signed image URL handed to the inference service. It
+// has to outlast the job's time in the service's queue and any redelivery.
+const IMAGE_URL_TTL_SECONDS = 30 * 60;
 
 /**
  * Dispatch an analysis job directly to the inference service.
  * Called via ctx.waitUntil() so it runs in the background after
  * the finalize response has been sent to the client.
+ *
+ * The image itself is not sent: the service pulls it through a
+ * short-lived signed URL, reading the headers with a Range request
+ * first, so the Worker never buffers the object.
  */
 export async function dispatchAnalysis(
   env: Env,
@@ -13,32 +28,29 @@ export async function dispatchAnalysis(
   objectKey: string,
 ): Promise<void> {
   try {
-    const obj = await getObject(env, objectKey);
-    if (!obj) {
+    const head = await headObject(env, objectKey);
+    if (!head) {
       await updateJobStatus(env, jobId, "failed", "Image not found in storage");
       return;
     }
 
-    const imageBytes = await obj.arrayBuffer();
-
     const workerBaseUrl = env.WORKER_URL || "http://localhost:8787";
     const callbackUrl = `${workerBaseUrl}/api/internal/report`;
     const inferenceUrl = `${env.INFERENCE_SERVICE_URL || "http://localhost:8001"}/analyze`;
 
-    const response = await fetch(inferenceUrl, {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-        Authorization: `Bearer ${env.INFERENCE_SHARED_SECRET}`,
-      },
-      body: JSON.stringify({
-        job_id: jobId,
-        object_key: objectKey,
-        image_url: `data:application/octet-stream;base64,${arrayBufferToBase64(imageBytes)}`,
-        callback_url: callbackUrl,
-      }),
+    const headers = {
+      "Content-Type": "application/json",
+      Authorization: `Bearer ${env.INFERENCE_SHARED_SECRET}`,
+    };
+    const body = JSON.stringify({
+      job_id: jobId,
+      object_key: objectKey,
+      image_url: await signImageUrl(env, objectKey, IMAGE_URL_TTL_SECONDS),
+      callback_url: callbackUrl,
     });
 
+    const response = await postWithBackpressure(inferenceUrl, headers, body, jobId);
+
     if (!response.ok) {
       const errText = await response.text();
       console.error(`Inference service error for job ${jobId}: ${errText}`);
@@ -50,11 +62,38 @@ export async function dispatchAnalysis(
   }
 }
 
-function arrayBufferToBase64(buffer: ArrayBuffer): string {
-  const bytes = new Uint8Array(buffer);
-  let binary = "";
-  for (let i = 0; i < bytes.byteLength; i++) {
-    binary += String.fromCharCode(bytes[i]);
+/**
+ * POST a job to the inference service, honouring Retry-After when the
+ * service reports that its queue is full.
+ */
+async function postWithBackpressure(
+  url: string,
+  headers: Record<string, string>,
+  body: string,
+  jobId: string,
+): Promise<Response> {
+  for (let attempt = 1; ; attempt++) {
+    const response = await fetch(url, { method: "POST", headers, body });
+
+    if (!isBackpressure(response) || attempt >= MAX_DISPATCH_ATTEMPTS) {
+      return response;
+    }
+
+    const delay = retryAfterSeconds(response);
+    console.warn(
+      `Inference service busy for job ${jobId} (queue depth ${response.headers.get("X-Queue-Depth") ?? "?"}), retrying in ${delay}s`,
+    );
+    await response.body?.cancel();
+    await new Promise((resolve) => setTimeout(resolve, delay * 1000));
   }
-  return btoa(binary);
+}
+
+function isBackpressure(response: Response): boolean {
+  return response.status === 503 || response.status === 429;
+}
+
+function retryAfterSeconds(response: Response): number {
+  const header = parseInt(response.headers.get("Retry-After") || "", 10);
+  const seconds = Number.isFinite(header) && header > 0 ? header : 1;
+  return Math.min(seconds, MAX_RETRY_DELAY_SECONDS);
 }
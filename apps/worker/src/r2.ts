@@ -1,5 +1,8 @@
 import { Env } from "./types";
 
+// R2 deletes at most 1000 keys per call.
+const MAX_DELETE_KEYS = 1000;
+
 export async function putObject(
   env: Env,
   key: string,
@@ -18,6 +21,18 @@ export async function getObject(
   return await env.BUCKET.get(key);
 }
 
+/**
+ * Fetch an object, or only the part of it requested by a Range header
+ * (`bytes=a-b`, `bytes=a-` or `bytes=-n`).
+ */
+export async function getObjectRange(
+  env: Env,
+  key: string,
+  range: Headers,
+): Promise<R2ObjectBody | null> {
+  return (await env.BUCKET.get(key, { range })) as R2ObjectBody | null;
+}
+
 export async function headObject(
   env: Env,
   key: string,
@@ -28,3 +43,9 @@ export async function headObject(
 export async function deleteObject(env: Env, key: string): Promise<void> {
   await env.BUCKET.delete(key);
 }
+
+export async function deleteObjects(env: Env, keys: string[]): Promise<void> {
+  for (let i = 0; i < keys.length; i += MAX_DELETE_KEYS) {
+    await env.BUCKET.delete(keys.slice(i, i + MAX_DELETE_KEYS));
+  }
+}
@@ -1,6 +1,15 @@
 import { Env } from "../types";
-import { getJob, updateJobStatus, createReport } from "../db";
-import { deleteObject } from "../r2";
+import {
+  getJob,
+  getJobs,
+  createReportStatement,
+  updateJobStatusStatement,
+} from "../db";
+import { deleteObject, deleteObjects, getObjectRange } from "../r2";
+import { verifyImageSignature } from "../signing";
+
+// Most reports accepted by one bulk callback.
+const MAX_BATCH_REPORTS = 100;
 
 function json(data: unknown, status = 200): Response {
   return new Response(JSON.stringify(data), {
@@ -16,11 +25,15 @@ interface InternalReportBody {
   ai_likelihood?: number | null;
   confidence?: string | null;
   verdict_text?: string | null;
+  model_version?: string | null;
   evidence?: string[];
   provenance?: {
     c2pa_present: boolean;
     c2pa_valid: boolean | null;
     notes: string[];
+    claim_generator?: string | null;
+    signer?: string | null;
+    digital_source_type?: string | null;
   };
   metadata?: {
     has_exif: boolean;
@@ -29,18 +42,61 @@ interface InternalReportBody {
     width: number;
     height: number;
     format: string;
+    xmp_creator_tool?: string | null;
+    digital_source_type?: string | null;
+    generation_parameters?: string | null;
   };
   limitations?: string[];
 }
 
+interface InternalReportBatchBody {
+  reports?: InternalReportBody[];
+}
+
+interface BatchResult {
+  job_id: string;
+  ok: boolean;
+  error?: string;
+}
+
+function isAuthorized(request: Request, env: Env): boolean {
+  // Authenticate via shared secret
+  const authHeader = request.headers.get("Authorization") || "";
+  const token = authHeader.replace("Bearer ", "");
+  return Boolean(token) && token === env.INFERENCE_SHARED_SECRET;
+}
+
+/**
+ * D1 writes recording one report: the report row and the job status, or
+ * just the status for a failed job.
+ */
+function reportStatements(env: Env, body: InternalReportBody): D1PreparedStatement[] {
+  if (body.status === "failed") {
+    return [
+      updateJobStatusStatement(env, body.job_id, "failed", body.error || "Analysis failed"),
+    ];
+  }
+  return [
+    createReportStatement(env, {
+      job_id: body.job_id,
+      ai_likelihood: body.ai_likelihood ?? null,
+      confidence: (body.confidence as "high" | "medium" | "low") ?? null,
+      verdict_text: body.verdict_text ?? null,
+      model_version: body.model_version ?? null,
+      evidence_json: JSON.stringify(body.evidence ?? []),
+      metadata_json: JSON.stringify(body.metadata ?? {}),
+      provenance_json: JSON.stringify(body.provenance ?? {}),
+      limitations_json: JSON.stringify(body.limitations ?? []),
+    }),
+    updateJobStatusStatement(env, body.job_id, "done"),
+  ];
+}
+
 export async function handleInternalReport(
   request: Request,
   env: Env,
 ): Promise<Response> {
-  // Authenticate via shared secret
-  const authHeader = request.headers.get("Authorization") || "";
-  const token = authHeader.replace("Bearer ", "");
-  if (!token || token !== env.INFERENCE_SHARED_SECRET) {
+  if (!isAuthorized(request, env)) {
     return json({ error: "Unauthorized" }, 401);
   }
 
@@ -55,30 +111,121 @@ export async function handleInternalReport(
     return json({ error: "Job not found." }, 404);
   }
 
-  if (body.status === "failed") {
-    await updateJobStatus(env, body.job_id, "failed", body.error || "Analysis failed");
-    // Clean up the original image
-    await deleteObject(env, job.object_key);
-    return json({ ok: true });
-  }
-
-  // Write report to D1
-  await createReport(env, {
-    job_id: body.job_id,
-    ai_likelihood: body.ai_likelihood ?? null,
-    confidence: (body.confidence as "high" | "medium" | "low") ?? null,
-    verdict_text: body.verdict_text ?? null,
-    evidence_json: JSON.stringify(body.evidence ?? []),
-    metadata_json: JSON.stringify(body.metadata ?? {}),
-    provenance_json: JSON.stringify(body.provenance ?? {}),
-    limitations_json: JSON.stringify(body.limitations ?? []),
-  });
-
-  // Update job status to done
-  await updateJobStatus(env, body.job_id, "done");
+  // Write the report (if any) and the job status to D1 in one round-trip
+  await env.DB.batch(reportStatements(env, body));
 
   // Delete original image from R2
   await deleteObject(env, job.object_key);
 
   return json({ ok: true });
 }
+
+/**
+ * Bulk form of handleInternalReport: `{ reports: [...] }`, each entry a
+ * body that route accepts. All jobs are looked up in one query, every
+ * D1 write goes out as a single batch (one round-trip, one transaction)
+ * and the images are deleted from R2 in one call. Reports for jobs that
+ * are already finished are acknowledged without being written again, since
+ * the inference service delivers reports at least once.
+ */
+export async function handleInternalReportBatch(
+  request: Request,
+  env: Env,
+): Promise<Response> {
+  if (!isAuthorized(request, env)) {
+    return json({ error: "Unauthorized" }, 401);
+  }
+
+  const body = await request.json<InternalReportBatchBody>();
+  const reports = body.reports;
+  if (!Array.isArray(reports) || reports.length === 0) {
+    return json({ error: "Missing reports." }, 400);
+  }
+  if (reports.length > MAX_BATCH_REPORTS) {
+    return json({ error: `At most ${MAX_BATCH_REPORTS} reports per batch.` }, 413);
+  }
+
+  const jobs = await getJobs(
+    env,
+    reports.filter((report) => report.job_id).map((report) => report.job_id),
+  );
+
+  const statements: D1PreparedStatement[] = [];
+  const objectKeys: string[] = [];
+  const results: BatchResult[] = [];
+  const recorded = new Set<string>();
+
+  for (const report of reports) {
+    const job = report.job_id ? jobs.get(report.job_id) : undefined;
+    if (!job) {
+      results.push({ job_id: report.job_id ?? "", ok: false, error: "Job not found." });
+      continue;
+    }
+    if (recorded.has(job.id) || job.status === "done" || job.status === "failed") {
+      results.push({ job_id: job.id, ok: true });
+      continue;
+    }
+    recorded.add(job.id);
+    statements.push(...reportStatements(env, report));
+    objectKeys.push(job.object_key);
+    results.push({ job_id: job.id, ok: true });
+  }
+
+  if (statements.length > 0) {
+    await env.DB.batch(statements);
+  }
+  if (objectKeys.length > 0) {
+    await deleteObjects(env, objectKeys);
+  }
+
+  return json({ ok: true, results });
+}
+
+/**
+ * GET /api/internal/image?key=...&expires=...&sig=...
+ *
+ * Serves an uploaded image to the inference service through a URL signed
+ * by dispatchAnalysis. Range requests are honoured, so the service can
+ * read the image headers first and fetch the rest only when it needs it.
+ */
+export async function handleInternalImage(
+  request: Request,
+  env: Env,
+): Promise<Response> {
+  const params = new URL(request.url).searchParams;
+  const key = params.get("key") || "";
+  const valid = await verifyImageSignature(
+    env,
+    key,
+    params.get("expires") || "",
+    params.get("sig") || "",
+  );
+  if (!key || !valid) {
+    return json({ error: "Invalid or expired signature." }, 403);
+  }
+
+  const obj = await getObjectRange(env, key, request.headers);
+  if (!obj) {
+    return json({ error: "Image not found." }, 404);
+  }
+
+  const headers = new Headers();
+  obj.writeHttpMetadata(headers);
+  headers.set("ETag", obj.httpEtag);
+  headers.set("Accept-Ranges", "bytes");
+  headers.set("Cache-Control", "private, no-store");
+
+  if (!request.headers.has("Range") || !obj.range) {
+    headers.set("Content-Length", String(obj.size));
+    return new Response(obj.body, { status: 200, headers });
+  }
+
+  const range = obj.range as { offset?: number; length?: number; suffix?: number };
+  const offset = range.suffix !== undefined
+    ? Math.max(0, obj.size - range.suffix)
+    : range.offset ?? 0;
+  const length = range.length ?? obj.size - offset;
+  headers.set("Content-Range", `bytes ${offset}-${offset + length - 1}/${obj.size}`);
+  headers.set("Content-Length", String(length));
+  return new Response(obj.body, { status: 206, headers });
+}
@@ -40,6 +40,7 @@ export async function handleGetReport(
       ai_likelihood: null,
       confidence: null,
       verdict_text: null,
+      model_version: null,
       evidence: [],
       provenance: EMPTY_PROVENANCE,
       metadata: EMPTY_METADATA,
@@ -56,6 +57,7 @@ export async function handleGetReport(
       ai_likelihood: null,
       confidence: null,
       verdict_text: null,
+      model_version: null,
       evidence: [],
       provenance: EMPTY_PROVENANCE,
       metadata: EMPTY_METADATA,
@@ -77,6 +79,7 @@ export async function handleGetReport(
     ai_likelihood: report.ai_likelihood,
     confidence: report.confidence,
     verdict_text: report.verdict_text,
+    model_version: report.model_version ?? null,
     evidence: JSON.parse(report.evidence_json),
     provenance: JSON.parse(report.provenance_json),
     metadata: JSON.parse(report.metadata_json),
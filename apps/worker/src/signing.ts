@@ -0,0 +1,86 @@
+import { Env } from "./types";
+
+/**
+ * Short-lived signed URLs through which the inference service pulls
+ * uploaded images from this Worker (see handleInternalImage).
+ *
+ * The signature is an HMAC-SHA256 over the object key and the expiry
+ * time, keyed with INFERENCE_SHARED_SECRET, so a URL grants read access
+ * to one object until it expires and cannot be altered to reach another.
+ */
+
+const encoder = new TextEncoder();
+
+async function hmacKey(env: Env): Promise<CryptoKey> {
+  return await crypto.subtle.importKey(
+    "raw",
+    encoder.encode(env.INFERENCE_SHARED_SECRET),
+    { name: "HMAC", hash: "SHA-256" },
+    false,
+    ["sign", "verify"],
+  );
+}
+
+function signedMessage(objectKey: string, expires: number): Uint8Array {
+  return encoder.encode(`${objectKey}\n${expires}`);
+}
+
+function toHex(bytes: ArrayBuffer): string {
+  return [...new Uint8Array(bytes)].map((b) => b.toString(16).padStart(2, "0")).join("");
+}
+
+function fromHex(hex: string): Uint8Array | null {
+  if (!/^(?:[0-9a-f]{2})+$/.test(hex)) {
+    return null;
+  }
+  const bytes = new Uint8Array(hex.length / 2);
+  for (let i = 0; i < bytes.length; i++) {
+    bytes[i] = parseInt(hex.slice(i * 2, i * 2 + 2), 16);
+  }
+  return bytes;
+}
+
+/** URL serving `objectKey` to whoever holds it, for `ttlSeconds`. */
+export async function signImageUrl(
+  env: Env,
+  objectKey: string,
+  ttlSeconds: number,
+): Promise<string> {
+  const expires = Math.floor(Date.now() / 1000) + ttlSeconds;
+  const signature = await crypto.subtle.sign(
+    "HMAC",
+    await hmacKey(env),
+    signedMessage(objectKey, expires),
+  );
+  const workerBaseUrl = env.WORKER_URL || "http://localhost:8787";
+  const params = new URLSearchParams({
+    key: objectKey,
+    expires: String(expires),
+    sig: toHex(signature),
+  });
+  return `${workerBaseUrl}/api/internal/image?${params}`;
+}
+
+/** Whether a signed image URL's parameters are authentic and unexpired. */
+export async function verifyImageSignature(
+  env: Env,
+  objectKey: string,
+  expires: string,
+  sig: string,
+): Promise<boolean> {
+  const expiresAt = parseInt(expires, 10);
+  if (!Number.isFinite(expiresAt) || expiresAt < Date.now() / 1000) {
+    return false;
+  }
+  const signature = fromHex(sig);
+  if (!signature) {
+    return false;
+  }
+  // crypto.subtle.verify compares in constant time.
+  return await crypto.subtle.verify(
+    "HMAC",
+    await hmacKey(env),
+    signature,
+    signedMessage(objectKey, expiresAt),
+  );
+}
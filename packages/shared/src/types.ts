@@ -2,6 +2,9 @@ export interface Provenance {
   c2pa_present: boolean;
   c2pa_valid: boolean | null;
   notes: string[];
+  claim_generator?: string | null;
+  signer?: string | null;
+  digital_source_type?: string | null;
 }
 
 export interface ImageMetadata {
@@ -11,6 +14,9 @@ export interface ImageMetadata {
   width: number;
   height: number;
   format: string;
+  xmp_creator_tool?: string | null;
+  digital_source_type?: string | null;
+  generation_parameters?: string | null;
 }
 
 export type JobStatus = "pending" | "processing" | "done" | "failed";
@@ -22,6 +28,7 @@ export interface Report {
   ai_likelihood: number | null;
   confidence: ConfidenceTier | null;
   verdict_text: string | null;
+  model_version: string | null;
   evidence: string[];
   provenance: Provenance;
   metadata: ImageMetadata;
@@ -0,0 +1,519 @@
+"""Inference backends for the AI-image detector.
+
+Each backend wraps one way of running the HuggingFace classifier and
+exposes the same ``predict`` contract: a list of RGB images in, one
+AI-generated probability (0.0-1.0) per image out.
+
+* ``torch`` -- the eager PyTorch model from ``transformers``, by
+  default loaded from a memory-mapped safetensors copy of its weights.
+* ``onnx``  -- the same model exported to ONNX (optionally int8
+  dynamically quantized) and served through ``onnxruntime``.  The export
+  needs PyTorch once; serving only needs ``onnxruntime``.
+
+Several classifiers can be combined into an :class:`EnsembleBackend`,
+which prepares the model input once per distinct preprocessing config
+and runs the members' forward passes concurrently.
+
+Run ``python -m app.backends`` to convert or export (and quantize) the
+configured model ahead of time, e.g. during an image build.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from PIL import Image
+
+from app.config import settings
+
+logger = logging.getLogger("verifai.backends")
+
+
+def find_ai_index(labels: dict) -> int:
+    """Return the index of the class that means "AI-generated"."""
+    # The model has two classes: "human" (real) and "ai" (generated)
+    # Label mapping: 0 = "human", 1 = "ai" (for umm-maybe/AI-image-detector)
+    for idx, label in labels.items():
+        if "ai" in label.lower() or "artificial" in label.lower() or "fake" in label.lower():
+            return int(idx)
+
+    # Fallback: assume last class is "ai"
+    return len(labels) - 1
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """One classifier: HuggingFace model id, revision and ensemble weight."""
+
+    name: str
+    revision: str = "main"
+    weight: float = 1.0
+
+    def __str__(self) -> str:
+        weight = "" if self.weight == 1.0 else f"*{self.weight:g}"
+        return f"{self.name}@{self.revision}{weight}"
+
+
+def parse_model_specs(text: str) -> list[ModelSpec]:
+    """Parse comma-separated ``name[@revision][*weight]`` entries.
+
+    Raises ``ValueError`` on an empty list or a weight that is not a
+    positive finite number.
+    """
+    specs = []
+    for entry in text.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        entry, _, weight = entry.partition("*")
+        name, _, revision = entry.partition("@")
+        spec = ModelSpec(name.strip(), revision.strip() or "main", float(weight or 1.0))
+        if not spec.name or not math.isfinite(spec.weight) or spec.weight <= 0:
+            raise ValueError(f"Invalid model entry {entry!r}")
+        specs.append(spec)
+    if not specs:
+        raise ValueError("No models given")
+    return specs
+
+
+def configured_specs() -> list[ModelSpec]:
+    """The models to serve at startup: ``detector_ensemble`` or ``model_name``."""
+    if settings.detector_ensemble.strip():
+        return parse_model_specs(settings.detector_ensemble)
+    return [ModelSpec(settings.model_name, settings.model_revision)]
+
+
+class DetectorBackend:
+    """Common interface of every detector backend.
+
+    ``predict`` is the whole contract.  Backends that can split it into
+    ``preprocess`` (images to model input) and ``forward`` (model input
+    to probabilities) also set ``preprocess_key``: backends with equal
+    keys accept each other's ``preprocess`` output, which lets an
+    ensemble prepare it once.
+    """
+
+    name = "base"
+    ai_index: int
+    preprocess_key: str | None = None
+
+    def predict(self, images: list[Image.Image]) -> list[float]:
+        """Return the AI-generated probability for each image."""
+        raise NotImplementedError
+
+    def preprocess(self, images: list[Image.Image]) -> Any:
+        return images
+
+    def forward(self, inputs: Any) -> list[float]:
+        return self.predict(inputs)
+
+    def close(self) -> None:
+        """Release resources held by the backend (connections, threads)."""
+
+
+def _preprocess_key(processor: Any, framework: str) -> str | None:
+    try:
+        config = processor.to_json_string()
+    except Exception:  # noqa: BLE001 - processors without a serialisable config
+        return None
+    return f"{framework}:{config}" if isinstance(config, str) else None
+
+
+class TorchBackend(DetectorBackend):
+    """Eager PyTorch inference through ``transformers``."""
+
+    name = "torch"
+
+    def __init__(
+        self,
+        model_name: str,
+        revision: str,
+        cache_dir: str,
+        *,
+        mmap_weights: bool = False,
+    ) -> None:
+        from transformers import AutoFeatureExtractor, AutoModelForImageClassification
+
+        if mmap_weights:
+            path = ensure_safetensors_model(model_name, revision, cache_dir)
+            self._processor = AutoFeatureExtractor.from_pretrained(path)
+            self._model = load_mmap_model(path)
+        else:
+            self._processor = AutoFeatureExtractor.from_pretrained(
+                model_name,
+                revision=revision,
+                cache_dir=cache_dir,
+            )
+            self._model = AutoModelForImageClassification.from_pretrained(
+                model_name,
+                revision=revision,
+                cache_dir=cache_dir,
+            )
+        self._model.eval()
+        self.ai_index = find_ai_index(self._model.config.id2label)
+        self.preprocess_key = _preprocess_key(self._processor, "pt")
+
+    def predict(self, images: list[Image.Image]) -> list[float]:
+        return self.forward(self.preprocess(images))
+
+    def preprocess(self, images: list[Image.Image]) -> Any:
+        return self._processor(images=images, return_tensors="pt")
+
+    def forward(self, inputs: Any) -> list[float]:
+        import torch
+
+        with torch.inference_mode():
+            outputs = self._model(**inputs)
+            probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
+
+        return [float(p) for p in probs[:, self.ai_index].tolist()]
+
+
+class OnnxBackend(DetectorBackend):
+    """ONNX Runtime inference on CPU, optionally int8-quantized."""
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_name: str,
+        revision: str,
+        cache_dir: str,
+        *,
+        quantize: bool,
+        intra_op_threads: int = 0,
+    ) -> None:
+        import onnxruntime as ort
+        from transformers import AutoConfig, AutoFeatureExtractor
+
+        self._processor = AutoFeatureExtractor.from_pretrained(
+            model_name,
+            revision=revision,
+            cache_dir=cache_dir,
+        )
+        config = AutoConfig.from_pretrained(model_name, revision=revision, cache_dir=cache_dir)
+        self.ai_index = find_ai_index(config.id2label)
+
+        path = ensure_onnx_model(model_name, revision, cache_dir, quantize=quantize)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+        self._session = ort.InferenceSession(
+            path, sess_options=options, providers=["CPUExecutionProvider"],
+        )
+        self.preprocess_key = _preprocess_key(self._processor, "np")
+        logger.info("ONNX session ready (%s)", path)
+
+    def predict(self, images: list[Image.Image]) -> list[float]:
+        return self.forward(self.preprocess(images))
+
+    def preprocess(self, images: list[Image.Image]) -> Any:
+        import numpy as np
+
+        pixel_values = self._processor(images=images, return_tensors="np")["pixel_values"]
+        return pixel_values.astype(np.float32, copy=False)
+
+    def forward(self, inputs: Any) -> list[float]:
+        import numpy as np
+
+        (logits,) = self._session.run(["logits"], {"pixel_values": inputs})
+
+        # Numerically stable softmax over the class axis.
+        shifted = logits - logits.max(axis=-1, keepdims=True)
+        exp = np.exp(shifted)
+        probs = exp / exp.sum(axis=-1, keepdims=True)
+
+        return [float(p) for p in probs[:, self.ai_index]]
+
+
+class EnsembleBackend(DetectorBackend):
+    """Several classifiers scoring the same images, combined by weighted mean.
+
+    Members sharing a ``preprocess_key`` get the same prepared input, and
+    every member's forward pass runs on its own thread (PyTorch and ONNX
+    Runtime release the GIL), so an ensemble costs about as much wall
+    time as its slowest member.
+    """
+
+    name = "ensemble"
+
+    def __init__(self, members: list[tuple[DetectorBackend, float]]) -> None:
+        if not members:
+            raise ValueError("An ensemble needs at least one member")
+        self._members = members
+        self._total_weight = sum(weight for _, weight in members)
+        self._pool = ThreadPoolExecutor(max_workers=len(members), thread_name_prefix="ensemble")
+
+    def predict(self, images: list[Image.Image]) -> list[float]:
+        prepared: dict[object, Any] = {}
+        keys = []
+        for backend, _ in self._members:
+            key = backend.preprocess_key if backend.preprocess_key is not None else id(backend)
+            if key not in prepared:
+                prepared[key] = backend.preprocess(images)
+            keys.append(key)
+
+        futures = [
+            self._pool.submit(backend.forward, prepared[key])
+            for (backend, _), key in zip(self._members, keys)
+        ]
+        member_probs = [future.result() for future in futures]
+        return [
+            sum(weight * probs[i] for (_, weight), probs in zip(self._members, member_probs))
+            / self._total_weight
+            for i in range(len(images))
+        ]
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+        for backend, _ in self._members:
+            backend.close()
+
+
+# ---------------------------------------------------------------------------
+# Memory-mapped safetensors weights
+# ---------------------------------------------------------------------------
+
+SAFETENSORS_WEIGHTS = "model.safetensors"
+
+
+def safetensors_model_dir(model_name: str, revision: str, cache_dir: str) -> str:
+    """Where the safetensors copy of a model version is stored."""
+    safe_name = model_name.replace("/", "--")
+    return os.path.join(cache_dir, "safetensors", safe_name, revision)
+
+
+def ensure_safetensors_model(model_name: str, revision: str, cache_dir: str) -> str:
+    """Return the safetensors copy of a model version, converting it if needed.
+
+    The copy is a directory ``from_pretrained`` can load: the config, the
+    preprocessor config and a single unsharded ``model.safetensors``.
+    """
+    path = safetensors_model_dir(model_name, revision, cache_dir)
+    if not os.path.exists(os.path.join(path, SAFETENSORS_WEIGHTS)):
+        _export_safetensors(model_name, revision, cache_dir, path)
+    return path
+
+
+def _export_safetensors(model_name: str, revision: str, cache_dir: str, path: str) -> None:
+    """Save the HF classifier with its weights in one safetensors file."""
+    from transformers import AutoFeatureExtractor, AutoModelForImageClassification
+
+    logger.info("Converting %s@%s to safetensors...", model_name, revision)
+    model = AutoModelForImageClassification.from_pretrained(
+        model_name,
+        revision=revision,
+        cache_dir=cache_dir,
+    )
+    processor = AutoFeatureExtractor.from_pretrained(
+        model_name,
+        revision=revision,
+        cache_dir=cache_dir,
+    )
+
+    # Build next to the target and rename, so a replica starting
+    # concurrently never maps a half-written file.
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    model.save_pretrained(tmp_path, safe_serialization=True, max_shard_size="1000GB")
+    processor.save_pretrained(tmp_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        # Another process finished the same conversion first.
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not os.path.exists(os.path.join(path, SAFETENSORS_WEIGHTS)):
+            raise
+
+
+def load_mmap_model(path: str) -> Any:
+    """Load the classifier in ``path`` with weights backed by a file mapping.
+
+    The module tree is built on the ``meta`` device (no weight memory is
+    allocated), then its parameters are replaced by tensors viewing the
+    mapped ``model.safetensors``.  Nothing is copied: pages are read on
+    first use and stay shared with every other process mapping the file.
+    """
+    import torch
+    from safetensors import safe_open
+    from transformers import AutoConfig, AutoModelForImageClassification
+
+    config = AutoConfig.from_pretrained(path)
+    with torch.device("meta"):
+        model = AutoModelForImageClassification.from_config(config)
+
+    with safe_open(os.path.join(path, SAFETENSORS_WEIGHTS), framework="pt", device="cpu") as fh:
+        state = {key: fh.get_tensor(key) for key in fh.keys()}
+    model.load_state_dict(state, strict=False, assign=True)
+    model.tie_weights()
+
+    unloaded = [
+        name for name, tensor in [*model.named_parameters(), *model.named_buffers()]
+        if tensor.is_meta
+    ]
+    if unloaded:
+        # Weights the file does not hold, e.g. non-persistent buffers the
+        # architecture computes in __init__: fall back to a regular load.
+        logger.warning(
+            "%s has tensors not stored in its weights (%s); loading without mmap",
+            path, ", ".join(unloaded[:3]),
+        )
+        return AutoModelForImageClassification.from_pretrained(path, use_safetensors=True)
+    return model
+
+
+# ---------------------------------------------------------------------------
+# ONNX export
+# ---------------------------------------------------------------------------
+
+def onnx_model_path(model_name: str, revision: str, cache_dir: str, *, quantize: bool) -> str:
+    """Where the exported ONNX graph for a model version is stored."""
+    safe_name = model_name.replace("/", "--")
+    filename = "model.int8.onnx" if quantize else "model.onnx"
+    return os.path.join(cache_dir, "onnx", safe_name, revision, filename)
+
+
+def ensure_onnx_model(model_name: str, revision: str, cache_dir: str, *, quantize: bool) -> str:
+    """Return the ONNX graph for a model version, exporting it if needed."""
+    fp32_path = onnx_model_path(model_name, revision, cache_dir, quantize=False)
+    if not os.path.exists(fp32_path):
+        _export_onnx(model_name, revision, cache_dir, fp32_path)
+
+    if not quantize:
+        return fp32_path
+
+    int8_path = onnx_model_path(model_name, revision, cache_dir, quantize=True)
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info("Quantizing %s to int8...", fp32_path)
+        tmp_path = f"{int8_path}.tmp-{os.getpid()}"
+        quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, int8_path)
+    return int8_path
+
+
+def _export_onnx(model_name: str, revision: str, cache_dir: str, path: str) -> None:
+    """Export the HF classifier to ONNX with a dynamic batch dimension."""
+    import torch
+    from transformers import AutoModelForImageClassification
+
+    logger.info("Exporting %s@%s to ONNX...", model_name, revision)
+    model = AutoModelForImageClassification.from_pretrained(
+        model_name,
+        revision=revision,
+        cache_dir=cache_dir,
+    )
+    model.eval()
+
+    class _LogitsOnly(torch.nn.Module):
+        def __init__(self, inner: torch.nn.Module) -> None:
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, pixel_values: torch.Tensor) -> torch.Tensor:
+            return self.inner(pixel_values=pixel_values).logits
+
+    size = model.config.image_size
+    dummy = torch.zeros(1, model.config.num_channels, size, size)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Per-process temp file: replicas sharing cache_dir may export at once.
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    torch.onnx.export(
+        _LogitsOnly(model),
+        (dummy,),
+        tmp_path,
+        input_names=["pixel_values"],
+        output_names=["logits"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=17,
+    )
+    os.replace(tmp_path, path)
+
+
+# ---------------------------------------------------------------------------
+# Factory
+# ---------------------------------------------------------------------------
+
+def create_backend(name: str | None = None, *, spec: ModelSpec | None = None) -> DetectorBackend:
+    """Build the backend ``name`` (default: ``settings.detector_backend``).
+
+    ``spec`` selects the model (default: ``model_name``/``model_revision``).
+    Raises ``ImportError`` when the backend's dependencies are missing.
+    """
+    name = (name or settings.detector_backend).lower()
+    spec = spec or ModelSpec(settings.model_name, settings.model_revision)
+    if name == "torch":
+        return TorchBackend(
+            spec.name,
+            spec.revision,
+            settings.model_cache_dir,
+            mmap_weights=settings.torch_mmap_weights,
+        )
+    if name == "onnx":
+        return OnnxBackend(
+            spec.name,
+            spec.revision,
+            settings.model_cache_dir,
+            quantize=settings.onnx_quantize,
+            intra_op_threads=settings.onnx_intra_op_threads,
+        )
+    if name == "remote":
+        from app.model_server import RemoteBackend
+
+        if (spec.name, spec.revision) != (settings.model_name, settings.model_revision):
+            raise ValueError("The remote backend serves the model server's model only")
+        return RemoteBackend(
+            settings.model_server_socket,
+            timeout=settings.model_server_timeout_seconds,
+        )
+    raise ValueError(f"Unknown detector backend {name!r}")
+
+
+def create_model_backend(specs: list[ModelSpec]) -> DetectorBackend:
+    """One backend for ``specs``: the model itself, or an ensemble of them."""
+    if len(specs) == 1:
+        return create_backend(spec=specs[0])
+    members: list[tuple[DetectorBackend, float]] = []
+    try:
+        for spec in specs:
+            members.append((create_backend(spec=spec), spec.weight))
+    except BaseException:
+        for backend, _ in members:
+            backend.close()
+        raise
+    return EnsembleBackend(members)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    backend = settings.detector_backend.lower()
+    if backend == "remote":
+        backend = settings.model_server_backend.lower()
+    for spec in configured_specs():
+        if backend == "torch" and settings.torch_mmap_weights:
+            print(ensure_safetensors_model(spec.name, spec.revision, settings.model_cache_dir))
+        elif backend == "onnx":
+            print(
+                ensure_onnx_model(
+                    spec.name,
+                    spec.revision,
+                    settings.model_cache_dir,
+                    quantize=settings.onnx_quantize,
+                )
+            )
+        else:
+            logger.info(
+                "Nothing to prepare for %s: the %s backend loads it from the hub cache",
+                spec.name, backend,
+            )
@@ -0,0 +1,181 @@
+"""Dynamic micro-batching for model inference.
+
+Concurrent callers submit single items; a background thread collects them
+for a short window (or until the batch is full), runs one batched call and
+hands each caller its own result.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Generic, TypeVar
+
+logger = logging.getLogger("verifai.batching")
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Queued by close() to stop the worker thread.
+_STOP = object()
+
+
+class MicroBatcher(Generic[T, R]):
+    """Coalesce concurrent ``submit`` calls into batched ``run_batch`` calls.
+
+    Parameters
+    ----------
+    run_batch:
+        Callable taking a list of items and returning one result per item,
+        in the same order.
+    max_batch_size:
+        Upper bound on the number of items per batch.  A value of 1 (or
+        less) disables batching: items run inline on the caller's thread.
+    max_wait_seconds:
+        How long the first item of a batch may wait for company before the
+        batch is dispatched anyway.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[list[T]], list[R]],
+        *,
+        max_batch_size: int,
+        max_wait_seconds: float,
+        name: str = "micro-batcher",
+    ) -> None:
+        self._run_batch = run_batch
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_wait_seconds = max(0.0, max_wait_seconds)
+        self._name = name
+        self._queue: queue.Queue[tuple[T, Future[R]]] = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+
+    @property
+    def enabled(self) -> bool:
+        """Whether items are actually coalesced into batches."""
+        return self._max_batch_size > 1
+
+    def submit(self, item: T) -> R:
+        """Submit one item and block until its result is available."""
+        if not self.enabled or self._closed:
+            return self._run_batch([item])[0]
+        future: Future[R] = Future()
+        self._queue.put((item, future))
+        self._ensure_worker()
+        return future.result()
+
+    def submit_many(self, items: list[T]) -> list[R]:
+        """Submit several items and block until every result is available.
+
+        The items join the shared queue individually, so they may be split
+        across batches or share them with other callers' items.
+        """
+        if not self.enabled or self._closed:
+            return self._run_batch(list(items))
+        futures: list[Future[R]] = []
+        for item in items:
+            future: Future[R] = Future()
+            self._queue.put((item, future))
+            futures.append(future)
+        self._ensure_worker()
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        """Stop the worker thread once the items already queued have run.
+
+        Items submitted afterwards run inline on the caller's thread.
+        """
+        with self._lock:
+            self._closed = True
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(_STOP)
+
+    # ------------------------------------------------------------------
+    # Worker thread
+    # ------------------------------------------------------------------
+
+    def _ensure_worker(self) -> None:
+        # The caller has already queued its items.  close() sets _closed
+        # before queueing its stop marker, so while _closed is unset the
+        # worker is bound to reach those items.  Once it is set, the worker
+        # may have drained the queue and be exiting while still alive.
+        if not self._closed and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._closed:
+                # Raced with close(): drain what was queued on this thread.
+                self._drain()
+                return
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._worker, name=self._name, daemon=True,
+                )
+                self._thread.start()
+
+    def _collect(self) -> tuple[list[tuple[T, Future[R]]], bool]:
+        """Block for the first item, then gather more until full or timed out.
+
+        Also returns whether close() was called (the batch may be empty).
+        """
+        batch: list[tuple[T, Future[R]]] = []
+        first = self._queue.get()
+        if first is _STOP:
+            return batch, True
+        batch.append(first)
+        deadline = time.monotonic() + self._max_wait_seconds
+        while len(batch) < self._max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    entry = self._queue.get_nowait()
+                else:
+                    entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _drain(self) -> None:
+        """Run everything still queued (after close), skipping stop markers."""
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if entry is not _STOP:
+                self._run([entry])
+
+    def _worker(self) -> None:
+        while True:
+            batch, stopping = self._collect()
+            if batch:
+                self._run(batch)
+            if stopping:
+                self._drain()
+                return
+
+    def _run(self, batch: list[tuple[T, Future[R]]]) -> None:
+        items = [item for item, _ in batch]
+        try:
+            results = self._run_batch(items)
+            if len(results) != len(items):
+                raise RuntimeError(
+                    f"run_batch returned {len(results)} results for {len(items)} items"
+                )
+        except BaseException as exc:  # noqa: BLE001 - forwarded to callers
+            logger.exception("Batch of %d items failed", len(items))
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+
+        logger.debug("Ran batch of %d items", len(items))
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
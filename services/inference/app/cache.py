@@ -0,0 +1,226 @@
+"""Content-addressed cache of per-image analysis results.
+
+Entries are keyed by the SHA-256 of the image bytes plus the detector
+model version (name, revision and backend), so a retry, re-dispatch or
+re-upload of the same image skips metadata extraction, provenance checks
+and inference.  Results live in an in-memory LRU tier and, optionally, in
+a SQLite file that survives restarts.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from pydantic import BaseModel
+
+from app.schemas import MetadataResult, ProvenanceResult
+
+logger = logging.getLogger("verifai.cache")
+
+# How many disk writes happen between eviction sweeps of the SQLite tier.
+_DISK_EVICT_EVERY = 100
+
+
+class CachedResult(BaseModel):
+    """Stage outputs worth reusing for an identical image."""
+
+    ai_likelihood: int | None
+    metadata: MetadataResult
+    provenance: ProvenanceResult
+    # Hamming distance to the near-duplicate whose score was reused, or
+    # None when the detector ran on this image (see app.dedup).
+    near_duplicate_distance: int | None = None
+    # Stages the planner skipped, with the reason (see app.planner).
+    skipped_stages: dict[str, str] = {}
+    # Detector model version that produced ai_likelihood.
+    model_version: str | None = None
+
+
+def cache_key(image_bytes: bytes, model_version: str) -> str:
+    """Build the cache key for an image analysed by a given model version."""
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    return f"{digest}:{model_version}"
+
+
+class ResultCache:
+    """Two-tier (memory + optional SQLite) TTL cache of analysis results.
+
+    Parameters
+    ----------
+    max_entries:
+        Capacity of the in-memory LRU tier.  ``0`` disables caching.
+    ttl_seconds:
+        Entries older than this are treated as misses and evicted.
+    disk_path:
+        Path of the SQLite file backing the on-disk tier, or ``None`` to
+        keep results in memory only.
+    disk_max_entries:
+        Capacity of the on-disk tier; the oldest rows are evicted first.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        ttl_seconds: float,
+        disk_path: str | None = None,
+        disk_max_entries: int = 100_000,
+    ) -> None:
+        self._max_entries = max(0, max_entries)
+        self._ttl = ttl_seconds
+        self._disk_max_entries = disk_max_entries
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, tuple[float, CachedResult]] = OrderedDict()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._disk_writes = 0
+        self._db: sqlite3.Connection | None = None
+        if disk_path and self.enabled:
+            self._db = self._open_disk(disk_path)
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_entries > 0
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def get(self, key: str) -> CachedResult | None:
+        """Return the cached result for ``key``, or ``None`` on a miss."""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, result = entry
+                if now - stored_at <= self._ttl:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return result
+                del self._memory[key]
+                self._counters["evictions"] += 1
+
+            result = self._disk_get(key, now)
+            if result is not None:
+                self._counters["disk_hits"] += 1
+                return result
+
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, key: str, result: CachedResult) -> None:
+        """Store ``result`` under ``key`` in every enabled tier."""
+        if not self.enabled:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._memory_put(key, now, result)
+            self._disk_put(key, now, result)
+
+    def stats(self) -> dict[str, int]:
+        """Hit/miss counters and current tier sizes."""
+        with self._lock:
+            return {**self._counters, "memory_entries": len(self._memory)}
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            for name in self._counters:
+                self._counters[name] = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+
+    # ------------------------------------------------------------------
+    # Memory tier
+    # ------------------------------------------------------------------
+
+    def _memory_put(self, key: str, stored_at: float, result: CachedResult) -> None:
+        self._memory[key] = (stored_at, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    # ------------------------------------------------------------------
+    # Disk tier
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _open_disk(path: str) -> sqlite3.Connection | None:
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            db = sqlite3.connect(path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY,"
+                " stored_at REAL NOT NULL,"
+                " value TEXT NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_results_stored_at ON results(stored_at)")
+            db.commit()
+            return db
+        except sqlite3.Error:
+            logger.exception("Failed to open result cache at %s; using memory only", path)
+            return None
+
+    def _disk_get(self, key: str, now: float) -> CachedResult | None:
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT stored_at, value FROM results WHERE key = ?", (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            stored_at, value = row
+            if now - stored_at > self._ttl:
+                self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._db.commit()
+                self._counters["evictions"] += 1
+                return None
+            result = CachedResult.model_validate_json(value)
+        except (sqlite3.Error, ValueError):
+            logger.exception("Result cache read failed for %s", key)
+            return None
+
+        self._memory_put(key, stored_at, result)
+        return result
+
+    def _disk_put(self, key: str, stored_at: float, result: CachedResult) -> None:
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, stored_at, value) VALUES (?, ?, ?)",
+                (key, stored_at, result.model_dump_json()),
+            )
+            self._disk_writes += 1
+            if self._disk_writes % _DISK_EVICT_EVERY == 0:
+                self._disk_evict(stored_at)
+            self._db.commit()
+        except sqlite3.Error:
+            logger.exception("Result cache write failed for %s", key)
+
+    def _disk_evict(self, now: float) -> None:
+        """Remove expired rows, then the oldest rows beyond capacity."""
+        expired = self._db.execute(
+            "DELETE FROM results WHERE stored_at < ?", (now - self._ttl,),
+        ).rowcount
+        overflow = self._db.execute(
+            "DELETE FROM results WHERE key IN ("
+            " SELECT key FROM results ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self._disk_max_entries,),
+        ).rowcount
+        self._counters["evictions"] += max(0, expired) + max(0, overflow)
@@ -0,0 +1,375 @@
+"""Long-lived, pooled async HTTP clients for image downloads and callbacks.
+
+Clients are created once (at startup, or lazily on first use) and reused
+for every job, so repeated calls to the Worker ride on kept-alive
+connections instead of paying a TCP + TLS handshake each time.  All I/O
+is async, so a job waiting on the network never holds a thread.
+
+Finished reports go through :func:`post_report`, which coalesces the
+reports for one callback URL that finish within a short window and sends
+them to the Worker's bulk endpoint in one request.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import threading
+from dataclasses import dataclass
+
+import httpx
+
+from app import metrics
+from app.config import settings
+from app.imaging import ImageTooLargeError
+
+logger = logging.getLogger("verifai.clients")
+
+_lock = threading.Lock()
+_download_client: httpx.AsyncClient | None = None
+_callback_client: httpx.AsyncClient | None = None
+
+
+def _build_client(timeout: float) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry_seconds,
+    )
+    try:
+        return httpx.AsyncClient(timeout=timeout, limits=limits, http2=settings.http2)
+    except ImportError:
+        # http2=True needs the optional "h2" package.
+        logger.warning("HTTP/2 requested but h2 is not installed; using HTTP/1.1")
+        return httpx.AsyncClient(timeout=timeout, limits=limits)
+
+
+def download_client() -> httpx.AsyncClient:
+    """Shared client used to download source images."""
+    global _download_client
+    if _download_client is None:
+        with _lock:
+            if _download_client is None:
+                _download_client = _build_client(settings.download_timeout_seconds)
+    return _download_client
+
+
+def callback_client() -> httpx.AsyncClient:
+    """Shared client used to POST reports back to the Worker."""
+    global _callback_client
+    if _callback_client is None:
+        with _lock:
+            if _callback_client is None:
+                _callback_client = _build_client(settings.callback_timeout_seconds)
+    return _callback_client
+
+
+def open_clients() -> None:
+    """Create both clients eagerly (called at application startup)."""
+    download_client()
+    callback_client()
+
+
+async def close_clients() -> None:
+    """Close both clients and their connection pools (called at shutdown)."""
+    global _download_client, _callback_client
+    with _lock:
+        closing = [c for c in (_download_client, _callback_client) if c is not None]
+        _download_client = None
+        _callback_client = None
+    for client in closing:
+        await client.aclose()
+
+
+async def download_image(url: str, *, max_bytes: int) -> bytes:
+    """Stream ``url`` into memory, aborting as soon as it exceeds ``max_bytes``.
+
+    A declared ``Content-Length`` over the cap is refused before any of
+    the body is read; otherwise the download is cut off mid-stream.
+    """
+    async with download_client().stream("GET", url) as resp:
+        resp.raise_for_status()
+        return await _read_capped(resp, max_bytes=max_bytes)
+
+
+@dataclass(frozen=True)
+class ImageHead:
+    """The leading bytes of a remote image, from :func:`download_head`."""
+
+    data: bytes
+    # Size of the whole file, or None if the server did not say.
+    size: int | None
+
+    @property
+    def complete(self) -> bool:
+        """Whether ``data`` is the whole file."""
+        return self.size is not None and len(self.data) >= self.size
+
+
+async def download_head(url: str, *, head_bytes: int, max_bytes: int) -> ImageHead:
+    """Fetch the first ``head_bytes`` of ``url`` with an HTTP Range request.
+
+    A file whose size (from ``Content-Range``) is over ``max_bytes`` is
+    refused before its body is read.  A server that ignores the Range
+    header sends the whole file, which is read as by
+    :func:`download_image`.
+    """
+    headers = {"Range": f"bytes=0-{head_bytes - 1}"}
+    async with download_client().stream("GET", url, headers=headers) as resp:
+        if resp.status_code == 416:
+            # Range not satisfiable: the file is empty.
+            return ImageHead(b"", 0)
+        resp.raise_for_status()
+        if resp.status_code != 206:
+            data = await _read_capped(resp, max_bytes=max_bytes)
+            return ImageHead(data, len(data))
+
+        size = _content_range_size(resp.headers.get("Content-Range", ""))
+        if size is not None and size > max_bytes:
+            raise ImageTooLargeError(
+                f"Image is {size} bytes, over the {max_bytes}-byte limit"
+            )
+        data = await _read_capped(resp, max_bytes=head_bytes)
+    return ImageHead(data, size)
+
+
+async def download_rest(url: str, head: ImageHead, *, max_bytes: int) -> bytes:
+    """Fetch what follows ``head`` and return the whole file."""
+    headers = {"Range": f"bytes={len(head.data)}-"}
+    async with download_client().stream("GET", url, headers=headers) as resp:
+        resp.raise_for_status()
+        if resp.status_code != 206:
+            # The server sent the whole file after all.
+            return await _read_capped(resp, max_bytes=max_bytes)
+        rest = await _read_capped(resp, max_bytes=max_bytes - len(head.data))
+    return head.data + rest
+
+
+def _content_range_size(value: str) -> int | None:
+    """Complete length from a ``Content-Range: bytes a-b/size`` header."""
+    _, _, size = value.rpartition("/")
+    return int(size) if size.isdigit() else None
+
+
+async def _read_capped(resp: httpx.Response, *, max_bytes: int) -> bytes:
+    declared = resp.headers.get("Content-Length", "")
+    if declared.isdigit() and int(declared) > max_bytes:
+        raise ImageTooLargeError(
+            f"Image is {declared} bytes, over the {max_bytes}-byte limit"
+        )
+
+    buf = bytearray()
+    async for chunk in resp.aiter_bytes():
+        if len(buf) + len(chunk) > max_bytes:
+            raise ImageTooLargeError(
+                f"Image exceeds the {max_bytes}-byte limit"
+            )
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter for the given attempt (1-based)."""
+    ceiling = min(
+        settings.callback_backoff_max_seconds,
+        settings.callback_backoff_seconds * 2 ** (attempt - 1),
+    )
+    return random.uniform(0, ceiling)
+
+
+async def post_callback(url: str, payload: dict, *, job_id: str) -> bool:
+    """POST ``payload`` to the callback URL, retrying transient failures.
+
+    Transport errors, 429 and 5xx responses are retried up to
+    ``callback_max_attempts`` times with exponential backoff and jitter;
+    other 4xx responses are not.  Returns whether the Worker accepted it.
+    """
+    with metrics.timed("callback"):
+        resp = await _post_with_retries(url, payload, job_id=job_id)
+    if resp is not None and resp.is_error:
+        logger.error("Callback for job %s rejected with HTTP %d", job_id, resp.status_code)
+    delivered = resp is not None and not resp.is_error
+    if not delivered:
+        metrics.CALLBACK_FAILURES.inc()
+    return delivered
+
+
+async def _post_with_retries(
+    url: str, payload: dict, *, job_id: str,
+) -> httpx.Response | None:
+    """POST with retries; the final response, or None if every attempt failed."""
+    headers = {
+        "Authorization": f"Bearer {settings.callback_auth_secret}",
+        "Content-Type": "application/json",
+    }
+    attempts = max(1, settings.callback_max_attempts)
+
+    for attempt in range(1, attempts + 1):
+        try:
+            resp = await callback_client().post(url, json=payload, headers=headers)
+        except httpx.TransportError as exc:
+            reason = f"{type(exc).__name__}: {exc}"
+        else:
+            if resp.status_code != 429 and resp.status_code < 500:
+                return resp
+            reason = f"HTTP {resp.status_code}"
+
+        if attempt < attempts:
+            delay = _backoff_delay(attempt)
+            logger.warning(
+                "Callback for job %s failed (%s); retry %d/%d in %.2fs",
+                job_id, reason, attempt, attempts - 1, delay,
+            )
+            metrics.CALLBACK_RETRIES.inc()
+            await asyncio.sleep(delay)
+        else:
+            logger.error(
+                "Callback for job %s failed after %d attempts (%s)", job_id, attempts, reason,
+            )
+
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Report batching
+# ---------------------------------------------------------------------------
+
+class ReportBatcher:
+    """Coalesces report callbacks into bulk POSTs.
+
+    Reports for the same callback URL that arrive within ``window_seconds``
+    of the first are sent together as ``{"reports": [...]}`` to the URL
+    plus ``suffix`` (``/api/internal/report/batch`` on the Worker), which
+    records them with one D1 batch and one R2 bulk delete.  A report that
+    ends up alone is sent to the plain URL as before.  If the bulk
+    endpoint does not exist (404/405), the batch is sent report by report
+    and that URL is no longer batched.
+
+    Parameters
+    ----------
+    window_seconds:
+        How long the first report of a batch waits for others.  Zero
+        disables batching.
+    max_reports:
+        Batch size that is sent without waiting for the window to end.
+    suffix:
+        Appended to the callback URL to form the bulk endpoint URL.
+    """
+
+    def __init__(self, *, window_seconds: float, max_reports: int, suffix: str) -> None:
+        self.window_seconds = window_seconds
+        self.max_reports = max(1, max_reports)
+        self.suffix = suffix
+        # Per (event loop, callback URL): reports waiting for the flush.
+        self._pending: dict[
+            tuple[asyncio.AbstractEventLoop, str],
+            list[tuple[dict, str, asyncio.Future[bool]]],
+        ] = {}
+        self._timers: dict[tuple[asyncio.AbstractEventLoop, str], asyncio.TimerHandle] = {}
+        self._unsupported: set[str] = set()
+
+    async def post(self, url: str, payload: dict, *, job_id: str) -> bool:
+        """Deliver one report, possibly as part of a batch.
+
+        Returns whether the Worker accepted it, like :func:`post_callback`.
+        """
+        if self.window_seconds <= 0 or self.max_reports == 1 or url in self._unsupported:
+            return await post_callback(url, payload, job_id=job_id)
+
+        loop = asyncio.get_running_loop()
+        key = (loop, url)
+        future: asyncio.Future[bool] = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((payload, job_id, future))
+        if len(pending) >= self.max_reports:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window_seconds, self._flush, key)
+        # The send runs in its own task; a cancelled job must not cancel
+        # the reports batched with it.
+        return await asyncio.shield(future)
+
+    def _flush(self, key: tuple[asyncio.AbstractEventLoop, str]) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        if batch:
+            key[0].create_task(self._send(key[1], batch), name="report-batch")
+
+    async def _send(self, url: str, batch: list[tuple[dict, str, asyncio.Future[bool]]]) -> None:
+        try:
+            results = await self._deliver(url, batch)
+        except Exception as exc:
+            logger.exception("Report batch of %d failed", len(batch))
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, _, future), delivered in zip(batch, results):
+            if not future.done():
+                future.set_result(delivered)
+
+    async def _deliver(
+        self, url: str, batch: list[tuple[dict, str, asyncio.Future[bool]]],
+    ) -> list[bool]:
+        if len(batch) == 1:
+            payload, job_id, _ = batch[0]
+            return [await post_callback(url, payload, job_id=job_id)]
+
+        metrics.CALLBACK_BATCH_SIZE.observe(len(batch))
+        job_ids = [job_id for _, job_id, _ in batch]
+        batch_id = f"reports:{job_ids[0]}+{len(batch) - 1}"
+        with metrics.timed("callback"):
+            resp = await _post_with_retries(
+                url + self.suffix,
+                {"reports": [payload for payload, _, _ in batch]},
+                job_id=batch_id,
+            )
+
+        if resp is not None and resp.status_code in (404, 405):
+            logger.warning(
+                "%s has no bulk report endpoint (HTTP %d); sending reports one by one",
+                url, resp.status_code,
+            )
+            self._unsupported.add(url)
+            return list(await asyncio.gather(
+                *(post_callback(url, payload, job_id=job_id) for payload, job_id, _ in batch)
+            ))
+
+        if resp is None or resp.is_error:
+            if resp is not None:
+                logger.error(
+                    "Report batch %s rejected with HTTP %d", batch_id, resp.status_code,
+                )
+            metrics.CALLBACK_FAILURES.inc(len(batch))
+            return [False] * len(batch)
+
+        # Per-report outcome; reports the Worker did not mention count as
+        # accepted along with the batch.
+        try:
+            accepted = {
+                item["job_id"]: bool(item.get("ok"))
+                for item in resp.json().get("results", [])
+            }
+        except (ValueError, AttributeError, KeyError, TypeError):
+            accepted = {}
+        results = [accepted.get(job_id, True) for job_id in job_ids]
+        for job_id, delivered in zip(job_ids, results):
+            if not delivered:
+                logger.error("Worker rejected the report for job %s", job_id)
+                metrics.CALLBACK_FAILURES.inc()
+        return results
+
+
+report_batcher = ReportBatcher(
+    window_seconds=settings.callback_batch_window_ms / 1000.0,
+    max_reports=settings.callback_batch_max_reports,
+    suffix=settings.callback_batch_path_suffix,
+)
+
+
+async def post_report(url: str, payload: dict, *, job_id: str) -> bool:
+    """Deliver a finished job's report (or failure) through :data:`report_batcher`."""
+    return await report_batcher.post(url, payload, job_id=job_id)
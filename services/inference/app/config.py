@@ -20,18 +20,232 @@ class Settings(BaseSettings):
     # HuggingFace model identifier for the AI-image detector.
     model_name: str = "umm-maybe/AI-image-detector"
 
+    # Model revision (branch, tag or commit) to load; also part of the
+    # result-cache key so a model upgrade never serves stale scores.
+    model_revision: str = "main"
+
+    # Comma-separated models scored together as an ensemble, each
+    # "name[@revision][*weight]"; their probabilities are averaged with
+    # those weights.  Empty serves model_name@model_revision alone.
+    detector_ensemble: str = ""
+
     # Local directory where downloaded model weights are cached.
     model_cache_dir: str = "./model_cache"
 
-    # Safety cap -- images larger than this on either axis are rejected.
+    # Inference backend: "torch" (eager PyTorch), "onnx" (ONNX Runtime,
+    # exported once into model_cache_dir) or "remote" (shared model server).
+    detector_backend: str = "torch"
+
+    # With detector_backend="remote", scores come from a standalone model
+    # server (python -m app.model_server) listening on this Unix socket,
+    # which loads model_server_backend ("torch" or "onnx") once per host.
+    model_server_socket: str = "/tmp/verifai-model.sock"
+    model_server_backend: str = "torch"
+
+    # Socket timeout for each request to the model server.
+    model_server_timeout_seconds: float = 30.0
+
+    # Torch backend: load the weights by memory-mapping a safetensors copy
+    # kept under model_cache_dir (converted once per model version).  The
+    # weights are paged in on first use, and processes on one host share
+    # them through the page cache instead of each holding a copy.
+    torch_mmap_weights: bool = True
+
+    # Quantize the exported ONNX graph to int8 (dynamic quantization).
+    onnx_quantize: bool = True
+
+    # ONNX Runtime intra-op thread count (0 lets onnxruntime decide).
+    onnx_intra_op_threads: int = 0
+
+    # Load the model and run a few synthetic inferences at startup instead
+    # of on the first request.
+    model_warmup: bool = True
+
+    # Number of synthetic inferences run during warm-up.
+    model_warmup_runs: int = 3
+
+    # Initial delay before retrying a failed model load; doubles after each
+    # consecutive failure, up to model_load_backoff_max_seconds.
+    model_load_backoff_seconds: float = 5.0
+    model_load_backoff_max_seconds: float = 300.0
+
+    # Side length of the detector's square model input.  Images are
+    # decoded at reduced resolution (JPEG DCT scaling / integer reduce)
+    # down to roughly this size before preprocessing.
+    detector_input_size: int = 224
+
+    # Disable to decode every image at full resolution before inference.
+    detector_reduced_decode: bool = True
+
+    # Adaptive multi-crop: when the whole-image score falls inside
+    # [detector_crop_band_low, detector_crop_band_high] (the range scoring
+    # treats as inconclusive), detector_crop_count native-resolution crops
+    # of detector_input_size px are scored in one batched pass and averaged
+    # with the whole-image view.  Images whose short side is below twice
+    # the input size are not cropped.  0 crops disables it.
+    detector_crop_count: int = 4
+    detector_crop_band_low: int = 30
+    detector_crop_band_high: int = 70
+
+    # Safety cap -- images larger than this on either axis are downscaled
+    # before inference.
     max_image_dimension: int = 4096
 
+    # Images whose header declares more pixels than this are refused
+    # before anything is decoded (decompression-bomb guard).  0 disables.
+    max_image_pixels: int = 50_000_000
+
+    # Estimated decoded bytes (see imaging.estimate_decoded_bytes) of the
+    # images being analysed at once.  Analysis waits until its image fits,
+    # which bounds peak memory; an image larger than the whole budget runs
+    # alone.  0 disables.
+    memory_budget_bytes: int = 1024 * 1024 * 1024
+
+    # Largest image accepted, whether sent as the /analyze/binary request
+    # body or downloaded from image_url (checked against Content-Length
+    # first, then against the streamed size).
+    max_upload_bytes: int = 10 * 1024 * 1024
+
+    # A job's image_url is first read only up to this many bytes (HTTP
+    # Range request); the rest is downloaded only when the headers alone
+    # cannot settle the report.  0 downloads the whole image at once.
+    image_head_bytes: int = 64 * 1024
+
+    # Most metadata (EXIF, XMP, PNG text chunks) read from one image's
+    # headers; the scan stops here however large the file is.
+    metadata_scan_max_bytes: int = 1024 * 1024
+
+    # PEM bundle of trust anchors for C2PA signing certificates.  Without it
+    # manifest signatures are still verified but signers are not checked
+    # against a trust list.
+    c2pa_trust_anchors_path: str | None = None
+
+    # Certificate-chain validation results, cached by the SHA-256
+    # fingerprint of the signing certificate.
+    c2pa_trust_cache_size: int = 1024
+    c2pa_trust_cache_ttl_seconds: float = 3600.0
+
     # httpx timeout when downloading the source image from object storage.
     download_timeout_seconds: int = 30
 
+    # Connection pool limits shared by the download and callback clients.
+    http_max_connections: int = 20
+    http_max_keepalive_connections: int = 10
+    http_keepalive_expiry_seconds: float = 30.0
+
+    # Negotiate HTTP/2 where supported (requires the optional "h2" package).
+    http2: bool = False
+
+    # httpx timeout for each report callback POST.
+    callback_timeout_seconds: float = 10.0
+
+    # Attempts per callback; transport errors, 429 and 5xx are retried with
+    # exponential backoff (plus jitter) starting at callback_backoff_seconds.
+    callback_max_attempts: int = 4
+    callback_backoff_seconds: float = 0.5
+    callback_backoff_max_seconds: float = 8.0
+
+    # Reports finishing within this many milliseconds of each other are
+    # sent to the callback URL + callback_batch_path_suffix in one POST
+    # (at most callback_batch_max_reports at a time, which also splits
+    # /analyze/batch callbacks; the Worker accepts up to 100 per POST).
+    # 0 disables batching.
+    callback_batch_window_ms: float = 20.0
+    callback_batch_max_reports: int = 50
+    callback_batch_path_suffix: str = "/batch"
+
     # Maximum wall-clock time allowed for a single inference run.
     inference_timeout_seconds: int = 60
 
+    # Micro-batching: concurrent detect calls are coalesced into a single
+    # forward pass of up to this many images (1 disables batching).
+    detector_batch_max_size: int = 8
+
+    # How long the first image in a batch waits for others to join before
+    # the batch is dispatched anyway.
+    detector_batch_max_wait_ms: int = 10
+
+    # Number of analysis pipelines allowed to run at the same time.  Most
+    # of a pipeline's time is network I/O on the event loop, so this can
+    # exceed compute_threads.
+    pipeline_concurrency: int = 4
+
+    # Threads running the CPU-bound stages (metadata, decode, inference).
+    compute_threads: int = 4
+
+    # Runs allowed to wait in memory for a free pipeline slot.  A queued
+    # job that finds this full stays in the job queue (below) until a
+    # slot frees up; an /analyze/batch request is refused with a 503.
+    pipeline_queue_size: int = 16
+
+    # Retry-After value (seconds) sent with every 503: a full job queue,
+    # or a batch refused by a full pipeline queue.
+    pipeline_retry_after_seconds: int = 5
+
+    # Durable job queue: /analyze and /analyze/binary write each job to
+    # SQLite (WAL mode) under model_cache_dir before answering, so jobs
+    # survive restarts and are delivered at least once.  When false the
+    # queue is kept in memory only.
+    job_queue_durable: bool = True
+
+    # Unfinished jobs the queue holds; beyond this /analyze answers 503
+    # with a Retry-After header.  Jobs wait here for a pipeline slot, so
+    # this is what absorbs a burst.
+    job_queue_max_pending: int = 256
+
+    # Consumer tasks running jobs that waited in the queue.
+    job_queue_consumers: int = 4
+
+    # A job whose process has not finished it this long after claiming it
+    # is run again.  Must exceed the longest pipeline run, callbacks
+    # included.
+    job_queue_lease_seconds: float = 300.0
+
+    # A job claimed this many times without finishing (e.g. it crashes the
+    # process) is reported as failed instead of run again.
+    job_queue_max_attempts: int = 3
+
+    # Finished job ids are remembered this long, so a job sent again is
+    # acknowledged without being run twice.
+    job_queue_retain_seconds: float = 3600.0
+
+    # On shutdown, running jobs get this long to finish before they are
+    # handed back to the queue for the next process.
+    job_queue_drain_seconds: float = 20.0
+
+    # How often idle consumers look for jobs they were not told about
+    # (expired leases, jobs queued by another process).
+    job_queue_poll_seconds: float = 1.0
+
+    # Largest number of images accepted by one /analyze/batch request.  A
+    # batch occupies a single pipeline slot and is processed in chunks of
+    # detector_batch_max_size images.
+    batch_max_items: int = 500
+
+    # In-memory LRU capacity of the per-image result cache (0 disables it).
+    result_cache_max_entries: int = 1024
+
+    # Cached results older than this are recomputed.
+    result_cache_ttl_seconds: int = 7 * 24 * 3600
+
+    # Also persist cached results to SQLite under model_cache_dir.
+    result_cache_disk: bool = False
+
+    # Capacity of the on-disk result cache tier.
+    result_cache_disk_max_entries: int = 100_000
+
+    # Near-duplicate reuse: an image whose perceptual hash (64-bit dHash)
+    # is within near_duplicate_max_distance bits of an image scored in the
+    # last result_cache_ttl_seconds reuses that detector score instead of
+    # running the model.  near_duplicate_index_size = 0 disables it.
+    near_duplicate_index_size: int = 20_000
+    near_duplicate_max_distance: int = 4
+
+    # Skip stages whose result can no longer change the report -- today,
+    # the detector when valid C2PA credentials already declare the image
+    # AI-generated.  Skipped stages are listed in the report.
+    planner_skip_decided_stages: bool = True
+
     model_config = {"env_prefix": "", "env_file": ".env"}
 
 
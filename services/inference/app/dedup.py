@@ -0,0 +1,206 @@
+"""Perceptual-hash index for reusing detector scores on near-duplicates.
+
+Exact re-uploads are caught by content hash (the Worker's
+``findJobByHash`` and :mod:`app.cache`), but a viral image usually comes
+back resized, recompressed or re-encoded, which changes every byte.  A
+64-bit difference hash (dHash) of the image survives those edits, so a
+new image within a small Hamming distance of one already scored can
+reuse that score instead of running the model again.
+
+The hash is computed from the same reduced decode the detector uses
+(:meth:`ImageContext.reduced_rgb`), so it costs a 9x8 resize.  Lookups go
+through a BK-tree, which only visits subtrees whose distance band can
+contain a match.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from PIL import Image
+
+from app.config import settings
+from app.imaging import ImageContext
+
+HASH_BITS = 64
+
+# Hashes with fewer set (or unset) bits than this come from flat or
+# gradient images, which collide with each other regardless of content.
+_MIN_DETAIL_BITS = 8
+
+
+def dhash(img: Image.Image) -> int:
+    """64-bit difference hash: is each pixel brighter than its right neighbour?"""
+    small = img.convert("L").resize((9, 8), Image.BILINEAR)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(8):
+        offset = row * 9
+        for col in range(8):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def image_hash(image: ImageContext) -> int:
+    """dHash of ``image``, from the decode the detector shares."""
+    if settings.detector_reduced_decode:
+        return dhash(image.reduced_rgb(settings.detector_input_size))
+    return dhash(image.rgb())
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def is_distinctive(value: int) -> bool:
+    """Whether ``value`` carries enough detail to identify an image."""
+    bits = value.bit_count()
+    return _MIN_DETAIL_BITS <= bits <= HASH_BITS - _MIN_DETAIL_BITS
+
+
+# ---------------------------------------------------------------------------
+# BK-tree
+# ---------------------------------------------------------------------------
+
+class BKTree:
+    """Metric tree over hashes under Hamming distance.
+
+    Each node's children are keyed by their distance to the node, so a
+    search for everything within ``radius`` of a query at distance ``d``
+    from a node only descends into children keyed ``d - radius`` to
+    ``d + radius``.
+    """
+
+    def __init__(self) -> None:
+        self._root: list | None = None  # [hash, {distance: child}]
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, value: int) -> None:
+        if self._root is None:
+            self._root = [value, {}]
+            self._size = 1
+            return
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [value, {}]
+                self._size += 1
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> list[tuple[int, int]]:
+        """``(distance, hash)`` for every stored hash within ``radius``."""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                found.append((distance, node[0]))
+            for edge, child in node[1].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return found
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class Match:
+    """A previously scored image close to the query."""
+
+    score: int
+    distance: int
+
+
+class NearDuplicateIndex:
+    """Bounded, expiring map from perceptual hash to detector score.
+
+    Parameters
+    ----------
+    max_entries:
+        Capacity; the least recently used hashes are dropped first.
+        ``0`` disables the index.
+    ttl_seconds:
+        Scores older than this are not reused.
+    max_distance:
+        Largest Hamming distance (out of 64 bits) treated as the same image.
+
+    Scores are stored per model version, so a model change never reuses
+    scores produced by another model.  The BK-tree has no cheap delete:
+    evicted hashes stay in it until the tree is rebuilt, which happens
+    once they make up half of it.
+    """
+
+    def __init__(self, *, max_entries: int, ttl_seconds: float, max_distance: int) -> None:
+        self._max_entries = max(0, max_entries)
+        self._ttl = ttl_seconds
+        self._max_distance = max_distance
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, int], tuple[float, int]] = OrderedDict()
+        self._trees: dict[str, BKTree] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_entries > 0
+
+    def find(self, value: int, model_version: str) -> Match | None:
+        """The closest live entry within ``max_distance``, if any."""
+        if not self.enabled or not is_distinctive(value):
+            return None
+        now = time.time()
+        with self._lock:
+            tree = self._trees.get(model_version)
+            if tree is None:
+                return None
+            for distance, candidate in sorted(tree.search(value, self._max_distance)):
+                key = (model_version, candidate)
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                stored_at, score = entry
+                if now - stored_at > self._ttl:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                return Match(score=score, distance=distance)
+        return None
+
+    def add(self, value: int, model_version: str, score: int) -> None:
+        if not self.enabled or not is_distinctive(value):
+            return
+        with self._lock:
+            key = (model_version, value)
+            self._entries[key] = (time.time(), score)
+            self._entries.move_to_end(key)
+            self._trees.setdefault(model_version, BKTree()).add(value)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+            if sum(len(tree) for tree in self._trees.values()) > 2 * len(self._entries):
+                self._rebuild()
+
+    def _rebuild(self) -> None:
+        self._trees = {}
+        for version, value in self._entries:
+            self._trees.setdefault(version, BKTree()).add(value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._trees.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -1,93 +1,386 @@
-"""AI-generated image detection using a HuggingFace ViT-based classifier."""
+"""AI-generated image detection using a HuggingFace ViT-based classifier.
+
+The classifier runs through a pluggable backend (see app.backends),
+selected by ``settings.detector_backend``.  Loaded models live in a
+registry (see app.registry): the configured model -- or ensemble of
+models -- is loaded on startup, and :func:`deploy` loads another version
+next to it and switches traffic over without downtime.
+
+Every image is first scored from one whole-image view.  Downscaling to
+the model input discards the high-frequency detail the classifier relies
+on, so when that score is inconclusive a few native-resolution crops are
+scored as well (one batched pass) and averaged in; confident images pay
+for a single view only.
+"""
 
 from __future__ import annotations
 
-import io
+import functools
 import logging
+import math
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
 
-from PIL import Image
+from PIL import Image, ImageOps
 
+from app import backends, metrics, registry
+from app.backends import ModelSpec
 from app.config import settings
+from app.imaging import ImageContext
 
 logger = logging.getLogger("verifai.detector")
 
-# Lazy-loaded model and processor
-_model = None
-_processor = None
+# Loaded model versions; the active one serves new detect calls.
+_registry = registry.ModelRegistry()
+
+# Loader state of the configured model(s): "unloaded", "loading",
+# "ready", "failed", or "disabled" when the ML dependencies are not
+# installed at all.
+_state = "unloaded"
+_load_lock = threading.Lock()
+_load_failures = 0
+_next_load_attempt = 0.0
+_last_error: str | None = None
+
+# At most one deploy() loads at a time; _deploying is its version.
+_deploy_lock = threading.Lock()
+_deploying: str | None = None
+
+# The deployment pinned by pinned() on the current thread.
+_pinned = threading.local()
+
+
+class DeployInProgressError(RuntimeError):
+    """Raised when a model deploy is requested while another is loading."""
+
+
+def _new_deployment(specs: list[ModelSpec]) -> registry.Deployment:
+    """Load ``specs`` into a deployment that is not yet serving."""
+    backend = backends.create_model_backend(specs)
+    return registry.Deployment(
+        model_version(specs),
+        backend,
+        functools.partial(_predict_batch, backend),
+        max_batch_size=settings.detector_batch_max_size,
+        max_wait_seconds=settings.detector_batch_max_wait_ms / 1000,
+    )
 
 
 def _load_model():
-    """Load the model and processor on first use."""
-    global _model, _processor
+    """Load the configured model(s), at most one load at a time.
+
+    Concurrent callers wait for an in-progress load instead of starting
+    their own.  After a failure, further attempts are skipped until an
+    exponential backoff has elapsed.
+    """
+    global _state, _load_failures, _next_load_attempt, _last_error
 
-    if _model is not None:
+    if _registry.active is not None or _state == "disabled":
         return
 
-    try:
-        from transformers import AutoFeatureExtractor, AutoModelForImageClassification
+    with _load_lock:
+        if _registry.active is not None or _state == "disabled":
+            return
+        if time.monotonic() < _next_load_attempt:
+            return
 
-        logger.info("Loading model %s...", settings.model_name)
-        _processor = AutoFeatureExtractor.from_pretrained(
-            settings.model_name,
-            cache_dir=settings.model_cache_dir,
-        )
-        _model = AutoModelForImageClassification.from_pretrained(
-            settings.model_name,
-            cache_dir=settings.model_cache_dir,
-        )
-        _model.eval()
-        logger.info("Model loaded successfully.")
+        _state = "loading"
+        try:
+            specs = backends.configured_specs()
+            logger.info(
+                "Loading model %s with the %s backend...",
+                ", ".join(str(spec) for spec in specs), settings.detector_backend,
+            )
+            with metrics.timed("model_load"):
+                deployment = _new_deployment(specs)
+            _registry.activate(deployment)
+            _state = "ready"
+            _load_failures = 0
+            _last_error = None
+            logger.info("Model loaded successfully.")
+        except ImportError as exc:
+            logger.warning("%s; AI detection is disabled", exc)
+            _state = "disabled"
+        except Exception as exc:
+            _state = "failed"
+            _load_failures += 1
+            _last_error = f"{type(exc).__name__}: {exc}"
+            delay = min(
+                settings.model_load_backoff_max_seconds,
+                settings.model_load_backoff_seconds * 2 ** (_load_failures - 1),
+            )
+            _next_load_attempt = time.monotonic() + delay
+            logger.exception(
+                "Failed to load model %s (attempt %d); next attempt in %.0fs",
+                settings.model_name, _load_failures, delay,
+            )
+
+
+def _warm(backend: backends.DetectorBackend, runs: int) -> None:
+    for _ in range(runs):
+        sample = Image.effect_noise((224, 224), 64).convert("RGB")
+        _predict_batch(backend, [sample])
+
+
+def warm_up(runs: int) -> None:
+    """Load the model and run a few synthetic inferences.
+
+    Called once at startup so the first real request does not pay for
+    weight loading or the first-call overheads of the forward pass.
+    """
+    _load_model()
+    deployment = _registry.active
+    if deployment is None:
+        return
+
+    started = time.monotonic()
+    try:
+        _warm(deployment.backend, runs)
     except Exception:
-        logger.exception("Failed to load model %s", settings.model_name)
-        _model = None
-        _processor = None
+        logger.exception("Model warm-up failed")
+        return
+    logger.info("Model warm-up finished in %.2fs (%d runs)", time.monotonic() - started, runs)
 
 
-def detect(image_bytes: bytes) -> int | None:
-    """Run AI-detection inference on the supplied image.
+def deploy(specs: list[ModelSpec], warmup_runs: int) -> str:
+    """Load and warm ``specs`` next to the serving model, then switch to it.
 
-    Returns an integer 0-100 representing AI likelihood, or None if
-    the detector is unavailable.
+    New detect calls go to the new version as soon as it is warm; calls
+    already running finish on the old one, which is unloaded once they
+    have.  If loading or warm-up fails, the old version keeps serving
+    and the error propagates.  Blocks for the whole load, so run it off
+    the event loop.  Returns the new model version.
+
+    Raises :class:`DeployInProgressError` while another deploy is loading.
     """
+    global _deploying, _state, _load_failures, _last_error
+
+    if not _deploy_lock.acquire(blocking=False):
+        raise DeployInProgressError(f"Model {_deploying} is still loading")
     try:
-        _load_model()
+        _deploying = model_version(specs)
+        logger.info("Deploying model %s...", _deploying)
+        try:
+            with metrics.timed("model_load"):
+                deployment = _new_deployment(specs)
+            try:
+                _warm(deployment.backend, warmup_runs)
+            except BaseException:
+                deployment.retire()
+                raise
+        except BaseException:
+            metrics.MODEL_DEPLOYS.inc(result="failed")
+            logger.exception("Failed to deploy model %s; keeping %s", _deploying, model_version())
+            raise
+        _registry.activate(deployment)
+        _state = "ready"
+        _load_failures = 0
+        _last_error = None
+        metrics.MODEL_DEPLOYS.inc(result="ok")
+        return deployment.version
+    finally:
+        _deploying = None
+        _deploy_lock.release()
 
-        if _model is None or _processor is None:
-            logger.warning("Model not available, returning None")
-            return None
 
-        import torch
+def model_version(specs: list[ModelSpec] | None = None) -> str:
+    """Identifier of the weights and backend that produce scores.
 
-        img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    Different backends (and int8 quantization) can shift scores slightly,
+    and multi-crop refinement changes inconclusive ones, so they are part
+    of the version used in cache keys.  Without ``specs``: the version
+    pinned on this thread, else the one serving, else the configured one.
+    """
+    if specs is None:
+        deployment = getattr(_pinned, "deployment", None) or _registry.active
+        if deployment is not None:
+            return deployment.version
+        specs = backends.configured_specs()
+
+    backend = settings.detector_backend.lower()
+    if backend == "remote":
+        # Scores come from whatever the model server loaded.
+        backend = settings.model_server_backend.lower()
+    if backend == "onnx" and settings.onnx_quantize:
+        backend = "onnx-int8"
+    crops = ""
+    if settings.detector_crop_count > 0:
+        crops = (
+            f"+crops{settings.detector_crop_count}"
+            f"[{settings.detector_crop_band_low}-{settings.detector_crop_band_high}]"
+        )
+    if len(specs) == 1:
+        models = f"{specs[0].name}@{specs[0].revision}"
+    else:
+        models = f"ensemble[{','.join(str(spec) for spec in specs)}]"
+    return f"{models}{crops}+{backend}"
+
+
+@contextmanager
+def pinned() -> Iterator[str]:
+    """Score this thread's detect calls in the block with one model version.
+
+    Yields that version: the serving one, or the configured one while
+    nothing is loaded yet.  Callers cache and report results under it, and
+    a deploy during the block does not change which model scores them.
+    """
+    previous = getattr(_pinned, "deployment", None)
+    with _registry.acquire() as deployment:
+        _pinned.deployment = deployment or previous
+        try:
+            yield model_version()
+        finally:
+            _pinned.deployment = previous
+
+
+@contextmanager
+def _serving() -> Iterator[registry.Deployment | None]:
+    """The pinned deployment, else the active one (loading it if needed)."""
+    deployment = getattr(_pinned, "deployment", None)
+    if deployment is not None:
+        yield deployment
+        return
+    _load_model()
+    with _registry.acquire() as deployment:
+        yield deployment
 
-        # Resize if too large to avoid OOM on CPU
-        max_dim = settings.max_image_dimension
-        if img.width > max_dim or img.height > max_dim:
-            img.thumbnail((max_dim, max_dim), Image.LANCZOS)
 
-        inputs = _processor(images=img, return_tensors="pt")
+def is_disabled() -> bool:
+    """True when the ML dependencies are not installed, so nothing is scored."""
+    return _state == "disabled"
 
-        with torch.inference_mode():
-            outputs = _model(**inputs)
-            logits = outputs.logits
-            probs = torch.nn.functional.softmax(logits, dim=-1)
 
-        # The model has two classes: "human" (real) and "ai" (generated)
-        # Label mapping: 0 = "human", 1 = "ai" (for umm-maybe/AI-image-detector)
-        labels = _model.config.id2label
-        ai_index = None
-        for idx, label in labels.items():
-            if "ai" in label.lower() or "artificial" in label.lower() or "fake" in label.lower():
-                ai_index = int(idx)
-                break
+def status() -> dict[str, object]:
+    """Snapshot of the model loader, for the readiness endpoint."""
+    retry_in = max(0.0, _next_load_attempt - time.monotonic()) if _state == "failed" else None
+    active = _registry.active
+    return {
+        "state": _state,
+        "model": settings.model_name,
+        "revision": settings.model_revision,
+        "backend": settings.detector_backend,
+        "version": active.version if active is not None else None,
+        "deploying": _deploying,
+        "load_failures": _load_failures,
+        "retry_in_seconds": round(retry_in, 1) if retry_in is not None else None,
+        "last_error": _last_error,
+    }
 
-        if ai_index is None:
-            # Fallback: assume last class is "ai"
-            ai_index = len(labels) - 1
 
-        ai_prob = probs[0][ai_index].item()
-        score = int(round(ai_prob * 100))
-        score = max(0, min(100, score))
+def _predict_batch(backend: backends.DetectorBackend, images: list[Image.Image]) -> list[float]:
+    """Run one batched forward pass and return the AI probability per image."""
+    metrics.INFERENCE_BATCH_SIZE.observe(len(images))
+    return backend.predict(images)
+
+
+def _prepare(image: ImageContext) -> Image.Image:
+    """Decode ``image`` at the size the model needs."""
+    # The model only sees detector_input_size pixels per side, so decode
+    # close to that size instead of materialising every pixel.
+    if settings.detector_reduced_decode:
+        img = image.reduced_rgb(settings.detector_input_size)
+    else:
+        img = image.rgb()
+
+    # Resize if too large to avoid OOM on CPU.  The decoded image is
+    # shared with other stages, so resize into a new image.
+    max_dim = settings.max_image_dimension
+    if img.width > max_dim or img.height > max_dim:
+        img = ImageOps.contain(img, (max_dim, max_dim), Image.LANCZOS)
+    return img
+
+
+def _to_score(ai_prob: float) -> int:
+    """Convert a probability into the 0-100 integer score."""
+    return max(0, min(100, int(round(ai_prob * 100))))
+
+
+def _is_uncertain(ai_prob: float) -> bool:
+    """Whether a whole-image score is inconclusive enough to refine."""
+    if settings.detector_crop_count <= 0:
+        return False
+    score = _to_score(ai_prob)
+    return settings.detector_crop_band_low <= score <= settings.detector_crop_band_high
+
+
+def _crops(image: ImageContext) -> list[Image.Image]:
+    """Native-resolution crops of ``image`` spread over a grid.
+
+    ``detector_crop_count`` crops of ``detector_input_size`` px are taken
+    around the centres of the cells of the smallest square grid with at
+    least that many cells.  Images too small for crops to add detail over
+    the whole-image view yield none.
+    """
+    count = settings.detector_crop_count
+    side = settings.detector_input_size
+    width, height = image.size
+    if count <= 0 or min(width, height) < 2 * side:
+        return []
+
+    full = image.rgb()
+    grid = math.ceil(math.sqrt(count))
+    cells = [(row, col) for row in range(grid) for col in range(grid)]
+    crops = []
+    for n in range(count):
+        row, col = cells[n * len(cells) // count]
+        left = int((col + 0.5) * full.width / grid - side / 2)
+        top = int((row + 0.5) * full.height / grid - side / 2)
+        left = max(0, min(left, full.width - side))
+        top = max(0, min(top, full.height - side))
+        crops.append(full.crop((left, top, left + side, top + side)))
+    return crops
+
+
+def _refine(
+    deployment: registry.Deployment, images: list[ImageContext], global_probs: list[float],
+) -> list[float]:
+    """Average each whole-image probability with its crops' probabilities.
+
+    The crops of every image go through the batcher together, so a batch
+    of uncertain images still shares forward passes.
+    """
+    with metrics.timed("crop_decode"):
+        crops = [_crops(image) for image in images]
+    flat = [crop for image_crops in crops for crop in image_crops]
+    if not flat:
+        return global_probs
+
+    with metrics.timed("crop_inference"):
+        probs = iter(deployment.batcher.submit_many(flat))
+    refined = []
+    for global_prob, image_crops in zip(global_probs, crops):
+        views = [global_prob, *(next(probs) for _ in image_crops)]
+        if len(views) > 1:
+            metrics.CROP_REFINEMENTS.inc()
+        refined.append(sum(views) / len(views))
+    return refined
+
+
+def detect(image: ImageContext) -> int | None:
+    """Run AI-detection inference on the supplied image.
+
+    Returns an integer 0-100 representing AI likelihood, or None if
+    the detector is unavailable.
+    """
+    try:
+        with _serving() as deployment:
+            if deployment is None:
+                logger.warning("Model not available, returning None")
+                return None
+
+            with metrics.timed("decode"):
+                img = _prepare(image)
+            # Includes any wait for the micro-batch to fill.
+            with metrics.timed("inference"):
+                ai_prob = deployment.batcher.submit(img)
+            if _is_uncertain(ai_prob):
+                try:
+                    ai_prob = _refine(deployment, [image], [ai_prob])[0]
+                except Exception:
+                    logger.exception("Crop refinement failed; keeping the whole-image score")
+        score = _to_score(ai_prob)
 
         logger.info("Detection score: %d (AI probability: %.4f)", score, ai_prob)
         return score
@@ -95,3 +388,56 @@ def detect(image_bytes: bytes) -> int | None:
     except Exception:
         logger.exception("Detection failed")
         return None
+
+
+def detect_many(images: list[ImageContext]) -> list[int | None]:
+    """Batch counterpart of :func:`detect`, one score per image.
+
+    All images are handed to the batcher together, so they share forward
+    passes.  An image that fails to decode scores None without affecting
+    the others.
+    """
+    if not images:
+        return []
+
+    with _serving() as deployment:
+        if deployment is None:
+            logger.warning("Model not available, returning None for %d images", len(images))
+            return [None] * len(images)
+        return _detect_many(deployment, images)
+
+
+def _detect_many(deployment: registry.Deployment, images: list[ImageContext]) -> list[int | None]:
+    prepared: dict[int, Image.Image] = {}
+    for index, image in enumerate(images):
+        try:
+            with metrics.timed("decode"):
+                prepared[index] = _prepare(image)
+        except Exception:
+            logger.exception("Failed to decode image %d of the batch", index)
+
+    scores: list[int | None] = [None] * len(images)
+    try:
+        with metrics.timed("inference"):
+            probs = deployment.batcher.submit_many(list(prepared.values()))
+    except Exception:
+        logger.exception("Batch detection failed")
+        return scores
+
+    global_probs = dict(zip(prepared, probs))
+    uncertain = [index for index, ai_prob in global_probs.items() if _is_uncertain(ai_prob)]
+    if uncertain:
+        try:
+            refined = _refine(
+                deployment,
+                [images[i] for i in uncertain],
+                [global_probs[i] for i in uncertain],
+            )
+            global_probs.update(zip(uncertain, refined))
+        except Exception:
+            logger.exception("Crop refinement failed; keeping whole-image scores")
+
+    for index, ai_prob in global_probs.items():
+        scores[index] = _to_score(ai_prob)
+    logger.info("Detection scores for %d images: %s", len(images), scores)
+    return scores
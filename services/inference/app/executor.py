@@ -0,0 +1,206 @@
+"""Bounded executor for analysis pipeline runs.
+
+Pipelines are coroutines: network I/O (downloads, callbacks) stays on the
+event loop, and only CPU-bound stages are handed to a dedicated compute
+thread pool via :meth:`PipelineExecutor.run_cpu`.  Admission is refused
+once the running pipelines and the wait queue are full, so that a burst
+degrades into fast rejections rather than CPU thrashing.
+
+Job slots bound CPU, not memory: one large TIFF decodes to more than a
+hundred small JPEGs.  :class:`MemoryBudget` additionally weights the
+CPU-bound stages by the estimated decoded size of their images, so peak
+memory stays bounded however the load is mixed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+logger = logging.getLogger("verifai.executor")
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the executor is at capacity."""
+
+
+class PipelineExecutor:
+    """Admission control for pipeline coroutines plus a compute pool.
+
+    Parameters
+    ----------
+    max_workers:
+        Number of pipeline runs allowed to execute concurrently.
+    max_queue:
+        Number of additional jobs allowed to wait for a free slot.
+    compute_threads:
+        Size of the thread pool that runs CPU-bound stages.
+    """
+
+    def __init__(self, *, max_workers: int, max_queue: int, compute_threads: int = 4) -> None:
+        self._max_workers = max(1, max_workers)
+        self._capacity = self._max_workers + max(0, max_queue)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, compute_threads), thread_name_prefix="compute",
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._slots: asyncio.Semaphore | None = None
+        self._slots_loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of running plus queued jobs."""
+        return self._capacity
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of accepted jobs still waiting for a slot."""
+        with self._lock:
+            return self._pending - self._running
+
+    @property
+    def is_full(self) -> bool:
+        """Whether a submit right now would be refused."""
+        with self._lock:
+            return self._pending >= self._capacity
+
+    def submit(self, fn: Callable[..., Awaitable[Any]], *args: Any) -> asyncio.Task:
+        """Schedule coroutine ``fn(*args)`` or raise :class:`QueueFullError`.
+
+        Must be called from the event loop the job should run on.
+        """
+        with self._lock:
+            if self._pending >= self._capacity:
+                raise QueueFullError(
+                    f"Pipeline executor is full ({self._pending}/{self._capacity} jobs)"
+                )
+            self._pending += 1
+
+        try:
+            task = asyncio.get_running_loop().create_task(self._run(fn, *args))
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        task.add_done_callback(self._release)
+        return task
+
+    async def run_cpu(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a CPU-bound callable on the compute pool and await its result."""
+        return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+
+    def stats(self) -> dict[str, int]:
+        """Snapshot of the executor's load, for health reporting."""
+        with self._lock:
+            return {
+                "queue_depth": self._pending - self._running,
+                "in_flight": self._running,
+                "capacity": self._capacity,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the compute pool and optionally wait for running stages."""
+        self._pool.shutdown(wait=wait, cancel_futures=not wait)
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        """Concurrency slots, bound to the currently running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self._max_workers)
+            self._slots_loop = loop
+        return self._slots
+
+    async def _run(self, fn: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        async with self._semaphore():
+            with self._lock:
+                self._running += 1
+            try:
+                return await fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+    def _release(self, _task: asyncio.Task) -> None:
+        with self._lock:
+            self._pending -= 1
+
+
+class MemoryBudget:
+    """Byte-weighted semaphore over estimated decoded image sizes.
+
+    Parameters
+    ----------
+    capacity_bytes:
+        Total bytes that may be reserved at once.  ``0`` disables the
+        budget.
+
+    Reservations are granted in arrival order, so a large image is not
+    starved by a stream of small ones.  A reservation larger than the
+    whole budget is granted once nothing else is reserved, so it runs
+    alone rather than never.
+    """
+
+    def __init__(self, *, capacity_bytes: int) -> None:
+        self._capacity = max(0, capacity_bytes)
+        self._reserved = 0
+        self._waiters: deque[object] = deque()
+        self._cond: asyncio.Condition | None = None
+        self._cond_loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._capacity > 0
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int) -> AsyncIterator[None]:
+        """Hold ``nbytes`` of the budget for the duration of the block."""
+        if not self.enabled or nbytes <= 0:
+            yield
+            return
+        nbytes = min(nbytes, self._capacity)
+        cond = self._condition()
+        ticket = object()
+        async with cond:
+            self._waiters.append(ticket)
+            try:
+                await cond.wait_for(
+                    lambda: self._waiters[0] is ticket
+                    and (self._reserved == 0 or self._reserved + nbytes <= self._capacity)
+                )
+            finally:
+                self._waiters.remove(ticket)
+                cond.notify_all()
+            self._reserved += nbytes
+        try:
+            yield
+        finally:
+            async with cond:
+                self._reserved -= nbytes
+                cond.notify_all()
+
+    def stats(self) -> dict[str, int]:
+        """Snapshot of the budget, for health reporting."""
+        return {
+            "reserved_bytes": self._reserved,
+            "waiting": len(self._waiters),
+            "capacity_bytes": self._capacity,
+        }
+
+    def _condition(self) -> asyncio.Condition:
+        """Wait condition, bound to the currently running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._cond is None or self._cond_loop is not loop:
+            self._cond = asyncio.Condition()
+            self._cond_loop = loop
+        return self._cond
@@ -0,0 +1,197 @@
+"""Per-job image context shared by every pipeline stage.
+
+A job's bytes are parsed by Pillow once: the header (dimensions, format)
+is read lazily on first access, and the pixel data is decoded at most
+once, on the first stage that actually needs pixels.  Embedded metadata
+(EXIF, XMP, PNG text) comes from a separate bounded scan of the container
+headers, see :mod:`app.scanner`.
+
+Stages that only need a small version of the image (the detector feeds a
+224x224 model) can ask for a reduced decode instead, which for JPEG uses
+DCT scaling so the full-resolution pixels are never materialised.
+
+The pixel count declared by the header is checked when the header is
+opened, before anything is decoded, so an oversized image or a
+decompression bomb (a small file declaring a huge canvas) is refused
+without allocating its pixels.
+"""
+
+from __future__ import annotations
+
+import io
+
+from PIL import Image
+
+from app import scanner
+from app.config import settings
+
+# Formats whose decoder supports Image.draft() (DCT-domain downscaling).
+_DRAFT_FORMATS = frozenset({"JPEG", "MPO"})
+
+# Bytes per pixel of the RGB copy the stages work on.
+_RGB_BYTES = 3
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image is refused for its size.
+
+    Either its file is over ``max_upload_bytes`` (see
+    :func:`app.clients.download_image`) or its header declares more than
+    ``max_image_pixels`` pixels.
+    """
+
+
+def _check_pixels(width: int, height: int) -> None:
+    limit = settings.max_image_pixels
+    if limit and width * height > limit:
+        raise ImageTooLargeError(
+            f"Image is {width}x{height} ({width * height} pixels); "
+            f"the limit is {limit} pixels."
+        )
+
+
+def _open(data: bytes) -> Image.Image:
+    """Open ``data`` (header only) and enforce the pixel limit."""
+    try:
+        img = Image.open(io.BytesIO(data))
+    except Image.DecompressionBombError as exc:
+        raise ImageTooLargeError(str(exc)) from exc
+    _check_pixels(*img.size)
+    return img
+
+
+def estimate_decoded_bytes(data: bytes) -> int:
+    """Peak memory the stages may need for ``data``, from its header alone.
+
+    Counts a full decode in the image's own mode plus the RGB copy the
+    stages share, which over-estimates JPEGs decoded at reduced scale.
+    Images whose header cannot be read or is refused count as 0: the
+    stages fail on them without decoding anything.
+    """
+    try:
+        with _open(data) as img:
+            width, height = img.size
+            bands = len(img.getbands())
+    except Exception:
+        return 0
+    return width * height * (bands + _RGB_BYTES)
+
+
+class ImageContext:
+    """Lazily parsed view of a single image.
+
+    Parameters
+    ----------
+    data:
+        The raw bytes of the image file.
+    """
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self._header: Image.Image | None = None
+        self._size: tuple[int, int] = (0, 0)
+        self._drafted = False
+        self._container: scanner.ContainerMetadata | None = None
+        self._rgb: Image.Image | None = None
+        self._reduced: Image.Image | None = None
+
+    @property
+    def header(self) -> Image.Image:
+        """The opened (but not yet decoded) Pillow image.
+
+        Raises :class:`ImageTooLargeError` when the header declares more
+        than ``max_image_pixels`` pixels.
+        """
+        if self._header is None:
+            self._header = _open(self.data)
+            self._size = self._header.size
+        return self._header
+
+    @property
+    def size(self) -> tuple[int, int]:
+        """``(width, height)`` as declared by the image header."""
+        self.header  # noqa: B018 - opening the header records the size
+        return self._size
+
+    @property
+    def format(self) -> str:
+        """Upper-case container format, e.g. ``"JPEG"``."""
+        return (self.header.format or "UNKNOWN").upper()
+
+    @property
+    def container(self) -> scanner.ContainerMetadata:
+        """Metadata segments found by scanning the container headers."""
+        if self._container is None:
+            self._container = scanner.scan(
+                self.data, max_bytes=settings.metadata_scan_max_bytes,
+            )
+        return self._container
+
+    def rgb(self) -> Image.Image:
+        """Return the decoded RGB pixels, decoding on first call only.
+
+        The returned image is shared between stages and must not be
+        modified in place.
+        """
+        if self._rgb is None:
+            img = self.header
+            if self._drafted:
+                # The header was decoded at reduced scale; full-resolution
+                # pixels need a fresh decoder.
+                img = Image.open(io.BytesIO(self.data))
+            if img.mode == "RGB":
+                img.load()
+                self._rgb = img
+            else:
+                self._rgb = img.convert("RGB")
+        return self._rgb
+
+    def reduced_rgb(self, min_size: int) -> Image.Image:
+        """Return RGB pixels decoded close to ``min_size`` on the short side.
+
+        JPEGs are decoded with DCT scaling (``Image.draft``) and other
+        formats are box-reduced by an integer factor, so the result is
+        never smaller than ``min_size`` on either axis (unless the source
+        is) and at most about twice that.  Like :meth:`rgb`, the result is
+        shared and must not be modified in place.
+        """
+        if self._reduced is not None:
+            return self._reduced
+
+        if self._rgb is not None:
+            src = self._rgb
+        else:
+            src = self.header
+            if self.format in _DRAFT_FORMATS:
+                src.draft("RGB", (min_size, min_size))
+                self._drafted = src.size != self._size
+            src.load()
+
+        factor = min(src.width // min_size, src.height // min_size)
+        img = src.reduce(factor) if factor >= 2 else src
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+
+        if factor < 2 and not self._drafted:
+            # Nothing was scaled down: this is the full decode as well.
+            self._rgb = img
+        self._reduced = img
+        return img
+
+    def __enter__(self) -> ImageContext:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release decoded pixel buffers."""
+        closed: set[int] = set()
+        for img in (self._reduced, self._rgb, self._header):
+            if img is not None and id(img) not in closed:
+                closed.add(id(img))
+                img.close()
+        self._header = None
+        self._rgb = None
+        self._reduced = None
+        self._drafted = False
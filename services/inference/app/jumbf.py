@@ -0,0 +1,271 @@
+"""Reading C2PA manifest stores from JUMBF boxes.
+
+A C2PA manifest store is a JUMBF superbox (ISO/IEC 19566-5) embedded in
+the image: in JPEG APP11 segments (split across several segments for
+large manifests), in a PNG ``caBX`` chunk, or in a WebP ``C2PA`` chunk.
+:func:`manifest_store` reassembles it from what :mod:`app.scanner`
+collected and :func:`parse_store` walks its box tree, decoding the few
+CBOR structures provenance checking reports on.  No signature is checked
+here, see :mod:`app.provenance`.
+"""
+
+from __future__ import annotations
+
+import struct
+from dataclasses import dataclass, field
+
+from app.scanner import ContainerMetadata
+
+# JUMBF description-box type of a C2PA manifest store:
+# "c2pa" followed by the ISO common UUID suffix.
+_C2PA_STORE_TYPE = bytes.fromhex("6332706100110010800000aa00389b71")
+
+# COSE header label of the X.509 certificate chain (RFC 9360).
+_COSE_X5CHAIN = 33
+
+# CBOR nesting depth we follow before giving up on a structure.
+_MAX_CBOR_DEPTH = 32
+
+# JUMBF superbox nesting depth likewise; a C2PA store nests about five deep.
+_MAX_BOX_DEPTH = 16
+
+
+class JumbfError(ValueError):
+    """A manifest store that cannot be parsed."""
+
+
+@dataclass
+class Manifest:
+    """The fields of one manifest the pipeline reports on."""
+
+    label: str
+    claim_generator: str | None = None
+    digital_source_types: list[str] = field(default_factory=list)
+    certificate_chain: list[bytes] = field(default_factory=list)
+
+
+@dataclass
+class _Box:
+    type: bytes
+    payload: bytes
+    label: str | None = None
+    uuid: bytes | None = None
+    children: list[_Box] = field(default_factory=list)
+
+    def child(self, label: str) -> _Box | None:
+        return next((box for box in self.children if box.label == label), None)
+
+    def content(self, box_type: bytes) -> bytes | None:
+        return next((box.payload for box in self.children if box.type == box_type), None)
+
+
+# ---------------------------------------------------------------------------
+# Reassembly
+# ---------------------------------------------------------------------------
+
+def manifest_store(container: ContainerMetadata) -> bytes | None:
+    """The raw C2PA manifest-store superbox of a scanned image, if any."""
+    if not container.jumbf:
+        return None
+    if container.format != "JPEG":
+        return next((box for box in container.jumbf if _describes_c2pa_store(box)), None)
+
+    # JPEG APP11: "JP", box instance (En), packet sequence (Z), then the
+    # box.  Continuation packets repeat the 8-byte LBox/TBox header.
+    packets: dict[int, list[tuple[int, bytes]]] = {}
+    for segment in container.jumbf:
+        if len(segment) < 16:
+            continue
+        instance, sequence = struct.unpack(">HI", segment[2:8])
+        packets.setdefault(instance, []).append((sequence, segment[8:]))
+    for parts in packets.values():
+        parts.sort()
+        store = parts[0][1] + b"".join(part[8:] for _, part in parts[1:])
+        if _describes_c2pa_store(store):
+            return store
+    return None
+
+
+def _describes_c2pa_store(data: bytes) -> bool:
+    return data[4:8] == b"jumb" and data[16:32] == _C2PA_STORE_TYPE
+
+
+# ---------------------------------------------------------------------------
+# Box tree
+# ---------------------------------------------------------------------------
+
+def _boxes(data: bytes, depth: int = 0) -> list[_Box]:
+    if depth > _MAX_BOX_DEPTH:
+        raise JumbfError("JUMBF boxes nested too deeply")
+    boxes = []
+    pos = 0
+    while pos + 8 <= len(data):
+        size, box_type = struct.unpack(">I4s", data[pos:pos + 8])
+        header = 8
+        if size == 1:
+            (size,) = struct.unpack(">Q", data[pos + 8:pos + 16])
+            header = 16
+        elif size == 0:
+            size = len(data) - pos
+        if size < header or pos + size > len(data):
+            raise JumbfError(f"box {box_type!r} overruns its parent")
+        payload = data[pos + header:pos + size]
+        box = _Box(box_type, payload)
+        if box_type == b"jumb":
+            box.children = _boxes(payload, depth + 1)
+            if box.children and box.children[0].type == b"jumd":
+                box.uuid, box.label = _description(box.children[0].payload)
+        boxes.append(box)
+        pos += size
+    return boxes
+
+
+def _description(payload: bytes) -> tuple[bytes, str | None]:
+    """UUID and label of a JUMBF description box."""
+    uuid, toggles = payload[:16], payload[16]
+    label = None
+    if toggles & 0x02:
+        end = payload.index(b"\x00", 17)
+        label = payload[17:end].decode("utf-8", "replace")
+    return uuid, label
+
+
+def parse_store(store: bytes) -> list[Manifest]:
+    """Manifests of a C2PA store, oldest first (the last one is active).
+
+    Raises
+    ------
+    JumbfError
+        If ``store`` is not a well-formed C2PA manifest store.
+    """
+    try:
+        (root,) = _boxes(store)[:1] or (None,)
+        if root is None or root.uuid != _C2PA_STORE_TYPE:
+            raise JumbfError("not a C2PA manifest store")
+        return [_manifest(box) for box in root.children[1:] if box.type == b"jumb"]
+    except (struct.error, IndexError, ValueError, UnicodeDecodeError) as exc:
+        if isinstance(exc, JumbfError):
+            raise
+        raise JumbfError(f"malformed manifest store: {exc}") from exc
+
+
+def _manifest(box: _Box) -> Manifest:
+    manifest = Manifest(label=box.label or "")
+
+    claim_box = box.child("c2pa.claim.v2") or box.child("c2pa.claim")
+    claim = _cbor_content(claim_box)
+    if isinstance(claim, dict):
+        generator = claim.get("claim_generator")
+        info = claim.get("claim_generator_info")
+        if isinstance(info, list) and info:
+            info = info[0]
+        if isinstance(info, dict) and not generator:
+            generator = " ".join(str(info[key]) for key in ("name", "version") if key in info)
+        manifest.claim_generator = str(generator) if generator else None
+
+    assertions = box.child("c2pa.assertions")
+    for assertion in assertions.children if assertions else ():
+        if assertion.label and assertion.label.split("__")[0] in ("c2pa.actions", "c2pa.actions.v2"):
+            actions = _cbor_content(assertion)
+            for action in (actions or {}).get("actions", []) if isinstance(actions, dict) else []:
+                source = action.get("digitalSourceType") if isinstance(action, dict) else None
+                if isinstance(source, str) and source not in manifest.digital_source_types:
+                    manifest.digital_source_types.append(source)
+
+    manifest.certificate_chain = _x5chain(_cbor_content(box.child("c2pa.signature")))
+    return manifest
+
+
+def _cbor_content(box: _Box | None) -> object:
+    if box is None:
+        return None
+    payload = box.content(b"cbor")
+    if payload is None:
+        return None
+    value, _ = _cbor(payload, 0, 0)
+    return value
+
+
+def _x5chain(cose: object) -> list[bytes]:
+    """DER certificates of a COSE_Sign1 signature, signer first."""
+    if not isinstance(cose, list) or len(cose) != 4:
+        return []
+    headers = []
+    if isinstance(cose[0], bytes) and cose[0]:
+        headers.append(_cbor(cose[0], 0, 0)[0])
+    headers.append(cose[1])
+    for header in headers:
+        if isinstance(header, dict) and _COSE_X5CHAIN in header:
+            chain = header[_COSE_X5CHAIN]
+            chain = [chain] if isinstance(chain, bytes) else chain
+            return [cert for cert in chain if isinstance(cert, bytes)]
+    return []
+
+
+# ---------------------------------------------------------------------------
+# CBOR (RFC 8949), just enough for C2PA claims, assertions and COSE
+# ---------------------------------------------------------------------------
+
+def _cbor(data: bytes, pos: int, depth: int) -> tuple[object, int]:
+    if depth > _MAX_CBOR_DEPTH:
+        raise JumbfError("CBOR nested too deeply")
+    initial = data[pos]
+    major, info = initial >> 5, initial & 0x1F
+    pos += 1
+
+    if major == 7:
+        if info == 20:
+            return False, pos
+        if info == 21:
+            return True, pos
+        if info in (22, 23):
+            return None, pos
+        if info == 25:
+            return _half_float(data[pos:pos + 2]), pos + 2
+        if info == 26:
+            return struct.unpack(">f", data[pos:pos + 4])[0], pos + 4
+        if info == 27:
+            return struct.unpack(">d", data[pos:pos + 8])[0], pos + 8
+        raise JumbfError(f"unsupported CBOR simple value {info}")
+
+    if info < 24:
+        arg = info
+    elif info in (24, 25, 26, 27):
+        width = 1 << (info - 24)
+        if pos + width > len(data):
+            raise JumbfError("truncated CBOR")
+        arg = int.from_bytes(data[pos:pos + width], "big")
+        pos += width
+    else:
+        raise JumbfError("indefinite-length CBOR is not supported")
+
+    if major == 0:
+        return arg, pos
+    if major == 1:
+        return -1 - arg, pos
+    if major in (2, 3):
+        if pos + arg > len(data):
+            raise JumbfError("truncated CBOR")
+        raw = data[pos:pos + arg]
+        return (raw if major == 2 else raw.decode("utf-8")), pos + arg
+    if major == 4:
+        items = []
+        for _ in range(arg):
+            item, pos = _cbor(data, pos, depth + 1)
+            items.append(item)
+        return items, pos
+    if major == 5:
+        mapping = {}
+        for _ in range(arg):
+            key, pos = _cbor(data, pos, depth + 1)
+            value, pos = _cbor(data, pos, depth + 1)
+            if isinstance(key, (list, dict)):
+                raise JumbfError("unhashable CBOR map key")
+            mapping[key] = value
+        return mapping, pos
+    # major == 6: tag (COSE_Sign1 is tag 18); the tagged value is all we need.
+    return _cbor(data, pos, depth + 1)
+
+
+def _half_float(raw: bytes) -> float:
+    return struct.unpack(">e", raw)[0]
@@ -3,21 +3,95 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import logging
+import os
+import time
 import traceback
+from contextlib import asynccontextmanager
 
-import httpx
-from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Request
+from fastapi import BackgroundTasks, Depends, FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 
+from app import backends, clients, dedup, detector, imaging, jobqueue, metrics
+from app.cache import CachedResult, ResultCache, cache_key
 from app.config import settings
-from app.schemas import AnalyzeRequest
+from app.executor import MemoryBudget, PipelineExecutor, QueueFullError
+from app.schemas import AnalyzeBatchItem, AnalyzeBatchRequest, AnalyzeRequest, DeployModelsRequest
 
 logger = logging.getLogger("verifai.inference")
 
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Open pooled HTTP clients, warm the detector and start the job consumers.
+
+    Model warm-up runs in the background, so ``/health`` answers
+    immediately while ``/ready`` reports the model as loading until
+    warm-up completes.  On shutdown, running jobs are drained (jobs that
+    do not finish in time go back to the queue) before the HTTP clients
+    are closed.
+    """
+    clients.open_clients()
+    warmup = None
+    if settings.model_warmup:
+        warmup = asyncio.create_task(
+            asyncio.to_thread(detector.warm_up, settings.model_warmup_runs),
+        )
+    _job_runner.start()
+    yield
+    await _job_runner.drain(settings.job_queue_drain_seconds)
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+    await clients.close_clients()
+
+
 app = FastAPI(
     title="VerifAI Inference Service",
     version="0.1.0",
     docs_url="/docs",
+    lifespan=lifespan,
+)
+
+# Bounded admission for pipeline runs plus the compute pool (see app.executor).
+_executor = PipelineExecutor(
+    max_workers=settings.pipeline_concurrency,
+    max_queue=settings.pipeline_queue_size,
+    compute_threads=settings.compute_threads,
+)
+
+# Estimated decoded bytes of the images in the compute stages at once.
+_memory_budget = MemoryBudget(capacity_bytes=settings.memory_budget_bytes)
+
+# Per-image results, keyed by content hash + model version (see app.cache).
+_result_cache = ResultCache(
+    max_entries=settings.result_cache_max_entries,
+    ttl_seconds=settings.result_cache_ttl_seconds,
+    disk_path=(
+        os.path.join(settings.model_cache_dir, "results.sqlite3")
+        if settings.result_cache_disk
+        else None
+    ),
+    disk_max_entries=settings.result_cache_disk_max_entries,
+)
+
+# Accepted /analyze jobs, persisted until their callback (see app.jobqueue).
+_job_queue = jobqueue.JobQueue(
+    (
+        os.path.join(settings.model_cache_dir, "jobs.sqlite3")
+        if settings.job_queue_durable
+        else None
+    ),
+    max_pending=settings.job_queue_max_pending,
+    lease_seconds=settings.job_queue_lease_seconds,
+    retain_seconds=settings.job_queue_retain_seconds,
+)
+
+# Detector scores by perceptual hash, reused for near-duplicates (see app.dedup).
+_near_duplicates = dedup.NearDuplicateIndex(
+    max_entries=settings.near_duplicate_index_size,
+    ttl_seconds=settings.result_cache_ttl_seconds,
+    max_distance=settings.near_duplicate_max_distance,
 )
 
 
@@ -41,102 +115,682 @@ async def _verify_shared_secret(request: Request) -> None:
 # Background pipeline
 # ---------------------------------------------------------------------------
 
-def _run_pipeline(job_id: str, image_url: str, callback_url: str) -> None:
-    """Run the full analysis pipeline synchronously, then POST the result."""
+def _decode_data_url(image_url: str) -> bytes:
+    """Return the bytes embedded in a ``data:`` URL."""
     import base64
 
-    from app import detector, metadata, provenance, scoring
+    _, encoded = image_url.split(",", 1)
+    return base64.b64decode(encoded)
+
 
+def _find_near_duplicate(
+    image, version: str,
+) -> tuple[int | None, dedup.Match | None]:
+    """Perceptual hash of ``image`` and the near-duplicate it matches, if any."""
+    if not _near_duplicates.enabled or detector.is_disabled():
+        return None, None
     try:
-        # 1. Decode the image
-        if image_url.startswith("data:"):
-            _, encoded = image_url.split(",", 1)
-            image_bytes: bytes = base64.b64decode(encoded)
-        else:
-            # Synchronous download for background task
-            import httpx as httpx_sync
+        with metrics.timed("perceptual_hash"):
+            phash = dedup.image_hash(image)
+    except Exception:
+        # The detector reports decode failures itself.
+        return None, None
+    match = _near_duplicates.find(phash, version)
+    metrics.NEAR_DUPLICATE_LOOKUPS.inc(result="miss" if match is None else "hit")
+    return phash, match
 
-            with httpx_sync.Client(timeout=settings.download_timeout_seconds) as client:
-                img_resp = client.get(image_url)
-                img_resp.raise_for_status()
-                image_bytes = img_resp.content
 
-        # 2. Extract metadata
-        meta = metadata.extract_metadata(image_bytes)
+def _remember_score(phash: int | None, version: str, score: int | None) -> None:
+    if phash is not None and score is not None:
+        _near_duplicates.add(phash, version, score)
 
-        # 3. Check provenance
-        prov = provenance.check_provenance(image_bytes)
 
-        # 4. Run AI detector
-        ai_likelihood = detector.detect(image_bytes)
+def _analyze_image(image_bytes: bytes) -> CachedResult:
+    """Run the CPU-bound stages (hashing, metadata, decode, inference).
 
-        # 5. Build the report
-        report = scoring.build_report(
-            job_id=job_id,
-            ai_likelihood=ai_likelihood,
-            metadata=meta,
-            provenance=prov,
+    Called on the executor's compute pool.  Identical bytes analysed by
+    the same model version are served from the result cache without
+    re-running any stage, near-duplicates (resized or recompressed
+    copies) reuse the detector score of the image they match, and the
+    detector is skipped altogether when the header stages already decide
+    the report (see app.planner).  One model version, pinned for the
+    whole call, keys the cache and produces the score.
+    """
+    with detector.pinned() as version:
+        return _analyze_pinned(image_bytes, version)
+
+
+def _analyze_pinned(image_bytes: bytes, version: str) -> CachedResult:
+    from app import planner
+    from app.imaging import ImageContext
+
+    key = cache_key(image_bytes, version)
+    cached = _result_cache.get(key)
+    if cached is not None:
+        logger.info("Result cache hit for %s", key)
+        metrics.RESULT_CACHE_LOOKUPS.inc(result="hit")
+        return cached
+    metrics.RESULT_CACHE_LOOKUPS.inc(result="miss")
+
+    # Every stage shares one parsed view of the image, so headers are
+    # read once and pixels are decoded at most once per job.
+    with ImageContext(image_bytes) as image:
+        findings = planner.run_header_stages(image)
+        score, match = None, None
+        if findings.needs(planner.DETECTOR):
+            phash, match = _find_near_duplicate(image, version)
+            if match is not None:
+                score = match.score
+            else:
+                score = detector.detect(image)
+                _remember_score(phash, version, score)
+        result = CachedResult(
+            metadata=findings.metadata,
+            provenance=findings.provenance,
+            ai_likelihood=score,
+            near_duplicate_distance=match.distance if match else None,
+            skipped_stages=findings.skipped,
+            model_version=version if score is not None else None,
         )
 
-        # 6. POST the report back to the callback URL
-        with httpx.Client(timeout=10.0) as client:
-            client.post(
-                callback_url,
-                json=report.model_dump(),
-                headers={
-                    "Authorization": f"Bearer {settings.callback_auth_secret}",
-                    "Content-Type": "application/json",
-                },
+    # A missing score from a detector that ran means the model was
+    # unavailable; retry next time.
+    if result.ai_likelihood is not None or result.skipped_stages:
+        _result_cache.put(key, result)
+    return result
+
+
+def _analyze_images(blobs: list[bytes]) -> list[CachedResult | Exception]:
+    """Batch counterpart of :func:`_analyze_image`.
+
+    Cache misses that still need the detector after planning are decoded
+    and scored with a single :func:`detector.detect_many` call so they
+    share forward passes.  An image whose stages fail yields its
+    exception instead of a result.
+    """
+    with detector.pinned() as version:
+        return _analyze_batch_pinned(blobs, version)
+
+
+def _analyze_batch_pinned(blobs: list[bytes], version: str) -> list[CachedResult | Exception]:
+    from app import planner
+    from app.imaging import ImageContext
+
+    keys = [cache_key(blob, version) for blob in blobs]
+    results: list[CachedResult | Exception | None] = [_result_cache.get(key) for key in keys]
+    for result in results:
+        metrics.RESULT_CACHE_LOOKUPS.inc(result="miss" if result is None else "hit")
+
+    pending = []
+    try:
+        for index, blob in enumerate(blobs):
+            if results[index] is not None:
+                continue
+            image = ImageContext(blob)
+            try:
+                findings = planner.run_header_stages(image)
+            except Exception as exc:
+                image.close()
+                results[index] = exc
+                continue
+            pending.append((index, image, findings))
+
+        lookups = [
+            _find_near_duplicate(image, version) if findings.needs(planner.DETECTOR) else (None, None)
+            for _, image, findings in pending
+        ]
+        unmatched = [
+            n for n, ((_, _, findings), (_, match)) in enumerate(zip(pending, lookups))
+            if match is None and findings.needs(planner.DETECTOR)
+        ]
+        scores: list[int | None] = [match.score if match else None for _, match in lookups]
+        detected = detector.detect_many([pending[n][1] for n in unmatched])
+        for n, score in zip(unmatched, detected):
+            scores[n] = score
+            _remember_score(lookups[n][0], version, score)
+
+        for (index, _, findings), score, (_, match) in zip(pending, scores, lookups):
+            result = CachedResult(
+                ai_likelihood=score,
+                metadata=findings.metadata,
+                provenance=findings.provenance,
+                near_duplicate_distance=match.distance if match else None,
+                skipped_stages=findings.skipped,
+                model_version=version if score is not None else None,
             )
+            results[index] = result
+            if score is not None or result.skipped_stages:
+                _result_cache.put(keys[index], result)
+    finally:
+        for _, image, _ in pending:
+            image.close()
 
-        logger.info("Analysis complete for job %s", job_id)
+    return results
 
-    except Exception:
-        logger.exception("Analysis failed for job %s", job_id)
 
+def _estimate_all(blobs: list[bytes]) -> list[int]:
+    return [imaging.estimate_decoded_bytes(blob) for blob in blobs]
+
+
+def _failure_payload(job_id: str, exc: BaseException) -> dict[str, str]:
+    """Callback payload reporting that ``job_id`` could not be analysed."""
+    return {
+        "job_id": job_id,
+        "status": "failed",
+        "error": "".join(traceback.format_exception(exc)),
+    }
+
+
+async def _fetch_image(image_url: str) -> bytes:
+    """Decode a ``data:`` URL or download ``image_url`` (size-capped)."""
+    if image_url.startswith("data:"):
+        with metrics.timed("data_url_decode"):
+            return await _executor.run_cpu(_decode_data_url, image_url)
+    with metrics.timed("download"):
+        return await clients.download_image(image_url, max_bytes=settings.max_upload_bytes)
+
+
+def _analyze_head(head: bytes) -> CachedResult | None:
+    """Analyse an image from its leading bytes, if they are enough.
+
+    Returns ``None`` when the rest of the file is needed: its headers
+    run past ``head`` (a large ICC profile, XMP packet or C2PA manifest
+    before the frame header), it carries content credentials (whose
+    binding is verified over the whole file), or the detector has to run.
+    An image whose header declares too many pixels is refused here,
+    before the rest is downloaded.
+    """
+    from app import planner
+    from app.imaging import ImageContext, ImageTooLargeError
+
+    with ImageContext(head) as image:
+        container = image.container
+        if not container.headers_complete:
+            return None
         try:
-            with httpx.Client(timeout=10.0) as client:
-                client.post(
-                    callback_url,
-                    json={
-                        "job_id": job_id,
-                        "status": "failed",
-                        "error": traceback.format_exc(),
-                    },
-                    headers={
-                        "Authorization": f"Bearer {settings.callback_auth_secret}",
-                        "Content-Type": "application/json",
-                    },
-                )
+            image.size  # noqa: B018 - enforces the pixel limit
+        except ImageTooLargeError:
+            raise
         except Exception:
-            logger.exception(
-                "Failed to send failure callback for job %s", job_id,
+            # Pillow could not read the header from the partial buffer;
+            # the full download decides.
+            return None
+        # Only verified content credentials let the planner skip the
+        # detector, so without them a loaded detector always needs pixels.
+        if container.jumbf or not detector.is_disabled():
+            return None
+        findings = planner.run_header_stages(image)
+    return CachedResult(
+        metadata=findings.metadata,
+        provenance=findings.provenance,
+        ai_likelihood=None,
+        near_duplicate_distance=None,
+        skipped_stages=findings.skipped,
+        model_version=None,
+    )
+
+
+async def _fetch_or_analyze_head(image_url: str) -> tuple[bytes | None, CachedResult | None, int]:
+    """Read the head of ``image_url`` and download the rest only if needed.
+
+    Returns ``(image_bytes, None, size)`` when the pipeline needs the
+    whole image, or ``(None, result, size)`` when the head settled it.
+    """
+    max_bytes = settings.max_upload_bytes
+    with metrics.timed("download"):
+        head = await clients.download_head(
+            image_url, head_bytes=settings.image_head_bytes, max_bytes=max_bytes,
+        )
+    if head.complete:
+        return head.data, None, len(head.data)
+    result = await _executor.run_cpu(_analyze_head, head.data)
+    if result is not None:
+        return None, result, head.size or len(head.data)
+    with metrics.timed("download"):
+        image_bytes = await clients.download_rest(image_url, head, max_bytes=max_bytes)
+    return image_bytes, None, len(image_bytes)
+
+
+def _record_outcome(size: int, result: CachedResult) -> None:
+    """Count a finished image and record its size distribution."""
+    meta = result.metadata
+    metrics.observe_image(size, meta.width, meta.height, meta.format)
+    metrics.JOBS.inc(status="done")
+
+
+async def _run_pipeline(
+    job_id: str,
+    image_url: str | None,
+    callback_url: str,
+    image_bytes: bytes | None = None,
+) -> None:
+    """Run the full analysis pipeline, then POST the result.
+
+    The image is taken from ``image_bytes`` when the job arrived through
+    the binary route, otherwise it is decoded or downloaded from
+    ``image_url``.  A download starts with the image's headers only (see
+    :func:`_analyze_head`); the rest is fetched when a stage needs it.
+    Downloads and callbacks are awaited on the event loop; only the
+    CPU-bound stages occupy a compute thread.
+    """
+    from app import scoring
+
+    started = time.perf_counter()
+    try:
+        # 1. Fetch the image (or just its headers, if they settle the report)
+        result = None
+        if image_bytes is not None:
+            size = len(image_bytes)
+        elif settings.image_head_bytes > 0 and not image_url.startswith("data:"):
+            image_bytes, result, size = await _fetch_or_analyze_head(image_url)
+        else:
+            image_bytes = await _fetch_image(image_url)
+            size = len(image_bytes)
+
+        # 2-4. Metadata, provenance and (unless already decided) AI detection,
+        # once the image's estimated decoded size fits the memory budget
+        if result is None:
+            estimate = await _executor.run_cpu(imaging.estimate_decoded_bytes, image_bytes)
+            async with _memory_budget.reserve(estimate):
+                result = await _executor.run_cpu(_analyze_image, image_bytes)
+
+        # 5. Build the report
+        with metrics.timed("scoring"):
+            report = scoring.build_report(
+                job_id=job_id,
+                ai_likelihood=result.ai_likelihood,
+                metadata=result.metadata,
+                provenance=result.provenance,
+                near_duplicate_distance=result.near_duplicate_distance,
+                skipped_stages=result.skipped_stages,
+                model_version=result.model_version,
             )
 
+    except Exception as exc:
+        logger.exception("Analysis failed for job %s", job_id)
+        metrics.JOBS.inc(status="failed")
+
+        await clients.post_report(
+            callback_url, _failure_payload(job_id, exc), job_id=job_id,
+        )
+        metrics.JOB_SECONDS.observe(time.perf_counter() - started)
+        return
+
+    _record_outcome(size, result)
+
+    # 6. POST the report back to the callback URL (retried on failure)
+    if await clients.post_report(callback_url, report.model_dump(), job_id=job_id):
+        logger.info("Analysis complete for job %s", job_id)
+    metrics.JOB_SECONDS.observe(time.perf_counter() - started)
+
+
+async def _run_batch(items: list[AnalyzeBatchItem], emit) -> None:
+    """Analyse ``items`` chunk by chunk, awaiting ``emit(payload)`` per item.
+
+    Each chunk of up to ``detector_batch_max_size`` images is downloaded
+    concurrently, then analysed in a single compute-pool call so the
+    detector sees the whole chunk at once.  Payloads are reports, or
+    failure payloads for items that could not be analysed.
+    """
+    from app import scoring
+
+    chunk_size = max(1, settings.detector_batch_max_size)
+    for start in range(0, len(items), chunk_size):
+        chunk = items[start:start + chunk_size]
+        fetched = await asyncio.gather(
+            *(_fetch_image(item.image_url) for item in chunk),
+            return_exceptions=True,
+        )
+
+        blobs = [blob for blob in fetched if isinstance(blob, bytes)]
+        try:
+            estimate = sum(await _executor.run_cpu(_estimate_all, blobs))
+            async with _memory_budget.reserve(estimate):
+                analysed = iter(await _executor.run_cpu(_analyze_images, blobs))
+        except Exception as exc:
+            logger.exception("Batch chunk of %d images failed", len(blobs))
+            analysed = iter([exc] * len(blobs))
+
+        for item, blob in zip(chunk, fetched):
+            result = next(analysed) if isinstance(blob, bytes) else blob
+            if isinstance(result, BaseException):
+                logger.error("Analysis failed for job %s: %r", item.job_id, result)
+                metrics.JOBS.inc(status="failed")
+                await emit(_failure_payload(item.job_id, result))
+                continue
+            _record_outcome(len(blob), result)
+            with metrics.timed("scoring"):
+                report = scoring.build_report(
+                    job_id=item.job_id,
+                    ai_likelihood=result.ai_likelihood,
+                    metadata=result.metadata,
+                    provenance=result.provenance,
+                    near_duplicate_distance=result.near_duplicate_distance,
+                    skipped_stages=result.skipped_stages,
+                    model_version=result.model_version,
+                )
+            await emit(report.model_dump())
+
+
+async def _run_batch_callback(items: list[AnalyzeBatchItem], callback_url: str) -> None:
+    """Run a batch and POST its reports back, ``callback_batch_max_reports`` per callback.
+
+    The Worker's bulk endpoint refuses larger bodies, so a batch of more
+    reports than that is split over several callbacks.
+    """
+    reports: list[dict] = []
+
+    async def _collect(payload: dict) -> None:
+        reports.append(payload)
+
+    await _run_batch(items, _collect)
+    chunk_size = max(1, settings.callback_batch_max_reports)
+    delivered = 0
+    for start in range(0, len(reports), chunk_size):
+        chunk = reports[start:start + chunk_size]
+        batch_id = f"batch:{chunk[0]['job_id']}"
+        if await clients.post_callback(callback_url, {"reports": chunk}, job_id=batch_id):
+            delivered += len(chunk)
+    if delivered == len(reports):
+        logger.info("Batch analysis complete (%d jobs)", len(reports))
+
+
+async def _stream_batch(items: list[AnalyzeBatchItem], lines: asyncio.Queue) -> None:
+    """Run a batch, feeding NDJSON lines to ``lines`` (``None`` ends it)."""
+
+    async def _enqueue(payload: dict) -> None:
+        await lines.put(json.dumps(payload) + "\n")
+
+    try:
+        await _run_batch(items, _enqueue)
+    finally:
+        await lines.put(None)
+
+
+async def _run_job(job: jobqueue.Job) -> None:
+    """Run a queued job, or report it failed once it has used its attempts."""
+    if job.attempts > settings.job_queue_max_attempts:
+        logger.error("Giving up on job %s after %d attempts", job.job_id, job.attempts - 1)
+        metrics.JOBS.inc(status="failed")
+        await clients.post_report(
+            job.callback_url,
+            {
+                "job_id": job.job_id,
+                "status": "failed",
+                "error": f"Analysis did not finish after {job.attempts - 1} attempts",
+            },
+            job_id=job.job_id,
+        )
+        return
+    await _run_pipeline(job.job_id, job.image_url, job.callback_url, job.image_bytes)
+
+
+# Runs queued jobs through _executor (see app.jobqueue).
+_job_runner = jobqueue.JobRunner(
+    _job_queue,
+    _executor,
+    _run_job,
+    consumers=settings.job_queue_consumers,
+    poll_seconds=settings.job_queue_poll_seconds,
+)
+
+
+async def _await_job(task: asyncio.Task) -> None:
+    """Keep the request's background phase alive until the job finishes.
+
+    The pipeline itself is scheduled by ``_executor``; awaiting it here
+    means the server's graceful shutdown still waits for accepted jobs to
+    complete.
+    """
+    await task
+
+
+def _queue_full(job_id: str, queue_depth: int | None = None) -> HTTPException:
+    """Build the 503 returned when the executor or job queue is at capacity."""
+    logger.warning("Pipeline queue full, rejecting job %s", job_id)
+    metrics.JOBS_REJECTED.inc()
+    return HTTPException(
+        status_code=503,
+        detail="Inference queue is full",
+        headers={
+            "Retry-After": str(settings.pipeline_retry_after_seconds),
+            "X-Queue-Depth": str(_executor.queue_depth if queue_depth is None else queue_depth),
+        },
+    )
+
+
+async def _accept_job(
+    job_id: str,
+    background_tasks: BackgroundTasks,
+    response: Response,
+    image_url: str | None,
+    callback_url: str,
+    image_bytes: bytes | None = None,
+) -> dict[str, str | int]:
+    """Persist a job and start it, or leave it queued; 503 if the queue is full.
+
+    A job id that is already queued, running or recently done is
+    acknowledged again without being run twice.
+    """
+    try:
+        job = await asyncio.to_thread(
+            _job_queue.enqueue, job_id, image_url, callback_url, image_bytes, claim=True,
+        )
+    except QueueFullError:
+        raise _queue_full(job_id, _job_queue.pending)
+
+    if job is None:
+        logger.info("Job %s was already accepted", job_id)
+    else:
+        task = _job_runner.dispatch(job)
+        if task is not None:
+            background_tasks.add_task(_await_job, task)
+
+    queue_depth = _job_queue.stats()["queued"] + _executor.queue_depth
+    response.headers["X-Queue-Depth"] = str(queue_depth)
+    return {"status": "accepted", "job_id": job_id, "queue_depth": queue_depth}
+
+
+async def _deploy_models(specs: list[backends.ModelSpec]) -> None:
+    """Run a model deploy off the event loop."""
+    try:
+        await asyncio.to_thread(detector.deploy, specs, settings.model_warmup_runs)
+    except Exception:
+        # Logged by detector.deploy; the previous model keeps serving.
+        pass
+
+
+async def _read_body_capped(request: Request, limit: int) -> bytes:
+    """Stream the request body into memory, refusing anything over ``limit``."""
+    declared = request.headers.get("Content-Length", "")
+    if declared.isdigit() and int(declared) > limit:
+        raise HTTPException(status_code=413, detail="Image too large")
+
+    buf = bytearray()
+    async for chunk in request.stream():
+        if len(buf) + len(chunk) > limit:
+            raise HTTPException(status_code=413, detail="Image too large")
+        buf.extend(chunk)
+
+    if not buf:
+        raise HTTPException(status_code=400, detail="Empty body")
+    return bytes(buf)
+
 
 # ---------------------------------------------------------------------------
 # Routes
 # ---------------------------------------------------------------------------
 
 @app.get("/health")
-async def health() -> dict[str, str]:
-    """Lightweight health-check endpoint."""
-    return {"status": "ok"}
+async def health() -> dict[str, object]:
+    """Lightweight health-check endpoint, including pipeline load."""
+    return {
+        "status": "ok",
+        **_executor.stats(),
+        "memory_budget": _memory_budget.stats(),
+        "result_cache": _result_cache.stats(),
+        "job_queue": _job_queue.stats(),
+    }
+
+
+@app.get("/metrics")
+async def prometheus_metrics() -> Response:
+    """Prometheus scrape endpoint: stage latencies, load and model state."""
+    load = _executor.stats()
+    metrics.JOBS_IN_FLIGHT.set(load["in_flight"])
+    metrics.QUEUE_DEPTH.set(load["queue_depth"])
+    metrics.QUEUE_CAPACITY.set(load["capacity"])
+    budget = _memory_budget.stats()
+    metrics.MEMORY_BUDGET_RESERVED.set(budget["reserved_bytes"])
+    metrics.MEMORY_BUDGET_WAITING.set(budget["waiting"])
+    jobs = _job_queue.stats()
+    metrics.JOB_QUEUE_QUEUED.set(jobs["queued"])
+    metrics.JOB_QUEUE_RUNNING.set(jobs["running"])
+    metrics.MODEL_LOADED.set(1 if detector.status()["state"] == "ready" else 0)
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/ready")
+async def ready() -> JSONResponse:
+    """Readiness probe: 200 once the detector can serve, 503 before that.
+
+    A service without the ML dependencies installed is ready -- it serves
+    metadata/provenance-only reports by design.
+    """
+    model = detector.status()
+    is_ready = model["state"] in ("ready", "disabled")
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "model": model},
+    )
 
 
 @app.post("/analyze", dependencies=[Depends(_verify_shared_secret)])
 async def analyze(
     request: AnalyzeRequest,
     background_tasks: BackgroundTasks,
-) -> dict[str, str]:
+    response: Response,
+) -> dict[str, str | int]:
     """Accept an analysis job and run the pipeline in the background.
 
-    Returns immediately so the calling Worker doesn't time out.
+    Returns immediately so the calling Worker doesn't time out.  The job is
+    persisted first (see app.jobqueue), so it survives a restart.  When the
+    job queue is full the job is refused with a 503 and a ``Retry-After``
+    header so the Worker can back off and retry.
     """
-    background_tasks.add_task(
-        _run_pipeline,
+    return await _accept_job(
         request.job_id,
+        background_tasks,
+        response,
         request.image_url,
         request.callback_url,
     )
-    return {"status": "accepted", "job_id": request.job_id}
+
+
+@app.post("/analyze/batch", dependencies=[Depends(_verify_shared_secret)], response_model=None)
+async def analyze_batch(
+    request: AnalyzeBatchRequest,
+    background_tasks: BackgroundTasks,
+    response: Response,
+) -> dict[str, str | int] | StreamingResponse:
+    """Accept many analysis jobs in one request.
+
+    The batch takes a single pipeline slot and its images go through the
+    detector together.  With a ``callback_url`` the request returns
+    immediately and all reports are POSTed back in one callback;
+    otherwise the reports are streamed back as NDJSON, one line per item
+    in submission order.
+    """
+    items = request.items
+    if not items:
+        raise HTTPException(status_code=422, detail="Batch has no items")
+    if len(items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(items)} items; the limit is {settings.batch_max_items}",
+        )
+
+    batch_id = f"batch:{items[0].job_id}"
+    if request.callback_url is not None:
+        try:
+            task = _executor.submit(_run_batch_callback, items, request.callback_url)
+        except QueueFullError:
+            raise _queue_full(batch_id)
+        background_tasks.add_task(_await_job, task)
+        queue_depth = _executor.queue_depth
+        response.headers["X-Queue-Depth"] = str(queue_depth)
+        return {"status": "accepted", "jobs": len(items), "queue_depth": queue_depth}
+
+    lines: asyncio.Queue = asyncio.Queue()
+    try:
+        task = _executor.submit(_stream_batch, items, lines)
+    except QueueFullError:
+        raise _queue_full(batch_id)
+
+    async def _body():
+        try:
+            while (line := await lines.get()) is not None:
+                yield line
+        finally:
+            # Stop work nobody will read if the client went away.
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(_body(), media_type="application/x-ndjson")
+
+
+@app.post("/analyze/binary", dependencies=[Depends(_verify_shared_secret)])
+async def analyze_binary(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    response: Response,
+    job_id: str = Header(alias="X-Job-Id"),
+    object_key: str = Header(alias="X-Object-Key"),  # noqa: ARG001
+    callback_url: str = Header(alias="X-Callback-Url"),
+) -> dict[str, str | int]:
+    """Accept an analysis job whose raw image bytes are the request body.
+
+    Job metadata travels in ``X-Job-Id`` / ``X-Object-Key`` /
+    ``X-Callback-Url`` headers, which avoids base64-inflating the image
+    into a JSON payload.  The body is streamed into a buffer capped at
+    ``max_upload_bytes``.
+    """
+    # Refuse early so a busy service doesn't read bodies it will drop.
+    if _job_queue.is_full:
+        raise _queue_full(job_id, _job_queue.pending)
+
+    image_bytes = await _read_body_capped(request, settings.max_upload_bytes)
+
+    return await _accept_job(
+        job_id,
+        background_tasks,
+        response,
+        None,
+        callback_url,
+        image_bytes,
+    )
+
+
+@app.post("/models", dependencies=[Depends(_verify_shared_secret)], status_code=202)
+async def deploy_models(
+    request: DeployModelsRequest,
+    background_tasks: BackgroundTasks,
+) -> dict[str, str]:
+    """Hot-swap the detector to ``models`` (several entries: an ensemble).
+
+    The new version loads and warms up in the background while the
+    current one keeps serving; ``/ready`` shows it under
+    ``model.deploying`` until it takes over as ``model.version``.
+    """
+    try:
+        specs = backends.parse_model_specs(",".join(request.models))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if detector.is_disabled():
+        raise HTTPException(status_code=409, detail="AI detection is disabled")
+    deploying = detector.status()["deploying"]
+    if deploying:
+        raise HTTPException(status_code=409, detail=f"Model {deploying} is still loading")
+
+    background_tasks.add_task(_deploy_models, specs)
+    return {"status": "accepted", "deploying": detector.model_version(specs)}
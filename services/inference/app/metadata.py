@@ -1,54 +1,90 @@
-"""Image metadata extraction using Pillow and exifread."""
+"""Image metadata extraction from the container headers."""
 
 from __future__ import annotations
 
-import io
+from app.imaging import ImageContext
+from app.scanner import TAG_MAKE, TAG_MODEL, TAG_SOFTWARE
+from app.schemas import MetadataResult
 
-import exifread
-from PIL import Image
+# PNG text keywords under which diffusion UIs store generation settings,
+# in order of preference: AUTOMATIC1111 / Forge, ComfyUI, InvokeAI,
+# NovelAI.
+_GENERATION_KEYS = (
+    "parameters",
+    "prompt",
+    "workflow",
+    "invokeai_metadata",
+    "sd-metadata",
+    "Dream",
+    "Comment",
+)
 
-from app.schemas import MetadataResult
+# Longest generation_parameters value included in the report.
+_MAX_PARAMETERS_CHARS = 2000
+
+
+def _tag_text(value: object) -> str | None:
+    """Normalise an EXIF tag value to a stripped string (or None)."""
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", errors="replace")
+    text = str(value).replace("\x00", "").strip()
+    return text or None
 
 
-def extract_metadata(image_bytes: bytes) -> MetadataResult:
-    """Extract structural and EXIF metadata from raw image bytes.
+def _generation_parameters(text: dict[str, str]) -> str | None:
+    for key in _GENERATION_KEYS:
+        value = _tag_text(text.get(key))
+        if value:
+            return value[:_MAX_PARAMETERS_CHARS]
+    return None
+
+
+def extract_metadata(image: ImageContext) -> MetadataResult:
+    """Extract structural and embedded metadata from the job's image.
 
     Parameters
     ----------
-    image_bytes:
-        The raw bytes of the image file.
+    image:
+        The shared per-job image context.  Only headers are read: JPEG
+        segments before the first scan, PNG chunks before the first IDAT
+        and WebP metadata chunks (see :mod:`app.scanner`); no pixel data
+        is decoded.
 
     Returns
     -------
     MetadataResult
-        Populated metadata including dimensions, format, and any EXIF fields
-        we care about (camera make/model, software tag).
+        Populated metadata including dimensions, format, the EXIF fields
+        we care about (camera make/model, software tag), XMP generator
+        fields and any embedded generation parameters.
     """
 
-    # --- Structural info via Pillow -------------------------------------------
-    img = Image.open(io.BytesIO(image_bytes))
-    width, height = img.size
-    img_format = (img.format or "UNKNOWN").upper()
+    # --- Structural info from the header -------------------------------------
+    width, height = image.size
+    img_format = image.format
 
-    # --- EXIF info via exifread -----------------------------------------------
-    tags = exifread.process_file(io.BytesIO(image_bytes), details=False)
-
-    has_exif = len(tags) > 0
+    # --- Embedded metadata (one bounded pass over the container) --------------
+    container = image.container
+    if container.format is not None:
+        tags: dict[int, object] = container.ifd0
+        has_exif = container.has_exif
+    else:
+        # Containers the scanner does not walk (GIF, BMP, ...) rarely carry
+        # EXIF; let Pillow look.
+        tags = dict(image.header.getexif())
+        has_exif = len(tags) > 0
 
     # Camera make / model
     camera_make_model: str | None = None
-    make_tag = tags.get("Image Make")
-    model_tag = tags.get("Image Model")
-    if make_tag or model_tag:
-        parts = [str(make_tag).strip() if make_tag else None,
-                 str(model_tag).strip() if model_tag else None]
-        camera_make_model = " ".join(p for p in parts if p)
-
-    # Software tag (e.g. "Adobe Photoshop", "DALL-E", etc.)
-    software_tag: str | None = None
-    sw = tags.get("Image Software")
-    if sw:
-        software_tag = str(sw).strip()
+    make = _tag_text(tags.get(TAG_MAKE))
+    model = _tag_text(tags.get(TAG_MODEL))
+    if make or model:
+        camera_make_model = " ".join(p for p in (make, model) if p)
+
+    # Software tag (e.g. "Adobe Photoshop", "DALL-E", etc.), falling back to
+    # the PNG "Software" text chunk.
+    software_tag = _tag_text(tags.get(TAG_SOFTWARE)) or _tag_text(container.text.get("Software"))
 
     return MetadataResult(
         has_exif=has_exif,
@@ -57,4 +93,7 @@ def extract_metadata(image_bytes: bytes) -> MetadataResult:
         width=width,
         height=height,
         format=img_format,
+        xmp_creator_tool=container.xmp_field("CreatorTool"),
+        digital_source_type=container.xmp_field("DigitalSourceType"),
+        generation_parameters=_generation_parameters(container.text),
     )
@@ -0,0 +1,354 @@
+"""Prometheus metrics for the inference service.
+
+A small, dependency-free registry of counters, gauges and histograms,
+rendered in the Prometheus text exposition format (version 0.0.4) by the
+``/metrics`` route.  Pipeline code records into the module-level metrics
+below; point-in-time gauges (queue depth, in-flight jobs, model state)
+are refreshed by the route just before rendering.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    """Base class: a named metric family with a fixed set of label names."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self._lock:
+            lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {} if labelnames else {(): 0}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> Iterator[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {} if labelnames else {(): 0}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> Iterator[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Distribution of observations over cumulative ``le`` buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        *,
+        buckets: tuple[float, ...],
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket..., +Inf count], sum
+        self._values: dict[tuple[str, ...], tuple[list[int], float]] = {}
+        if not labelnames:
+            self._values[()] = ([0] * (len(self.buckets) + 1), 0.0)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def _samples(self) -> Iterator[str]:
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield (
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} "
+                    f"{cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    """Ordered collection of metrics rendered together."""
+
+    def __init__(self) -> None:
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+# Latency buckets from 1 ms up to model-load territory (minutes).
+_SECONDS_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+
+# ---------------------------------------------------------------------------
+# Pipeline metrics
+# ---------------------------------------------------------------------------
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "verifai_stage_duration_seconds",
+    "Time spent in each pipeline stage.",
+    ("stage",),
+    buckets=_SECONDS_BUCKETS,
+))
+
+JOB_SECONDS = REGISTRY.register(Histogram(
+    "verifai_job_duration_seconds",
+    "End-to-end time of a single-image job, from start to callback.",
+    buckets=_SECONDS_BUCKETS,
+))
+
+JOBS = REGISTRY.register(Counter(
+    "verifai_jobs_total",
+    "Analysed images by outcome.",
+    ("status",),
+))
+
+JOBS_REJECTED = REGISTRY.register(Counter(
+    "verifai_jobs_rejected_total",
+    "Jobs refused with 503 because the pipeline queue was full.",
+))
+
+JOBS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "verifai_jobs_in_flight",
+    "Pipeline runs currently executing.",
+))
+
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "verifai_queue_depth",
+    "Accepted jobs waiting for a pipeline slot.",
+))
+
+QUEUE_CAPACITY = REGISTRY.register(Gauge(
+    "verifai_queue_capacity",
+    "Maximum number of running plus queued jobs.",
+))
+
+JOB_QUEUE_QUEUED = REGISTRY.register(Gauge(
+    "verifai_job_queue_queued",
+    "Persisted jobs waiting to be claimed by a consumer.",
+))
+
+JOB_QUEUE_RUNNING = REGISTRY.register(Gauge(
+    "verifai_job_queue_running",
+    "Persisted jobs claimed and not yet finished, across processes.",
+))
+
+JOBS_REDELIVERED = REGISTRY.register(Counter(
+    "verifai_jobs_redelivered_total",
+    "Persisted jobs claimed again after an earlier attempt did not finish.",
+))
+
+MEMORY_BUDGET_RESERVED = REGISTRY.register(Gauge(
+    "verifai_memory_budget_reserved_bytes",
+    "Estimated decoded bytes of the images currently being analysed.",
+))
+
+MEMORY_BUDGET_WAITING = REGISTRY.register(Gauge(
+    "verifai_memory_budget_waiting",
+    "Analyses waiting for their image to fit the memory budget.",
+))
+
+RESULT_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "verifai_result_cache_lookups_total",
+    "Result cache lookups by outcome.",
+    ("result",),
+))
+
+NEAR_DUPLICATE_LOOKUPS = REGISTRY.register(Counter(
+    "verifai_near_duplicate_lookups_total",
+    "Perceptual-hash index lookups by outcome (a hit skips inference).",
+    ("result",),
+))
+
+STAGES_SKIPPED = REGISTRY.register(Counter(
+    "verifai_stages_skipped_total",
+    "Stages the planner skipped because earlier results decided the report.",
+    ("stage",),
+))
+
+C2PA_TRUST_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "verifai_c2pa_trust_cache_lookups_total",
+    "C2PA certificate-chain validation cache lookups by outcome.",
+    ("result",),
+))
+
+CALLBACK_RETRIES = REGISTRY.register(Counter(
+    "verifai_callback_retries_total",
+    "Callback attempts that failed transiently and were retried.",
+))
+
+CALLBACK_FAILURES = REGISTRY.register(Counter(
+    "verifai_callback_failures_total",
+    "Callbacks that were rejected or gave up after every retry.",
+))
+
+CALLBACK_BATCH_SIZE = REGISTRY.register(Histogram(
+    "verifai_callback_batch_size",
+    "Reports per bulk report callback.",
+    buckets=(2, 4, 8, 16, 32, 64),
+))
+
+MODEL_LOADED = REGISTRY.register(Gauge(
+    "verifai_model_loaded",
+    "1 when the detector model is loaded and serving, else 0.",
+))
+
+MODEL_DEPLOYS = REGISTRY.register(Counter(
+    "verifai_model_deploys_total",
+    "Model hot swaps by outcome.",
+    ("result",),
+))
+
+INFERENCE_BATCH_SIZE = REGISTRY.register(Histogram(
+    "verifai_inference_batch_size",
+    "Images per detector forward pass.",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+))
+
+CROP_REFINEMENTS = REGISTRY.register(Counter(
+    "verifai_crop_refinements_total",
+    "Images whose uncertain whole-image score was refined with crops.",
+))
+
+IMAGE_BYTES = REGISTRY.register(Histogram(
+    "verifai_image_bytes",
+    "Encoded size of analysed images.",
+    ("format",),
+    buckets=tuple(float(2 ** n) for n in range(14, 26)),  # 16 KiB .. 32 MiB
+))
+
+IMAGE_PIXELS = REGISTRY.register(Histogram(
+    "verifai_image_pixels",
+    "Pixel count (width x height) of analysed images.",
+    ("format",),
+    buckets=(65_536, 262_144, 1_048_576, 2_097_152, 4_194_304, 8_388_608, 16_777_216, 33_554_432),
+))
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Record the duration of the ``with`` block under ``stage``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+
+
+def observe_image(size_bytes: int, width: int, height: int, fmt: str) -> None:
+    """Record the size distribution of one analysed image."""
+    IMAGE_BYTES.observe(size_bytes, format=fmt)
+    IMAGE_PIXELS.observe(width * height, format=fmt)
+
+
+def render() -> str:
+    """Every registered metric in Prometheus text format."""
+    return REGISTRY.render()
@@ -0,0 +1,339 @@
+"""Standalone model server shared by every API worker on a host.
+
+Each uvicorn worker process would otherwise load its own copy of the
+model.  With ``detector_backend="remote"`` a single
+``python -m app.model_server`` process owns the weights instead: workers
+write decoded RGB pixels into a ``multiprocessing.shared_memory`` block
+and send only the block's name and the image sizes over a Unix socket.
+The server coalesces requests from every worker into batched forward
+passes, so HTTP handling and inference scale independently.
+
+Run one server per host, or one per NUMA node (e.g. under ``numactl``)
+with each group of workers pointed at its node's ``model_server_socket``.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+from multiprocessing import resource_tracker, shared_memory
+
+from PIL import Image
+
+from app import backends
+from app.batching import MicroBatcher
+from app.config import settings
+
+logger = logging.getLogger("verifai.model_server")
+
+# Every message is a 4-byte big-endian length followed by a JSON object.
+_HEADER = struct.Struct("!I")
+
+
+# ---------------------------------------------------------------------------
+# Wire protocol
+# ---------------------------------------------------------------------------
+
+def _send(sock: socket.socket, message: dict) -> None:
+    data = json.dumps(message).encode()
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("Model server connection closed")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _recv(sock: socket.socket) -> dict:
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, size))
+
+
+# ---------------------------------------------------------------------------
+# Shared-memory image handoff
+# ---------------------------------------------------------------------------
+
+def _write_images(images: list[Image.Image]) -> tuple[shared_memory.SharedMemory, list[list[int]]]:
+    """Copy RGB pixels into a new shared-memory block; the caller unlinks it."""
+    rgb = [img if img.mode == "RGB" else img.convert("RGB") for img in images]
+    shapes = [[img.width, img.height] for img in rgb]
+    block = shared_memory.SharedMemory(
+        create=True, size=max(1, sum(w * h * 3 for w, h in shapes)),
+    )
+    offset = 0
+    for img in rgb:
+        data = img.tobytes()
+        block.buf[offset:offset + len(data)] = data
+        offset += len(data)
+    return block, shapes
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Open a block created by another process without taking ownership.
+
+    The creating worker unlinks the block; the server must not, so it is
+    kept out of this process's resource tracker.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        block = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(block._name, "shared_memory")  # noqa: SLF001
+        return block
+
+
+def _read_images(name: str, shapes: list[list[int]]) -> list[Image.Image]:
+    """Rebuild the images described by ``shapes`` from a shared-memory block."""
+    block = _attach(name)
+    try:
+        images = []
+        offset = 0
+        for width, height in shapes:
+            size = width * height * 3
+            view = block.buf[offset:offset + size]
+            try:
+                images.append(Image.frombytes("RGB", (width, height), view))
+            finally:
+                view.release()
+            offset += size
+        return images
+    finally:
+        block.close()
+
+
+# ---------------------------------------------------------------------------
+# Server
+# ---------------------------------------------------------------------------
+
+class _Handler(socketserver.BaseRequestHandler):
+    """Serve requests from one worker connection until it closes."""
+
+    def setup(self) -> None:
+        with self.server.connections_lock:
+            self.server.connections.add(self.request)
+
+    def finish(self) -> None:
+        with self.server.connections_lock:
+            self.server.connections.discard(self.request)
+
+    def handle(self) -> None:
+        while True:
+            try:
+                message = _recv(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                reply = self.server.model_server.handle(message)
+            except Exception as exc:  # noqa: BLE001 - reported to the worker
+                logger.exception("Model server request failed")
+                reply = {"error": f"{type(exc).__name__}: {exc}"}
+            _send(self.request, reply)
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    model_server: ModelServer
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.connections: set[socket.socket] = set()
+        self.connections_lock = threading.Lock()
+
+    def close_connections(self) -> None:
+        with self.connections_lock:
+            for conn in self.connections:
+                try:
+                    conn.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+class ModelServer:
+    """Serve a detector backend to worker processes over a Unix socket.
+
+    Parameters
+    ----------
+    backend:
+        The loaded backend that runs forward passes.
+    socket_path:
+        Filesystem path of the Unix socket to listen on.
+    max_batch_size, max_wait_seconds:
+        Micro-batching limits applied across all connected workers.
+    """
+
+    def __init__(
+        self,
+        backend: backends.DetectorBackend,
+        *,
+        socket_path: str,
+        max_batch_size: int,
+        max_wait_seconds: float,
+    ) -> None:
+        self._backend = backend
+        self._socket_path = socket_path
+        self._batcher: MicroBatcher[Image.Image, float] = MicroBatcher(
+            backend.predict,
+            max_batch_size=max_batch_size,
+            max_wait_seconds=max_wait_seconds,
+            name="model-server-batcher",
+        )
+        self._server: _UnixServer | None = None
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+
+    def handle(self, message: dict) -> dict:
+        """Answer one decoded request message."""
+        op = message.get("op")
+        if op == "predict":
+            images = _read_images(message["shm"], message["shapes"])
+            return {"probs": self._batcher.submit_many(images)}
+        if op == "info":
+            return {"backend": self._backend.name, "ai_index": self._backend.ai_index}
+        raise ValueError(f"Unknown model server op {op!r}")
+
+    def serve_forever(self) -> None:
+        """Listen on the socket until :meth:`shutdown` is called."""
+        if os.path.exists(self._socket_path):
+            os.unlink(self._socket_path)  # left behind by a previous run
+        self._server = _UnixServer(self._socket_path, _Handler)
+        self._server.model_server = self
+        self._ready.set()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self._socket_path):
+                os.unlink(self._socket_path)
+            self._stopped.set()
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        """Block until the socket is accepting connections."""
+        return self._ready.wait(timeout)
+
+    def shutdown(self) -> None:
+        """Stop :meth:`serve_forever` and drop worker connections.
+
+        Call from another thread.  Workers reconnect on their next request.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.close_connections()
+            self._stopped.wait()
+
+
+# ---------------------------------------------------------------------------
+# Client
+# ---------------------------------------------------------------------------
+
+class RemoteBackend(backends.DetectorBackend):
+    """Detector backend that forwards images to a :class:`ModelServer`.
+
+    One connection is kept open per worker process and re-established
+    if the server restarts.  Construction fails when the server is not
+    reachable, so the detector's load backoff covers server start-up.
+    """
+
+    name = "remote"
+
+    def __init__(self, socket_path: str, *, timeout: float) -> None:
+        self._socket_path = socket_path
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._sock: socket.socket | None = None
+        info = self._call({"op": "info"})
+        self.ai_index = info["ai_index"]
+        logger.info("Connected to model server at %s (%s)", socket_path, info["backend"])
+
+    def predict(self, images: list[Image.Image]) -> list[float]:
+        if not images:
+            return []
+        block, shapes = _write_images(images)
+        try:
+            reply = self._call({"op": "predict", "shm": block.name, "shapes": shapes})
+        finally:
+            block.close()
+            block.unlink()
+        return [float(p) for p in reply["probs"]]
+
+    def close(self) -> None:
+        """Close the connection to the server."""
+        with self._lock:
+            self._disconnect()
+
+    def _call(self, message: dict) -> dict:
+        with self._lock:
+            for attempt in (1, 2):
+                reused = self._sock is not None
+                try:
+                    sock = self._connect()
+                    _send(sock, message)
+                    reply = _recv(sock)
+                    break
+                except OSError:
+                    self._disconnect()
+                    # A kept-alive connection may have been closed by a
+                    # server restart; retry once on a fresh one.
+                    if not (reused and attempt == 1):
+                        raise
+        if "error" in reply:
+            raise RuntimeError(f"Model server error: {reply['error']}")
+        return reply
+
+    def _connect(self) -> socket.socket:
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self._timeout)
+            try:
+                sock.connect(self._socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._sock = sock
+        return self._sock
+
+    def _disconnect(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+def main() -> None:
+    """Load the model once and serve it on ``settings.model_server_socket``."""
+    logging.basicConfig(level=logging.INFO)
+    if settings.model_server_backend.lower() == "remote":
+        raise ValueError('model_server_backend must be a local backend, not "remote"')
+
+    backend = backends.create_backend(settings.model_server_backend)
+    if settings.model_warmup:
+        sample = Image.effect_noise((224, 224), 64).convert("RGB")
+        for _ in range(settings.model_warmup_runs):
+            backend.predict([sample])
+
+    server = ModelServer(
+        backend,
+        socket_path=settings.model_server_socket,
+        max_batch_size=settings.detector_batch_max_size,
+        max_wait_seconds=settings.detector_batch_max_wait_ms / 1000,
+    )
+    logger.info(
+        "Serving %s (%s backend) on %s",
+        settings.model_name, backend.name, settings.model_server_socket,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
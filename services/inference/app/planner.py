@@ -0,0 +1,119 @@
+"""Cost-ordered planning of the per-image analysis stages.
+
+The stages differ in cost by orders of magnitude.  Metadata and
+provenance read headers that the container scan (:mod:`app.scanner`) has
+already collected.  The detector decodes pixels and runs a forward pass.
+The planner runs the cheap stages first, cheapest first, and before each
+stage asks whether the results so far already decide the report.  A
+stage that can no longer change the outcome is skipped, and the reason
+travels with the result so that the report can say so (see
+:func:`app.scoring.build_report`).
+
+One rule applies today: a valid C2PA manifest that declares AI generation
+is high-confidence on its own (:func:`app.scoring.c2pa_declares_ai`), so
+the detector is not run for it.
+
+The detector itself is run by the caller (:mod:`app.main`), which batches
+it across images and reuses near-duplicate scores; the planner only
+decides whether it is needed.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from app import metadata, metrics, provenance, scoring
+from app.config import settings
+from app.imaging import ImageContext
+from app.schemas import MetadataResult, ProvenanceResult
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One analysis stage.
+
+    ``cost`` is a rough per-image cost in milliseconds on a typical
+    upload.  It is only used to order the stages.
+    """
+
+    name: str
+    cost: float
+
+
+METADATA = Stage("metadata", 0.05)
+PROVENANCE = Stage("provenance", 0.5)
+DETECTOR = Stage("detector", 50.0)
+
+STAGES: tuple[Stage, ...] = tuple(
+    sorted((DETECTOR, METADATA, PROVENANCE), key=lambda stage: stage.cost)
+)
+
+
+@dataclass
+class Findings:
+    """Outputs of the stages run so far, plus the stages skipped and why."""
+
+    metadata: MetadataResult | None = None
+    provenance: ProvenanceResult | None = None
+    skipped: dict[str, str] = field(default_factory=dict)
+
+    def needs(self, stage: Stage) -> bool:
+        return stage.name not in self.skipped
+
+
+def skip_reason(stage: Stage, findings: Findings) -> str | None:
+    """Why ``stage`` cannot change the report given ``findings``, or None."""
+    if not settings.planner_skip_decided_stages:
+        return None
+    if (
+        stage is DETECTOR
+        and findings.provenance is not None
+        and scoring.c2pa_declares_ai(findings.provenance)
+    ):
+        return "valid C2PA content credentials already declare the image AI-generated"
+    return None
+
+
+def _run_metadata(image: ImageContext, findings: Findings) -> None:
+    findings.metadata = metadata.extract_metadata(image)
+
+
+def _run_provenance(image: ImageContext, findings: Findings) -> None:
+    findings.provenance = provenance.check_provenance(image)
+
+
+# Stages the planner runs itself; the others are only planned.
+_RUNNERS: dict[str, Callable[[ImageContext, Findings], None]] = {
+    METADATA.name: _run_metadata,
+    PROVENANCE.name: _run_provenance,
+}
+
+
+def run_header_stages(image: ImageContext) -> Findings:
+    """Run the header-only stages in cost order and plan the rest.
+
+    Parameters
+    ----------
+    image:
+        The shared per-job image context.  Pixels are not decoded.
+
+    Returns
+    -------
+    Findings
+        Metadata and provenance results.  Any stage made unnecessary by
+        the stages before it is listed in ``skipped``; callers check
+        :meth:`Findings.needs` before running the detector.
+    """
+    findings = Findings()
+    for stage in STAGES:
+        reason = skip_reason(stage, findings)
+        if reason is not None:
+            findings.skipped[stage.name] = reason
+            metrics.STAGES_SKIPPED.inc(stage=stage.name)
+            continue
+        runner = _RUNNERS.get(stage.name)
+        if runner is not None:
+            with metrics.timed(stage.name):
+                runner(image, findings)
+    return findings
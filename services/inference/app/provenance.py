@@ -1,33 +1,317 @@
 """Content-provenance (C2PA) verification.
 
-TODO: Integrate the c2pa-python library once it is stable enough for
-production use.  The C2PA SDK will let us parse embedded manifests and
-verify the trust chain, giving us a much stronger provenance signal.
+Checking is tiered so that images without content credentials cost
+(almost) nothing:
+
+1. The container scan shared with metadata extraction
+   (:mod:`app.scanner`) already collected any JUMBF boxes -- JPEG APP11,
+   PNG ``caBX``, WebP ``C2PA`` or the TIFF C2PA tag.  With none there is
+   nothing more to do.
+2. The manifest store is parsed (:mod:`app.jumbf`) for the claim
+   generator, the declared digital source type and the signing
+   certificates.
+3. Manifest signatures and content bindings are verified with the
+   optional ``c2pa-python`` library (``requirements-c2pa.txt``).
+4. The signing certificate chain is validated against the configured
+   trust anchors with ``cryptography``.  A handful of signers (camera
+   makers, generator vendors) account for nearly every manifest, so the
+   result is cached by certificate fingerprint.
 """
 
 from __future__ import annotations
 
+import functools
+import hashlib
+import io
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from app import jumbf, metrics
+from app.config import settings
+from app.imaging import ImageContext
 from app.schemas import ProvenanceResult
 
+logger = logging.getLogger("verifai.provenance")
+
+_MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+    "TIFF": "image/tiff",
+}
+
+# IPTC digital source types meaning the content came from a generative model.
+_AI_SOURCE_TYPES = frozenset({
+    "trainedAlgorithmicMedia",
+    "compositeWithTrainedAlgorithmicMedia",
+})
+
+# Validation codes left to our own chain check (trust verification is
+# disabled in the c2pa library so that it can be cached).
+_TRUST_CODES = frozenset({"signingCredential.untrusted"})
+
+
+# ---------------------------------------------------------------------------
+# Certificate-chain cache
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class ChainVerdict:
+    """Outcome of validating one signing certificate chain."""
+
+    trusted: bool | None
+    signer: str | None = None
+    note: str | None = None
+
+
+class TrustCache:
+    """Thread-safe LRU of chain verdicts keyed by certificate fingerprint.
+
+    Parameters
+    ----------
+    max_entries:
+        Capacity; ``0`` disables caching.
+    ttl_seconds:
+        Verdicts older than this are re-validated, so changes to the
+        trust anchors (or expiring certificates) are picked up.
+    """
+
+    def __init__(self, *, max_entries: int, ttl_seconds: float) -> None:
+        self._max_entries = max(0, max_entries)
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, ChainVerdict]] = OrderedDict()
+
+    def get(self, fingerprint: str) -> ChainVerdict | None:
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                return None
+            stored_at, verdict = entry
+            if time.monotonic() - stored_at > self._ttl:
+                del self._entries[fingerprint]
+                return None
+            self._entries.move_to_end(fingerprint)
+            return verdict
+
+    def put(self, fingerprint: str, verdict: ChainVerdict) -> None:
+        if not self._max_entries:
+            return
+        with self._lock:
+            self._entries[fingerprint] = (time.monotonic(), verdict)
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+_trust_cache = TrustCache(
+    max_entries=settings.c2pa_trust_cache_size,
+    ttl_seconds=settings.c2pa_trust_cache_ttl_seconds,
+)
+
+
+@functools.lru_cache(maxsize=4)
+def _trust_anchors(path: str | None) -> tuple:
+    """Certificates from the PEM bundle at ``path`` (loaded once)."""
+    if not path:
+        return ()
+    from cryptography import x509
+
+    with open(path, "rb") as fh:
+        return tuple(x509.load_pem_x509_certificates(fh.read()))
+
+
+def _subject_name(cert) -> str | None:
+    from cryptography.x509.oid import NameOID
+
+    for oid in (NameOID.ORGANIZATION_NAME, NameOID.COMMON_NAME):
+        attributes = cert.subject.get_attributes_for_oid(oid)
+        if attributes:
+            return str(attributes[0].value)
+    return None
+
 
-def check_provenance(image_bytes: bytes) -> ProvenanceResult:  # noqa: ARG001
+def _issued_by(cert, issuer) -> bool:
+    try:
+        cert.verify_directly_issued_by(issuer)
+    except Exception:  # noqa: BLE001 - InvalidSignature, ValueError, TypeError
+        return False
+    return True
+
+
+def validate_chain(chain: list[bytes]) -> ChainVerdict:
+    """Validate a signer-first DER certificate chain against the trust anchors.
+
+    Every certificate must be signed by the next one, and the last one
+    must be a trust anchor or be issued by one.  Validity periods are not
+    checked: C2PA signatures are judged at signing time, which needs a
+    trusted timestamp this check does not have.
+    """
+    try:
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes
+    except ImportError:
+        return ChainVerdict(None, note="Signer trust not checked (cryptography is not installed).")
+
+    try:
+        certs = [x509.load_der_x509_certificate(der) for der in chain]
+    except ValueError:
+        return ChainVerdict(False, note="Signing certificate could not be parsed.")
+    signer = _subject_name(certs[0])
+
+    anchors = _trust_anchors(settings.c2pa_trust_anchors_path)
+    if not anchors:
+        return ChainVerdict(None, signer, "Signer trust not checked (no trust anchors configured).")
+
+    for child, parent in zip(certs, certs[1:]):
+        if not _issued_by(child, parent):
+            return ChainVerdict(False, signer, "Signing certificate chain is broken.")
+
+    root = certs[-1]
+    anchor_prints = {anchor.fingerprint(hashes.SHA256()) for anchor in anchors}
+    if root.fingerprint(hashes.SHA256()) in anchor_prints or any(
+        _issued_by(root, anchor) for anchor in anchors
+    ):
+        return ChainVerdict(True, signer)
+    return ChainVerdict(False, signer, "Signer is not on the C2PA trust list.")
+
+
+def _chain_verdict(chain: list[bytes]) -> ChainVerdict:
+    """:func:`validate_chain`, cached by the signing certificate's fingerprint."""
+    if not chain:
+        return ChainVerdict(False, note="Manifest signature carries no certificate.")
+    fingerprint = hashlib.sha256(chain[0]).hexdigest()
+    verdict = _trust_cache.get(fingerprint)
+    if verdict is not None:
+        metrics.C2PA_TRUST_CACHE_LOOKUPS.inc(result="hit")
+        return verdict
+    metrics.C2PA_TRUST_CACHE_LOOKUPS.inc(result="miss")
+    verdict = validate_chain(chain)
+    _trust_cache.put(fingerprint, verdict)
+    return verdict
+
+
+# ---------------------------------------------------------------------------
+# Signature verification
+# ---------------------------------------------------------------------------
+
+def _failure_codes(store: dict) -> list[str]:
+    """Validation failure codes reported by the c2pa library."""
+    results = store.get("validation_results")
+    if isinstance(results, dict):
+        entries = (results.get("activeManifest") or {}).get("failure", [])
+    else:
+        entries = store.get("validation_status") or []
+    codes = [entry.get("code", "") for entry in entries if isinstance(entry, dict)]
+    return [code for code in codes if code and code not in _TRUST_CODES]
+
+
+def _verify_signature(data: bytes, fmt: str) -> tuple[bool | None, str | None]:
+    """Check manifest signatures and content bindings with c2pa-python."""
+    try:
+        import c2pa
+    except ImportError:
+        return None, "Manifest signature not verified (c2pa-python is not installed)."
+
+    try:
+        context = c2pa.Context(c2pa.Settings.from_dict({"verify": {"verify_trust": False}}))
+        with c2pa.Reader(_MIME_TYPES.get(fmt), io.BytesIO(data), context=context) as reader:
+            store = json.loads(reader.json())
+    except Exception as exc:  # noqa: BLE001 - c2pa.C2paError subclasses, bad JSON
+        logger.info("C2PA manifest could not be verified: %s", exc)
+        return False, "Manifest could not be verified."
+
+    failures = _failure_codes(store)
+    if failures:
+        return False, f"Manifest validation failed: {', '.join(failures)}."
+    return True, None
+
+
+def _source_term(uri: str) -> str:
+    """Last path segment of an IPTC digital-source-type URI."""
+    return uri.rstrip("/").rsplit("/", 1)[-1]
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def check_provenance(image: ImageContext) -> ProvenanceResult:
     """Check for C2PA content-provenance data in the image.
 
     Parameters
     ----------
-    image_bytes:
-        The raw bytes of the image file (unused in the MVP stub).
+    image:
+        The shared per-job image context.  Its container scan locates any
+        manifest store; pixels are never decoded.
 
     Returns
     -------
     ProvenanceResult
-        For the MVP this always reports that C2PA data is absent.
+        ``c2pa_valid`` is True when the manifest signature verifies and
+        the signer is trusted (or trust could not be checked), False when
+        either check fails, and None when the signature could not be
+        checked at all.
     """
 
-    # TODO: Replace this stub with real C2PA manifest parsing using
-    # the c2pa-python library (https://github.com/contentauth/c2pa-python).
+    store = jumbf.manifest_store(image.container)
+    if store is None:
+        return ProvenanceResult(c2pa_present=False, c2pa_valid=None, notes=[])
+
+    try:
+        manifests = jumbf.parse_store(store)
+    except jumbf.JumbfError as exc:
+        logger.info("Malformed C2PA manifest store: %s", exc)
+        return ProvenanceResult(
+            c2pa_present=True,
+            c2pa_valid=False,
+            notes=["C2PA manifest store is malformed."],
+        )
+    if not manifests:
+        return ProvenanceResult(
+            c2pa_present=True,
+            c2pa_valid=False,
+            notes=["C2PA manifest store contains no manifests."],
+        )
+
+    active = manifests[-1]
+    notes: list[str] = []
+
+    # An AI-generated ingredient (an earlier manifest) still makes the
+    # edited result AI-derived.
+    declared = [source for manifest in reversed(manifests) for source in manifest.digital_source_types]
+    ai_sources = [source for source in declared if _source_term(source) in _AI_SOURCE_TYPES]
+    source_type = (ai_sources or declared or [None])[0]
+    if ai_sources:
+        notes.append(f"Manifest declares AI-generated content ({_source_term(source_type)}).")
+
+    valid, signature_note = _verify_signature(image.data, image.container.format or "")
+    if signature_note:
+        notes.append(signature_note)
+
+    verdict = _chain_verdict(active.certificate_chain)
+    if verdict.note:
+        notes.append(verdict.note)
+    if verdict.trusted is False:
+        valid = False
+
     return ProvenanceResult(
-        c2pa_present=False,
-        c2pa_valid=None,
-        notes=["C2PA verification not yet implemented"],
+        c2pa_present=True,
+        c2pa_valid=valid,
+        notes=notes,
+        claim_generator=active.claim_generator,
+        signer=verdict.signer,
+        digital_source_type=source_type,
     )
@@ -0,0 +1,154 @@
+"""Loaded detector model versions and zero-downtime switching between them.
+
+A :class:`Deployment` is one servable model version -- a single
+classifier or an ensemble -- together with its own micro-batcher, so a
+batch never mixes images scored by different versions.  The
+:class:`ModelRegistry` holds the active deployment.  A new version is
+loaded and warmed next to it, then made active in one assignment; the
+previous deployment stops taking new work and is unloaded as soon as the
+work already using it has finished.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+from PIL import Image
+
+from app.backends import DetectorBackend
+from app.batching import MicroBatcher
+
+logger = logging.getLogger("verifai.registry")
+
+
+class Deployment:
+    """One loaded model version and the work in flight on it.
+
+    Parameters
+    ----------
+    version:
+        Identifier of the scores it produces (see detector.model_version).
+    backend:
+        The loaded backend.
+    run_batch:
+        Batched predict function handed to the deployment's micro-batcher.
+    max_batch_size, max_wait_seconds:
+        Micro-batching parameters (see :class:`MicroBatcher`).
+    """
+
+    def __init__(
+        self,
+        version: str,
+        backend: DetectorBackend,
+        run_batch: Callable[[list[Image.Image]], list[float]],
+        *,
+        max_batch_size: int,
+        max_wait_seconds: float,
+    ) -> None:
+        self.version = version
+        self.backend = backend
+        self.batcher: MicroBatcher[Image.Image, float] = MicroBatcher(
+            run_batch,
+            max_batch_size=max_batch_size,
+            max_wait_seconds=max_wait_seconds,
+            name=f"detector-batcher[{version}]",
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._retired = False
+        self._closed = False
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return self._in_flight
+
+    @property
+    def closed(self) -> bool:
+        with self._lock:
+            return self._closed
+
+    def _acquire(self) -> bool:
+        with self._lock:
+            if self._closed:
+                return False
+            self._in_flight += 1
+            return True
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            drained = self._retired and self._in_flight == 0
+        if drained:
+            self._close()
+
+    def retire(self) -> None:
+        """Take no new work; unload once the work in flight has finished."""
+        with self._lock:
+            self._retired = True
+            drained = self._in_flight == 0
+        if drained:
+            self._close()
+
+    def _close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self.batcher.close()
+        try:
+            self.backend.close()
+        except Exception:
+            logger.exception("Failed to close model %s", self.version)
+        logger.info("Unloaded model %s", self.version)
+
+
+class ModelRegistry:
+    """The active deployment, swapped atomically."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._active: Deployment | None = None
+
+    @property
+    def active(self) -> Deployment | None:
+        return self._active
+
+    def activate(self, deployment: Deployment) -> None:
+        """Route new work to ``deployment`` and retire the previous one."""
+        with self._lock:
+            previous, self._active = self._active, deployment
+        logger.info("Serving model %s", deployment.version)
+        if previous is not None and previous is not deployment:
+            previous.retire()
+
+    def clear(self) -> None:
+        """Retire the active deployment, leaving nothing loaded."""
+        with self._lock:
+            previous, self._active = self._active, None
+        if previous is not None:
+            previous.retire()
+
+    @contextmanager
+    def acquire(self) -> Iterator[Deployment | None]:
+        """Hold the active deployment (None if nothing is loaded) for the block.
+
+        The deployment stays loaded until the block exits, even if another
+        one is activated meanwhile.
+        """
+        while True:
+            deployment = self._active
+            if deployment is None:
+                yield None
+                return
+            if deployment._acquire():
+                break
+            # Retired and unloaded between the read and the acquire; the
+            # registry already points at its replacement.
+        try:
+            yield deployment
+        finally:
+            deployment._release()
@@ -0,0 +1,316 @@
+"""Single-pass, bounded scanner for embedded image metadata.
+
+Walks the container structure once and reads only metadata segments:
+
+* JPEG -- APP1 (EXIF, XMP) and APP11 (JUMBF) segments, stopping at the
+  first SOS marker, i.e. before any entropy-coded image data.
+* PNG -- ancillary chunks (eXIf, tEXt, zTXt, iTXt, caBX) before the first IDAT.
+* WebP -- RIFF EXIF / XMP / C2PA chunks; image chunks are skipped by length
+  without being read.
+* TIFF -- IFD0 only (including its XMP and C2PA tags).
+
+Metadata cost is therefore bounded by the size of the headers (and capped
+by ``max_bytes``), not by the size of the file.  Only the EXIF fields,
+XMP generator fields and text chunks the pipeline reports are decoded.
+"""
+
+from __future__ import annotations
+
+import re
+import struct
+import zlib
+from dataclasses import dataclass, field
+
+# IFD0 tag identifiers (TIFF 6.0 / EXIF 2.3).
+TAG_MAKE = 0x010F
+TAG_MODEL = 0x0110
+TAG_SOFTWARE = 0x0131
+_TAG_XMP = 0x02BC
+_TAG_C2PA = 0xCD41
+
+_ASCII_TAGS = frozenset({TAG_MAKE, TAG_MODEL, TAG_SOFTWARE})
+
+# Longest text value kept from a PNG text chunk (ComfyUI workflows can be
+# hundreds of KB of JSON; we only surface a summary).
+_MAX_TEXT_CHARS = 16 * 1024
+
+_JPEG_SOI = b"\xff\xd8"
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_EXIF_HEADER = b"Exif\x00\x00"
+_XMP_HEADER = b"http://ns.adobe.com/xap/1.0/\x00"
+_XMP_PNG_KEYWORD = "XML:com.adobe.xmp"
+
+# XMP searched for a property; real packets are a few KB plus padding.
+_MAX_XMP_CHARS = 64 * 1024
+# Longest namespace prefix and property value recognised in XMP.
+_MAX_XMP_PREFIX = 64
+_XMP_ATTRIBUTE = re.compile(r'\s{0,64}=\s{0,64}"([^"]{0,1024})"')
+_XMP_ELEMENT = re.compile(
+    r"(?:\s[^>]{0,1024})?>\s{0,256}"
+    r"(?:<rdf:\w{1,16}>\s{0,256}<rdf:li[^>]{0,1024}>)?\s{0,256}([^<]{1,1024})"
+)
+
+
+@dataclass
+class ContainerMetadata:
+    """What one scan found."""
+
+    format: str | None = None
+    ifd0: dict[int, str] = field(default_factory=dict)
+    ifd0_entries: int = 0
+    xmp: str | None = None
+    text: dict[str, str] = field(default_factory=dict)
+    jumbf: list[bytes] = field(default_factory=list)
+    bytes_read: int = 0
+    # The scan reached the image data (JPEG SOS, PNG IDAT), so the bytes
+    # it was given hold every metadata segment of the file.  WebP and TIFF
+    # may keep metadata after the image data and never set this.
+    headers_complete: bool = False
+
+    @property
+    def has_exif(self) -> bool:
+        return self.ifd0_entries > 0
+
+    def xmp_field(self, name: str) -> str | None:
+        """Value of an XMP property (any namespace prefix), e.g. ``CreatorTool``."""
+        if not self.xmp:
+            return None
+        return _xmp_value(self.xmp, name)
+
+
+class _Budget:
+    """Running total of bytes read, capped at ``limit``."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.used = 0
+
+    def take(self, size: int) -> bool:
+        if self.used + size > self.limit:
+            return False
+        self.used += size
+        return True
+
+
+def scan(data: bytes, *, max_bytes: int = 1024 * 1024) -> ContainerMetadata:
+    """Scan ``data`` and return its metadata, reading at most ``max_bytes``.
+
+    Unknown containers, truncated files and malformed segments never
+    raise: the scan simply stops and returns what it found so far.
+    """
+    budget = _Budget(max_bytes)
+    result = ContainerMetadata()
+    try:
+        if data.startswith(_JPEG_SOI):
+            result.format = "JPEG"
+            _scan_jpeg(data, result, budget)
+        elif data.startswith(_PNG_SIGNATURE):
+            result.format = "PNG"
+            _scan_png(data, result, budget)
+        elif data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+            result.format = "WEBP"
+            _scan_webp(data, result, budget)
+        elif data[:4] in (b"II*\x00", b"MM\x00*"):
+            result.format = "TIFF"
+            _parse_tiff(data, result, budget)
+    except (struct.error, IndexError, ValueError, zlib.error):
+        pass
+    result.bytes_read = budget.used
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Containers
+# ---------------------------------------------------------------------------
+
+def _scan_jpeg(data: bytes, result: ContainerMetadata, budget: _Budget) -> None:
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker == 0xDA or marker == 0xD9:  # SOS / EOI: no metadata beyond
+            result.headers_complete = True
+            return
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01:  # standalone markers
+            pos += 2
+            continue
+
+        (length,) = struct.unpack(">H", data[pos + 2:pos + 4])
+        start, end = pos + 4, pos + 2 + length
+        if marker in (0xE1, 0xEB):  # APP1, APP11
+            if not budget.take(length):
+                return
+            payload = data[start:end]
+            if marker == 0xE1 and payload.startswith(_EXIF_HEADER):
+                if not result.ifd0_entries:
+                    _parse_tiff(payload[len(_EXIF_HEADER):], result, budget, charge=False)
+            elif marker == 0xE1 and payload.startswith(_XMP_HEADER):
+                result.xmp = result.xmp or payload[len(_XMP_HEADER):].decode("utf-8", "replace")
+            elif marker == 0xEB and payload[:2] == b"JP":
+                result.jumbf.append(payload)
+        pos = end
+
+
+def _scan_png(data: bytes, result: ContainerMetadata, budget: _Budget) -> None:
+    pos = len(_PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length, ctype = struct.unpack(">I4s", data[pos:pos + 8])
+        start, end = pos + 8, pos + 8 + length
+        if ctype in (b"IDAT", b"IEND"):
+            result.headers_complete = True
+            return
+        if ctype in (b"eXIf", b"tEXt", b"zTXt", b"iTXt", b"caBX"):
+            if not budget.take(length):
+                return
+            payload = data[start:end]
+            if ctype == b"eXIf":
+                _parse_tiff(payload, result, budget, charge=False)
+            elif ctype == b"caBX":
+                result.jumbf.append(payload)
+            else:
+                _png_text(ctype, payload, result)
+        pos = end + 4  # skip CRC
+
+
+def _png_text(ctype: bytes, payload: bytes, result: ContainerMetadata) -> None:
+    keyword, _, rest = payload.partition(b"\x00")
+    key = keyword.decode("latin-1")
+    if ctype == b"tEXt":
+        text = rest.decode("latin-1")
+    elif ctype == b"zTXt":
+        text = _inflate(rest[1:]).decode("latin-1")
+    else:  # iTXt: compression flag, method, language\0, translated keyword\0, text
+        compressed = rest[0] == 1
+        _language, _, rest = rest[2:].partition(b"\x00")
+        _translated, _, raw = rest.partition(b"\x00")
+        text = (_inflate(raw) if compressed else raw).decode("utf-8", "replace")
+
+    if key == _XMP_PNG_KEYWORD:
+        result.xmp = result.xmp or text
+    elif key and key not in result.text:
+        result.text[key] = text[:_MAX_TEXT_CHARS]
+
+
+def _inflate(raw: bytes) -> bytes:
+    """Decompress at most a bounded amount of a zlib stream."""
+    return zlib.decompressobj().decompress(raw, _MAX_TEXT_CHARS * 4)
+
+
+def _scan_webp(data: bytes, result: ContainerMetadata, budget: _Budget) -> None:
+    (riff_size,) = struct.unpack("<I", data[4:8])
+    end_of_riff = min(len(data), 8 + riff_size)
+    pos = 12
+    while pos + 8 <= end_of_riff:
+        fourcc, length = struct.unpack("<4sI", data[pos:pos + 8])
+        start, end = pos + 8, pos + 8 + length
+        if fourcc in (b"EXIF", b"XMP ", b"C2PA"):
+            if not budget.take(length):
+                return
+            payload = data[start:end]
+            if fourcc == b"EXIF":
+                if payload.startswith(_EXIF_HEADER):
+                    payload = payload[len(_EXIF_HEADER):]
+                _parse_tiff(payload, result, budget, charge=False)
+            elif fourcc == b"XMP ":
+                result.xmp = payload.decode("utf-8", "replace")
+            else:
+                result.jumbf.append(payload)
+        pos = end + (length & 1)  # chunks are padded to an even size
+
+
+# ---------------------------------------------------------------------------
+# TIFF / EXIF
+# ---------------------------------------------------------------------------
+
+def _parse_tiff(
+    tiff: bytes,
+    result: ContainerMetadata,
+    budget: _Budget,
+    *,
+    charge: bool = True,
+) -> None:
+    """Read the ASCII tags we report (plus XMP and C2PA) from IFD0 of a TIFF structure.
+
+    ``charge`` is False when ``tiff`` is a segment already paid for.
+    """
+    order = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+    if order is None:
+        return
+    (ifd_offset,) = struct.unpack(order + "I", tiff[4:8])
+    (count,) = struct.unpack(order + "H", tiff[ifd_offset:ifd_offset + 2])
+    if charge and not budget.take(8 + 2 + count * 12):
+        return
+    result.ifd0_entries = count
+
+    for index in range(count):
+        entry = ifd_offset + 2 + index * 12
+        tag, kind, n, value = struct.unpack(order + "HHI4s", tiff[entry:entry + 12])
+        if tag not in _ASCII_TAGS and tag not in (_TAG_XMP, _TAG_C2PA):
+            continue
+        if kind not in (1, 2, 7):  # BYTE, ASCII, UNDEFINED
+            continue
+        if n <= 4:
+            raw = value[:n]
+        else:
+            (offset,) = struct.unpack(order + "I", value)
+            if charge and not budget.take(n):
+                return
+            raw = tiff[offset:offset + n]
+        if tag == _TAG_C2PA:
+            result.jumbf.append(raw)
+        elif tag == _TAG_XMP:
+            result.xmp = result.xmp or raw.decode("utf-8", "replace")
+        else:
+            text = raw.replace(b"\x00", b"").decode("utf-8", "replace").strip()
+            if text:
+                result.ifd0[tag] = text
+
+
+# ---------------------------------------------------------------------------
+# XMP
+# ---------------------------------------------------------------------------
+
+def _xmp_value(xmp: str, name: str) -> str | None:
+    """Find ``prefix:name`` as an attribute or a simple element in an XMP packet.
+
+    The packet comes from the uploaded file, so the search is linear:
+    occurrences of ``:name`` are found with :meth:`str.find` and only a
+    bounded prefix before and value after each one is examined.
+    """
+    xmp = xmp[:_MAX_XMP_CHARS]
+    needle = ":" + name
+    element_value: str | None = None
+    pos = xmp.find(needle)
+    while pos != -1:
+        end = pos + len(needle)
+        start = _xmp_prefix_start(xmp, pos)
+        if start is not None:
+            match = _XMP_ATTRIBUTE.match(xmp, end)
+            if match is not None:
+                return match.group(1).strip() or None
+            if element_value is None and start > 0 and xmp[start - 1] == "<":
+                match = _XMP_ELEMENT.match(xmp, end)
+                if match is not None:
+                    element_value = match.group(1).strip() or None
+        pos = xmp.find(needle, end)
+    return element_value
+
+
+def _xmp_prefix_start(xmp: str, colon: int) -> int | None:
+    """Start of the namespace prefix ending at ``colon``, or None if there is none."""
+    start = colon
+    while start > 0 and colon - start <= _MAX_XMP_PREFIX and _is_name_char(xmp[start - 1]):
+        start -= 1
+    if start == colon or colon - start > _MAX_XMP_PREFIX:
+        return None
+    if not (xmp[start].isalpha() or xmp[start] == "_"):
+        return None
+    return start
+
+
+def _is_name_char(char: str) -> bool:
+    return char.isalnum() or char in "_.-"
@@ -18,6 +18,35 @@ class AnalyzeRequest(BaseModel):
     callback_url: str
 
 
+class AnalyzeBatchItem(BaseModel):
+    """One image of an /analyze/batch request."""
+
+    job_id: str
+    object_key: str
+    image_url: str
+
+
+class AnalyzeBatchRequest(BaseModel):
+    """Many analysis jobs submitted in a single request.
+
+    With ``callback_url`` every report is POSTed back in one batched
+    callback once all items are done; without it, reports are streamed
+    in the response as NDJSON.
+    """
+
+    items: list[AnalyzeBatchItem]
+    callback_url: str | None = None
+
+
+class DeployModelsRequest(BaseModel):
+    """Models to hot-swap in: one entry, or several for an ensemble.
+
+    Each entry is ``name[@revision][*weight]``.
+    """
+
+    models: list[str]
+
+
 # ---------------------------------------------------------------------------
 # Sub-models used inside the analysis report
 # ---------------------------------------------------------------------------
@@ -28,10 +57,14 @@ class ProvenanceResult(BaseModel):
     c2pa_present: bool
     c2pa_valid: bool | None = None
     notes: list[str] = []
+    # From the active manifest, when one is present.
+    claim_generator: str | None = None
+    signer: str | None = None
+    digital_source_type: str | None = None
 
 
 class MetadataResult(BaseModel):
-    """Image metadata extracted via Pillow + exifread."""
+    """Image metadata read from the container headers."""
 
     has_exif: bool
     camera_make_model: str | None = None
@@ -39,6 +72,14 @@ class MetadataResult(BaseModel):
     width: int
     height: int
     format: str
+    # XMP xmp:CreatorTool, e.g. "Adobe Firefly" or "Midjourney".
+    xmp_creator_tool: str | None = None
+    # XMP Iptc4xmpExt:DigitalSourceType, e.g. the IPTC
+    # ".../digitalsourcetype/trainedAlgorithmicMedia" term.
+    digital_source_type: str | None = None
+    # Generation settings embedded by diffusion UIs in PNG text chunks
+    # (prompt, sampler, seed ...), truncated.
+    generation_parameters: str | None = None
 
 
 # ---------------------------------------------------------------------------
@@ -53,6 +94,8 @@ class AnalysisReport(BaseModel):
     ai_likelihood: int | None = None
     confidence: str | None = None
     verdict_text: str | None = None
+    # Detector model version that produced ai_likelihood.
+    model_version: str | None = None
     evidence: list[str] = []
     provenance: ProvenanceResult
     metadata: MetadataResult
@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+import re
+
 from app.schemas import AnalysisReport, MetadataResult, ProvenanceResult
 
 # ---------------------------------------------------------------------------
@@ -26,6 +28,10 @@ _SCREENSHOT_SOFTWARE_HINTS = frozenset({
 })
 
 
+# "AI" as a word in a provenance note (not the "ai" in "chain" or "contains").
+_AI_NOTE = re.compile(r"\bai\b", re.IGNORECASE)
+
+
 # ---------------------------------------------------------------------------
 # Helper predicates
 # ---------------------------------------------------------------------------
@@ -51,6 +57,15 @@ def _is_good_quality(metadata: MetadataResult) -> bool:
     )
 
 
+def c2pa_declares_ai(provenance: ProvenanceResult) -> bool:
+    """Whether valid C2PA credentials declare the image AI-generated."""
+    return bool(
+        provenance.c2pa_present
+        and provenance.c2pa_valid
+        and any(_AI_NOTE.search(n) for n in provenance.notes)
+    )
+
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
@@ -67,13 +82,15 @@ def compute_confidence(
     Rules
     -----
     **Low** when any of these hold:
-      - ``ai_likelihood`` is ``None`` (model unavailable)
+      - ``ai_likelihood`` is ``None`` (model unavailable or skipped) and
+        C2PA does not declare AI generation
       - either image dimension is below 256 px
       - the image looks like a screenshot
       - no EXIF *and* no C2PA *and* ``30 <= ai_likelihood <= 70``
 
     **High** when any of these hold:
       - C2PA is present, valid, and one of the notes mentions AI generation
+        (even without a score)
       - ``ai_likelihood >= 90`` and the image is good quality
       - ``ai_likelihood <= 10`` and the image has EXIF and is good quality
 
@@ -81,7 +98,7 @@ def compute_confidence(
     """
 
     # --- Low conditions -------------------------------------------------------
-    if ai_likelihood is None:
+    if ai_likelihood is None and not c2pa_declares_ai(provenance):
         return "low"
 
     if metadata.width < 256 or metadata.height < 256:
@@ -91,7 +108,8 @@ def compute_confidence(
         return "low"
 
     if (
-        not metadata.has_exif
+        ai_likelihood is not None
+        and not metadata.has_exif
         and not provenance.c2pa_present
         and 30 <= ai_likelihood <= 70
     ):
@@ -100,11 +118,7 @@ def compute_confidence(
     # --- High conditions ------------------------------------------------------
     good = _is_good_quality(metadata)
 
-    if (
-        provenance.c2pa_present
-        and provenance.c2pa_valid
-        and any("ai" in n.lower() for n in provenance.notes)
-    ):
+    if c2pa_declares_ai(provenance):
         return "high"
 
     if ai_likelihood >= 90 and good:
@@ -117,10 +131,19 @@ def compute_confidence(
     return "medium"
 
 
-def verdict_text(ai_likelihood: int | None) -> str:
-    """Human-readable verdict string derived from the AI likelihood score."""
+def verdict_text(
+    ai_likelihood: int | None,
+    provenance: ProvenanceResult | None = None,
+) -> str:
+    """Human-readable verdict string derived from the AI likelihood score.
+
+    Without a score, valid C2PA credentials declaring AI generation still
+    give a verdict.
+    """
 
     if ai_likelihood is None:
+        if provenance is not None and c2pa_declares_ai(provenance):
+            return "This image is AI-generated, according to its signed content credentials."
         return (
             "Unable to determine AI likelihood. The detection model did not "
             "produce a score for this image."
@@ -140,16 +163,26 @@ def _build_evidence(
     ai_likelihood: int | None,
     metadata: MetadataResult,
     provenance: ProvenanceResult,
+    near_duplicate_distance: int | None = None,
+    skipped_stages: dict[str, str] | None = None,
 ) -> list[str]:
     """Assemble human-readable evidence bullets."""
 
     evidence: list[str] = []
+    skipped = dict(skipped_stages or {})
 
     # AI score
     if ai_likelihood is not None:
         evidence.append(f"AI detection model returned a score of {ai_likelihood}/100.")
+    elif "detector" in skipped:
+        evidence.append(f"AI detection model was not run: {skipped.pop('detector')}.")
     else:
         evidence.append("AI detection model did not return a score.")
+    if ai_likelihood is not None and near_duplicate_distance is not None:
+        evidence.append(
+            "The score was reused from a near-duplicate image analysed earlier "
+            f"(perceptual hash distance {near_duplicate_distance}/64)."
+        )
 
     # Camera / EXIF
     if metadata.has_exif:
@@ -165,11 +198,25 @@ def _build_evidence(
     # Software
     if metadata.software_tag:
         evidence.append(f"Software tag detected: {metadata.software_tag}.")
+    if metadata.xmp_creator_tool and metadata.xmp_creator_tool != metadata.software_tag:
+        evidence.append(f"XMP creator tool: {metadata.xmp_creator_tool}.")
+    if metadata.digital_source_type:
+        source = metadata.digital_source_type.rstrip("/").rsplit("/", 1)[-1]
+        evidence.append(f"XMP declares the digital source type as '{source}'.")
+    if metadata.generation_parameters:
+        evidence.append(
+            "Image embeds text-to-image generation parameters "
+            "(as written by Stable Diffusion-style UIs)."
+        )
 
     # Provenance
     if provenance.c2pa_present:
         validity = "valid" if provenance.c2pa_valid else "invalid or unverifiable"
         evidence.append(f"C2PA content credentials found ({validity}).")
+        if provenance.claim_generator:
+            evidence.append(f"Content credentials were produced by {provenance.claim_generator}.")
+        if provenance.signer:
+            evidence.append(f"Content credentials are signed by {provenance.signer}.")
     else:
         evidence.append("No C2PA content credentials found.")
 
@@ -184,18 +231,29 @@ def _build_evidence(
             "Image appears to be a screenshot, which reduces detection reliability."
         )
 
+    # Any other stage the planner skipped
+    for stage, reason in skipped.items():
+        evidence.append(f"The {stage} stage was skipped: {reason}.")
+
     return evidence
 
 
 def _build_limitations(
     ai_likelihood: int | None,
     metadata: MetadataResult,
+    skipped_stages: dict[str, str] | None = None,
 ) -> list[str]:
     """Assemble limitation disclaimers -- always includes the mandatory ones."""
 
     limitations = list(_MANDATORY_LIMITATIONS)
+    skipped = skipped_stages or {}
 
-    if ai_likelihood is None:
+    if "detector" in skipped:
+        limitations.append(
+            "The AI-detection model was not run because the image's content "
+            "credentials already decided the result; the report carries no model score."
+        )
+    elif ai_likelihood is None:
         limitations.append(
             "The AI-detection model was unavailable; the report is based "
             "solely on metadata and provenance signals."
@@ -212,6 +270,10 @@ def _build_limitations(
             "poorly on screen-captured content."
         )
 
+    for stage in skipped:
+        if stage != "detector":
+            limitations.append(f"The {stage} stage was skipped, so its signals are missing.")
+
     return limitations
 
 
@@ -220,6 +282,9 @@ def build_report(
     ai_likelihood: int | None,
     metadata: MetadataResult,
     provenance: ProvenanceResult,
+    near_duplicate_distance: int | None = None,
+    skipped_stages: dict[str, str] | None = None,
+    model_version: str | None = None,
 ) -> AnalysisReport:
     """Assemble the complete analysis report.
 
@@ -233,6 +298,16 @@ def build_report(
         Extracted image metadata.
     provenance:
         C2PA provenance inspection results.
+    near_duplicate_distance:
+        Set when ``ai_likelihood`` was reused from a near-duplicate image
+        rather than computed: the Hamming distance between their
+        perceptual hashes.
+    skipped_stages:
+        Stages the planner skipped because earlier results decided the
+        report, mapped to the reason (see :mod:`app.planner`).  Each is
+        recorded in the evidence and the limitations.
+    model_version:
+        Detector model version that produced ``ai_likelihood``.
 
     Returns
     -------
@@ -240,9 +315,11 @@ def build_report(
     """
 
     confidence = compute_confidence(ai_likelihood, metadata, provenance)
-    verdict = verdict_text(ai_likelihood)
-    evidence = _build_evidence(ai_likelihood, metadata, provenance)
-    limitations = _build_limitations(ai_likelihood, metadata)
+    verdict = verdict_text(ai_likelihood, provenance)
+    evidence = _build_evidence(
+        ai_likelihood, metadata, provenance, near_duplicate_distance, skipped_stages,
+    )
+    limitations = _build_limitations(ai_likelihood, metadata, skipped_stages)
 
     return AnalysisReport(
         job_id=job_id,
@@ -250,6 +327,7 @@ def build_report(
         ai_likelihood=ai_likelihood,
         confidence=confidence,
         verdict_text=verdict,
+        model_version=model_version if ai_likelihood is not None else None,
         evidence=evidence,
         provenance=provenance,
         metadata=metadata,
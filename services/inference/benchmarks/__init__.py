@@ -0,0 +1,13 @@
+"""Performance benchmarks for the inference pipeline.
+
+Run from ``services/inference`` with ``python -m benchmarks.run``; see
+``benchmarks/README.md``.
+"""
+
+import os
+
+# app.config requires these; benchmarks never talk to a real Worker.
+os.environ.setdefault("SHARED_SECRET", "benchmark")
+os.environ.setdefault("CALLBACK_AUTH_SECRET", "benchmark")
+# Keep benchmark jobs out of model_cache_dir (the durable job queue).
+os.environ.setdefault("JOB_QUEUE_DURABLE", "false")
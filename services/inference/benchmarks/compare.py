@@ -0,0 +1,107 @@
+"""Compare two benchmark result files and flag regressions.
+
+Usage (from ``services/inference``)::
+
+    python -m benchmarks.compare base.json head.json [--threshold 0.1] [--fail]
+
+Stage latencies are compared on their medians, end-to-end runs on jobs
+per second and cold starts on the time to the first inference.  With ``--fail`` the exit status is 1 when any entry
+regressed by more than the threshold.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+
+
+def _load(path: str) -> dict:
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def compare(base: dict, head: dict, threshold: float) -> list[dict[str, object]]:
+    """Return one row per benchmark present in both documents.
+
+    ``change`` is the relative change in cost: positive means slower (or
+    lower throughput) in ``head``.
+    """
+    rows = []
+
+    base_stages = {(r["stage"], r["format"], r["size"]): r for r in base.get("results", [])}
+    for entry in head.get("results", []):
+        key = (entry["stage"], entry["format"], entry["size"])
+        if key not in base_stages:
+            continue
+        old = base_stages[key]["latency_ms"]["median"]
+        new = entry["latency_ms"]["median"]
+        change = (new - old) / old if old else 0.0
+        rows.append({
+            "benchmark": "/".join(map(str, key)),
+            "metric": "median_ms",
+            "base": old,
+            "head": new,
+            "change": round(change, 4),
+            "regression": change > threshold,
+        })
+
+    base_pipeline = {(r["format"], r["size"]): r for r in base.get("pipeline", [])}
+    for entry in head.get("pipeline", []):
+        key = (entry["format"], entry["size"])
+        if key not in base_pipeline:
+            continue
+        old = base_pipeline[key]["jobs_per_second"]
+        new = entry["jobs_per_second"]
+        change = (old - new) / old if old else 0.0
+        rows.append({
+            "benchmark": "pipeline/" + "/".join(map(str, key)),
+            "metric": "jobs_per_second",
+            "base": old,
+            "head": new,
+            "change": round(change, 4),
+            "regression": change > threshold,
+        })
+
+    base_startup = {r["load"]: r for r in base.get("startup", [])}
+    for entry in head.get("startup", []):
+        if entry["load"] not in base_startup:
+            continue
+        old = base_startup[entry["load"]]["first_inference_seconds"]
+        new = entry["first_inference_seconds"]
+        change = (new - old) / old if old else 0.0
+        rows.append({
+            "benchmark": f"startup/{entry['load']}",
+            "metric": "first_inference_s",
+            "base": old,
+            "head": new,
+            "change": round(change, 4),
+            "regression": change > threshold,
+        })
+
+    return rows
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative slowdown treated as a regression (default 0.10)")
+    parser.add_argument("--fail", action="store_true",
+                        help="exit with status 1 when anything regressed")
+    args = parser.parse_args(argv)
+
+    rows = compare(_load(args.base), _load(args.head), args.threshold)
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(f"{row['benchmark']:<28} {row['metric']:<16} "
+              f"{row['base']:>10} -> {row['head']:>10}  {row['change']:+8.1%}  {flag}")
+
+    regressed = sum(1 for row in rows if row["regression"])
+    print(f"\n{len(rows)} benchmarks compared, {regressed} regressed", file=sys.stderr)
+    return 1 if args.fail and regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
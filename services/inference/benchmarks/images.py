@@ -0,0 +1,71 @@
+"""Deterministic synthetic benchmark images.
+
+Images are built from seeded random tiles so every run (and every commit)
+encodes exactly the same bytes: a smooth, upscaled colour field gives the
+encoders photo-like gradients, and a tiled grain layer keeps the files
+from compressing unrealistically well.
+"""
+
+from __future__ import annotations
+
+import functools
+import io
+import random
+
+from PIL import Image
+
+FORMATS = ("JPEG", "PNG", "WEBP", "TIFF")
+SIZES = (256, 1024, 2048, 4096)
+
+# Encoder options, chosen to resemble typical uploads.
+_SAVE_OPTIONS: dict[str, dict] = {
+    "JPEG": {"quality": 90},
+    "PNG": {},
+    "WEBP": {"quality": 85},
+    "TIFF": {"compression": "tiff_lzw"},
+}
+
+# Camera-style EXIF written to the formats that carry it.
+_EXIF_FORMATS = frozenset({"JPEG", "WEBP", "TIFF"})
+_EXIF_TAGS = {0x010F: "Benchmark", 0x0110: "Synthetic 1", 0x0131: "verifai-benchmarks"}
+
+
+def _noise(width: int, height: int, seed: int) -> Image.Image:
+    rng = random.Random(seed)
+    return Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+
+
+@functools.lru_cache(maxsize=None)
+def synthetic_image(size: int, fmt: str, *, seed: int = 0) -> bytes:
+    """Encode a ``size`` x ``3/4 size`` photo-like image as ``fmt``.
+
+    Parameters
+    ----------
+    size:
+        Width in pixels; the height is three quarters of it.
+    fmt:
+        One of :data:`FORMATS`.
+    seed:
+        Seed of the random tiles; the same seed always gives the same bytes.
+    """
+    fmt = fmt.upper()
+    width, height = size, size * 3 // 4
+
+    img = _noise(8, 6, seed).resize((width, height), Image.BICUBIC)
+    grain = _noise(64, 64, seed + 1)
+    texture = Image.new("RGB", (width, height))
+    for top in range(0, height, grain.height):
+        for left in range(0, width, grain.width):
+            texture.paste(grain, (left, top))
+    img = Image.blend(img, texture, 0.12)
+
+    options = dict(_SAVE_OPTIONS[fmt])
+    if fmt in _EXIF_FORMATS:
+        exif = Image.Exif()
+        for tag, value in _EXIF_TAGS.items():
+            exif[tag] = value
+        options["exif"] = exif
+
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, **options)
+    return buf.getvalue()
@@ -0,0 +1,439 @@
+"""Per-stage and end-to-end benchmarks for the inference pipeline.
+
+Measures latency of ``metadata.extract_metadata``,
+``provenance.check_provenance``, ``detector.detect`` (against an offline
+stand-in model, see :mod:`benchmarks.standin`) and ``scoring.build_report``
+across synthetic images of every size and format, the peak memory each
+stage adds, the end-to-end throughput of ``_run_pipeline`` and, with the
+ML extras installed, the time a fresh process takes from loading the
+model to its first inference.
+
+Usage (from ``services/inference``)::
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --quick --output bench.json
+    python -m benchmarks.compare base.json bench.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable
+from unittest.mock import AsyncMock, patch
+
+import PIL
+
+from benchmarks import standin
+from benchmarks.images import FORMATS, SIZES, synthetic_image
+
+STAGES = ("metadata", "provenance", "detector", "scoring")
+
+# Model load paths timed by the cold-start benchmark.
+STARTUP_LOADS = ("from_pretrained", "mmap")
+
+# Bumped whenever the shape of the output changes.
+SCHEMA_VERSION = 2
+
+
+# ---------------------------------------------------------------------------
+# Stages
+# ---------------------------------------------------------------------------
+
+def _stage_call(stage: str, data: bytes) -> Callable[[], object]:
+    """Return a zero-argument callable running ``stage`` on ``data``.
+
+    The detector stage expects a stand-in backend to be installed.
+    """
+    from app import detector, metadata, provenance, scoring
+    from app.imaging import ImageContext
+
+    if stage == "metadata":
+        def _call():
+            with ImageContext(data) as image:
+                return metadata.extract_metadata(image)
+    elif stage == "provenance":
+        def _call():
+            with ImageContext(data) as image:
+                return provenance.check_provenance(image)
+    elif stage == "detector":
+        def _call():
+            with ImageContext(data) as image:
+                return detector.detect(image)
+    elif stage == "scoring":
+        with ImageContext(data) as image:
+            meta = metadata.extract_metadata(image)
+            prov = provenance.check_provenance(image)
+
+        def _call():
+            return scoring.build_report(
+                job_id="benchmark", ai_likelihood=64, metadata=meta, provenance=prov,
+            )
+    else:
+        raise ValueError(f"Unknown stage {stage!r}")
+    return _call
+
+
+def _latency(call: Callable[[], object], repeat: int) -> dict[str, float]:
+    """Time ``repeat`` calls (after one warm-up call), in milliseconds."""
+    call()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "min": round(timings[0], 3),
+        "median": round(statistics.median(timings), 3),
+        "p95": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        "mean": round(statistics.fmean(timings), 3),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Peak memory (measured in a fresh process per stage and input)
+# ---------------------------------------------------------------------------
+
+def _proc_status_bytes(field: str) -> int | None:
+    """A ``kB`` field of /proc/self/status in bytes (None off Linux)."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as fh:
+            for line in fh:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _max_rss_bytes() -> int:
+    """Peak resident set size of this process so far."""
+    # VmHWM belongs to this address space; ru_maxrss on Linux also carries
+    # the (much larger) benchmark parent's peak across fork/exec.
+    peak = _proc_status_bytes("VmHWM")
+    if peak is not None:
+        return peak
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _memory_probe(stage: str, path: str, model: str) -> None:
+    """Child-process entry point: print the peak RSS one stage call adds.
+
+    A fresh process has no allocator caches or high-water mark from
+    earlier work (including generating the image, which is why the
+    encoded bytes are read from ``path``), so the growth of its peak RSS
+    is the memory the stage itself needed.
+    """
+    with open(path, "rb") as fh:
+        data = fh.read()
+    with standin.installed(standin.create_standin(model), batching=False):
+        call = _stage_call(stage, data)
+        baseline = _max_rss_bytes()
+        call()
+        print(json.dumps({"peak_rss_delta_bytes": _max_rss_bytes() - baseline}))
+
+
+def _peak_memory(stage: str, data: bytes, model: str) -> int | None:
+    with tempfile.NamedTemporaryFile(suffix=".img") as fh:
+        fh.write(data)
+        fh.flush()
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--memory-probe", stage, fh.name,
+             "--model", model],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    if proc.returncode != 0:
+        print(f"memory probe failed for {stage}:\n{proc.stderr}", file=sys.stderr)
+        return None
+    return json.loads(proc.stdout.strip().splitlines()[-1])["peak_rss_delta_bytes"]
+
+
+# ---------------------------------------------------------------------------
+# Cold start (measured in a fresh process per run)
+# ---------------------------------------------------------------------------
+
+def _startup_probe(load: str, model_dir: str) -> None:
+    """Child-process entry point: print how long the model took to serve.
+
+    torch and transformers are imported before the clock starts; that
+    cost does not depend on the load path.  ``rss_anon_bytes`` is the
+    private memory afterwards: mapped weights are file-backed and shared
+    with other processes, so they do not count towards it.
+    """
+    import torch  # noqa: F401
+    import transformers  # noqa: F401
+    from PIL import Image
+
+    from app import backends
+    from app.config import settings
+
+    started = time.perf_counter()
+    backend = backends.TorchBackend(
+        model_dir, "main", model_dir, mmap_weights=load == "mmap",
+    )
+    loaded = time.perf_counter()
+    size = settings.detector_input_size
+    backend.predict([Image.new("RGB", (size, size))])
+    finished = time.perf_counter()
+    print(json.dumps({
+        "load_seconds": loaded - started,
+        "first_inference_seconds": finished - started,
+        "rss_anon_bytes": _proc_status_bytes("RssAnon"),
+    }))
+
+
+def _startup(runs: int) -> list[dict[str, object]]:
+    """Time a fresh process's model load and first inference per load path.
+
+    The stand-in ViT is saved as a ``.bin`` checkpoint, like many hub
+    models, and converted to safetensors once up front (reported as
+    ``convert_seconds``), as a replica would find it in a warm
+    ``model_cache_dir``.  Returns nothing without the ML extras.
+    """
+    from app import backends
+
+    try:
+        tiny = standin.TinyViTBackend()
+    except ImportError:
+        return []
+
+    entries = []
+    with tempfile.TemporaryDirectory() as model_dir:
+        tiny._model.save_pretrained(model_dir, safe_serialization=False)
+        tiny._processor.save_pretrained(model_dir)
+        started = time.perf_counter()
+        backends.ensure_safetensors_model(model_dir, "main", model_dir)
+        convert_seconds = time.perf_counter() - started
+
+        for load in STARTUP_LOADS:
+            samples = []
+            for _ in range(runs):
+                proc = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.run", "--startup-probe", load, model_dir],
+                    capture_output=True,
+                    text=True,
+                    check=False,
+                )
+                if proc.returncode != 0:
+                    print(f"startup probe failed for {load}:\n{proc.stderr}", file=sys.stderr)
+                    break
+                samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            if not samples:
+                continue
+            rss = [sample["rss_anon_bytes"] for sample in samples]
+            entry = {
+                "load": load,
+                "runs": len(samples),
+                "load_seconds": round(statistics.median(
+                    sample["load_seconds"] for sample in samples), 4),
+                "first_inference_seconds": round(statistics.median(
+                    sample["first_inference_seconds"] for sample in samples), 4),
+                "rss_anon_bytes": int(statistics.median(rss)) if None not in rss else None,
+            }
+            if load == "mmap":
+                entry["convert_seconds"] = round(convert_seconds, 4)
+            entries.append(entry)
+    return entries
+
+
+# ---------------------------------------------------------------------------
+# End-to-end throughput
+# ---------------------------------------------------------------------------
+
+async def _pipeline_throughput(data: bytes, jobs: int, concurrency: int) -> dict[str, object]:
+    """Push ``jobs`` copies of ``data`` through ``_run_pipeline``.
+
+    The result cache and near-duplicate index are disabled (every job
+    would otherwise be a hit after the first) and report callbacks are
+    swallowed before they reach the batcher or the network.  A job whose
+    report never arrived counts as failed.
+    """
+    from app import main
+    from app.cache import ResultCache
+    from app.dedup import NearDuplicateIndex
+
+    statuses: list[str] = []
+
+    async def _callback(url, payload, *, job_id):
+        statuses.append(payload["status"])
+        return True
+
+    slots = asyncio.Semaphore(concurrency)
+
+    async def _job(index: int) -> None:
+        async with slots:
+            await main._run_pipeline(f"bench-{index}", None, "http://bench.invalid/cb", data)
+
+    with (
+        patch.object(main, "_result_cache", ResultCache(max_entries=0, ttl_seconds=0)),
+        patch.object(main, "_near_duplicates", NearDuplicateIndex(
+            max_entries=0, ttl_seconds=0, max_distance=0,
+        )),
+        patch("app.clients.post_report", AsyncMock(side_effect=_callback)),
+    ):
+        await _job(-1)  # warm-up
+        statuses.clear()
+        started = time.perf_counter()
+        await asyncio.gather(*(_job(i) for i in range(jobs)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "jobs": jobs,
+        "concurrency": concurrency,
+        "failed": jobs - sum(1 for status in statuses if status == "done"),
+        "seconds": round(elapsed, 3),
+        "jobs_per_second": round(jobs / elapsed, 2),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def run(args: argparse.Namespace) -> dict[str, object]:
+    """Run every selected benchmark and return the result document."""
+    from app.config import settings
+
+    backend = standin.create_standin(args.model)
+    model = backend.name  # resolve "auto" once, for the memory probes too
+    results = []
+    pipeline = []
+
+    for fmt in args.formats:
+        for size in args.sizes:
+            data = synthetic_image(size, fmt)
+            for stage in args.stages:
+                with standin.installed(backend, batching=False):
+                    latency = _latency(_stage_call(stage, data), args.repeat)
+                entry = {
+                    "stage": stage,
+                    "format": fmt,
+                    "size": size,
+                    "bytes": len(data),
+                    "iterations": args.repeat,
+                    "latency_ms": latency,
+                }
+                if args.memory:
+                    entry["peak_rss_delta_bytes"] = _peak_memory(stage, data, model)
+                results.append(entry)
+                print(f"{stage:>10} {fmt:<4} {size:>5}px  median {latency['median']:9.3f} ms",
+                      file=sys.stderr)
+
+            if args.pipeline_jobs:
+                with standin.installed(backend, batching=True):
+                    throughput = asyncio.run(_pipeline_throughput(
+                        data, args.pipeline_jobs, settings.pipeline_concurrency,
+                    ))
+                pipeline.append({"format": fmt, "size": size, **throughput})
+                print(f"{'pipeline':>10} {fmt:<4} {size:>5}px  "
+                      f"{throughput['jobs_per_second']:9.2f} jobs/s", file=sys.stderr)
+
+    startup = _startup(args.startup_runs) if args.startup_runs else []
+    for entry in startup:
+        print(f"{'startup':>10} {entry['load']:<16} "
+              f"first inference {entry['first_inference_seconds']:7.3f} s", file=sys.stderr)
+
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.machine(),
+            "pillow": PIL.__version__,
+            "model": model,
+            "settings": {
+                name: getattr(settings, name)
+                for name in (
+                    "detector_reduced_decode",
+                    "detector_input_size",
+                    "detector_crop_count",
+                    "detector_batch_max_size",
+                    "detector_batch_max_wait_ms",
+                    "compute_threads",
+                    "pipeline_concurrency",
+                )
+            },
+        },
+        "results": results,
+        "pipeline": pipeline,
+        "startup": startup,
+    }
+
+
+def _csv(cast):
+    return lambda value: [cast(part) for part in value.split(",") if part]
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=_csv(int), default=list(SIZES))
+    parser.add_argument("--formats", type=_csv(str.upper), default=list(FORMATS))
+    parser.add_argument("--stages", type=_csv(str), default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=10, help="timed calls per stage")
+    parser.add_argument("--pipeline-jobs", type=int, default=32,
+                        help="jobs per end-to-end run (0 skips it)")
+    parser.add_argument("--startup-runs", type=int, default=3,
+                        help="fresh processes per model load path (0 skips it)")
+    parser.add_argument("--model", choices=standin.KINDS, default="auto")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="skip the per-stage peak-memory probes")
+    parser.add_argument("--quick", action="store_true",
+                        help="256 and 1024 px only, 3 repeats, 8 pipeline jobs, 1 startup run")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--memory-probe", nargs=2, metavar=("STAGE", "IMAGE_PATH"),
+                        help=argparse.SUPPRESS)
+    parser.add_argument("--startup-probe", nargs=2, metavar=("LOAD", "MODEL_DIR"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.memory_probe:
+        _memory_probe(*args.memory_probe, args.model)
+        return
+    if args.startup_probe:
+        _startup_probe(*args.startup_probe)
+        return
+
+    if args.quick:
+        args.sizes = [size for size in args.sizes if size <= 1024] or args.sizes
+        args.repeat = min(args.repeat, 3)
+        args.pipeline_jobs = min(args.pipeline_jobs, 8)
+        args.startup_runs = min(args.startup_runs, 1)
+    unknown = set(args.stages) - set(STAGES) | set(args.formats) - set(FORMATS)
+    if unknown:
+        parser.error(f"unknown stages/formats: {', '.join(sorted(unknown))}")
+
+    document = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(document + "\n")
+    else:
+        print(document)
+
+
+if __name__ == "__main__":
+    main()
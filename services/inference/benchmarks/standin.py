@@ -0,0 +1,104 @@
+"""Offline stand-ins for the detector model.
+
+Benchmarks must not download weights, so the detector is exercised
+against a model built locally:
+
+* ``tiny-vit`` -- a small, randomly initialised HuggingFace ViT run by
+  :class:`app.backends.TorchBackend`'s predict path (needs the ML extras).
+* ``pillow`` -- preprocessing only (resize to the model input and a cheap
+  pixel statistic), for environments without PyTorch.
+"""
+
+from __future__ import annotations
+
+import functools
+from contextlib import contextmanager
+
+from PIL import Image, ImageStat
+
+from app import backends, detector, registry
+from app.config import settings
+
+KINDS = ("auto", "tiny-vit", "pillow")
+
+
+class TinyViTBackend(backends.TorchBackend):
+    """A ViT with the production input size but very few parameters."""
+
+    name = "tiny-vit"
+
+    def __init__(self) -> None:
+        import torch
+        from transformers import ViTConfig, ViTForImageClassification, ViTImageProcessor
+
+        torch.manual_seed(0)
+        size = settings.detector_input_size
+        self._processor = ViTImageProcessor(size={"height": size, "width": size})
+        self._model = ViTForImageClassification(
+            ViTConfig(
+                image_size=size,
+                patch_size=16,
+                hidden_size=64,
+                num_hidden_layers=2,
+                num_attention_heads=2,
+                intermediate_size=128,
+                num_labels=2,
+                id2label={0: "human", 1: "artificial"},
+                label2id={"human": 0, "artificial": 1},
+            )
+        )
+        self._model.eval()
+        self.ai_index = backends.find_ai_index(self._model.config.id2label)
+
+
+class PillowBackend(backends.DetectorBackend):
+    """Resize to the model input and score by mean brightness."""
+
+    name = "pillow"
+    ai_index = 1
+
+    def predict(self, images: list[Image.Image]) -> list[float]:
+        size = settings.detector_input_size
+        probs = []
+        for img in images:
+            resized = img.resize((size, size), Image.BILINEAR)
+            probs.append(sum(ImageStat.Stat(resized).mean) / (3 * 255))
+        return probs
+
+
+def create_standin(kind: str = "auto") -> backends.DetectorBackend:
+    """Build the stand-in ``kind``; ``"auto"`` prefers ``tiny-vit``."""
+    if kind == "auto":
+        try:
+            return TinyViTBackend()
+        except ImportError:
+            return PillowBackend()
+    if kind == "tiny-vit":
+        return TinyViTBackend()
+    if kind == "pillow":
+        return PillowBackend()
+    raise ValueError(f"Unknown stand-in model {kind!r}")
+
+
+@contextmanager
+def installed(backend: backends.DetectorBackend, *, batching: bool):
+    """Serve ``backend`` from :mod:`app.detector` for the duration.
+
+    With ``batching=False`` each detect call runs inline, so per-call
+    latency does not include the micro-batcher's collection window.
+    """
+    saved = detector._registry, detector._state
+    detector._registry = registry.ModelRegistry()
+    detector._state = "ready"
+    detector._registry.activate(registry.Deployment(
+        detector.model_version(backends.configured_specs()),
+        backend,
+        functools.partial(detector._predict_batch, backend),
+        max_batch_size=settings.detector_batch_max_size if batching else 1,
+        max_wait_seconds=settings.detector_batch_max_wait_ms / 1000,
+    ))
+    try:
+        yield backend
+    finally:
+        detector._registry.clear()
+        detector._registry, detector._state = saved
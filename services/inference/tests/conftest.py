@@ -0,0 +1,33 @@
+"""Shared pytest fixtures."""
+
+from __future__ import annotations
+
+import os
+import sys
+
+import pytest
+
+# Keep accepted test jobs out of model_cache_dir: they would be picked up
+# again by the next run.
+os.environ.setdefault("JOB_QUEUE_DURABLE", "false")
+
+
+@pytest.fixture(autouse=True)
+def _empty_job_queue():
+    """Tests reuse job ids, which the queue would otherwise de-duplicate."""
+    yield
+    main = sys.modules.get("app.main")
+    if main is not None:
+        main._job_queue.clear()
+
+
+@pytest.fixture(autouse=True)
+def _empty_result_cache():
+    """Tests reuse the same image bytes, so start each one with a cold cache."""
+    main = sys.modules.get("app.main")
+    if main is not None:
+        main._result_cache.clear()
+    yield
+    main = sys.modules.get("app.main")
+    if main is not None:
+        main._result_cache.clear()
@@ -0,0 +1,230 @@
+"""Tests for the pluggable detector backends."""
+
+from __future__ import annotations
+
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from app import backends
+
+
+class TestFindAiIndex:
+    """Label lookup shared by every backend."""
+
+    def test_matches_ai_label(self) -> None:
+        assert backends.find_ai_index({0: "human", 1: "ai"}) == 1
+        assert backends.find_ai_index({0: "Fake", 1: "Real"}) == 0
+
+    def test_falls_back_to_last_class(self) -> None:
+        assert backends.find_ai_index({0: "LABEL_0", 1: "LABEL_1"}) == 1
+
+
+class TestOnnxModelPath:
+    """Exported graphs are stored per model version."""
+
+    def test_path_includes_revision_and_quantization(self) -> None:
+        fp32 = backends.onnx_model_path("org/model", "v1", "/cache", quantize=False)
+        int8 = backends.onnx_model_path("org/model", "v1", "/cache", quantize=True)
+
+        assert fp32 == "/cache/onnx/org--model/v1/model.onnx"
+        assert int8 == "/cache/onnx/org--model/v1/model.int8.onnx"
+
+    def test_existing_export_is_reused(self, tmp_path) -> None:
+        path = backends.onnx_model_path("org/model", "v1", str(tmp_path), quantize=False)
+        (tmp_path / "onnx" / "org--model" / "v1").mkdir(parents=True)
+        (tmp_path / "onnx" / "org--model" / "v1" / "model.onnx").write_bytes(b"graph")
+
+        with patch.object(backends, "_export_onnx") as export:
+            result = backends.ensure_onnx_model("org/model", "v1", str(tmp_path), quantize=False)
+
+        assert result == path
+        export.assert_not_called()
+
+
+class TestSafetensorsWeights:
+    """Torch weights are converted once and memory-mapped."""
+
+    def test_path_includes_revision(self) -> None:
+        path = backends.safetensors_model_dir("org/model", "v1", "/cache")
+        assert path == "/cache/safetensors/org--model/v1"
+
+    def test_existing_conversion_is_reused(self, tmp_path) -> None:
+        path = backends.safetensors_model_dir("org/model", "v1", str(tmp_path))
+        (tmp_path / "safetensors" / "org--model" / "v1").mkdir(parents=True)
+        (tmp_path / "safetensors" / "org--model" / "v1" / "model.safetensors").write_bytes(b"w")
+
+        with patch.object(backends, "_export_safetensors") as export:
+            result = backends.ensure_safetensors_model("org/model", "v1", str(tmp_path))
+
+        assert result == path
+        export.assert_not_called()
+
+    def test_mapped_model_matches_eager_load(self, tmp_path) -> None:
+        torch = pytest.importorskip("torch")
+        transformers = pytest.importorskip("transformers")
+
+        torch.manual_seed(0)
+        config = transformers.ViTConfig(
+            image_size=32, patch_size=16, hidden_size=32, num_hidden_layers=1,
+            num_attention_heads=2, intermediate_size=64, num_labels=2,
+        )
+        transformers.ViTForImageClassification(config).save_pretrained(
+            tmp_path, safe_serialization=True,
+        )
+
+        mapped = backends.load_mmap_model(str(tmp_path))
+        eager = transformers.ViTForImageClassification.from_pretrained(tmp_path)
+
+        pixels = torch.rand(1, 3, 32, 32)
+        with torch.inference_mode():
+            assert torch.allclose(mapped(pixels).logits, eager.eval()(pixels).logits)
+        assert not any(param.is_meta for param in mapped.parameters())
+
+
+class TestCreateBackend:
+    """The backend is chosen by settings.detector_backend."""
+
+    def test_unknown_backend_is_rejected(self) -> None:
+        with patch.object(backends.settings, "detector_backend", "tensorrt"):
+            with pytest.raises(ValueError, match="tensorrt"):
+                backends.create_backend()
+
+    def test_torch_mmap_setting_is_passed(self) -> None:
+        with (
+            patch.object(backends.settings, "detector_backend", "torch"),
+            patch.object(backends.settings, "torch_mmap_weights", True),
+            patch.object(backends, "TorchBackend") as torch_backend,
+        ):
+            backends.create_backend(spec=backends.ModelSpec("org/model", "v1"))
+
+        assert torch_backend.call_args.args[:2] == ("org/model", "v1")
+        assert torch_backend.call_args.kwargs["mmap_weights"] is True
+
+
+class TestOnnxPredict:
+    """OnnxBackend.predict keeps the torch backend's probability contract."""
+
+    def test_softmax_probabilities(self) -> None:
+        np = pytest.importorskip("numpy")
+
+        class _Session:
+            def run(self, outputs, feeds):
+                assert outputs == ["logits"]
+                assert feeds["pixel_values"].dtype == np.float32
+                return [np.array([[0.0, 0.0], [0.0, np.log(3.0)]], dtype=np.float32)]
+
+        backend = object.__new__(backends.OnnxBackend)
+        backend.ai_index = 1
+        backend._session = _Session()
+        backend._processor = lambda images, return_tensors: {
+            "pixel_values": np.zeros((len(images), 3, 224, 224), dtype=np.float64),
+        }
+
+        images = [Image.new("RGB", (8, 8)), Image.new("RGB", (8, 8))]
+        probs = backend.predict(images)
+
+        assert probs == pytest.approx([0.5, 0.75])
+        assert all(isinstance(p, float) for p in probs)
+
+    def test_missing_onnxruntime_raises_import_error(self) -> None:
+        with patch.dict("sys.modules", {"onnxruntime": None}):
+            with pytest.raises(ImportError):
+                backends.OnnxBackend("org/model", "v1", "/cache", quantize=True)
+
+
+
+class TestParseModelSpecs:
+    """DETECTOR_ENSEMBLE and POST /models entries."""
+
+    def test_defaults_and_weights(self) -> None:
+        specs = backends.parse_model_specs("org/a, org/b@v2*0.5")
+
+        assert specs == [
+            backends.ModelSpec("org/a", "main", 1.0),
+            backends.ModelSpec("org/b", "v2", 0.5),
+        ]
+        assert str(specs[1]) == "org/b@v2*0.5"
+
+    @pytest.mark.parametrize(
+        "text",
+        ["", " , ", "org/a*0", "org/a*-1", "@v1", "org/a*heavy", "org/a*nan", "org/a*inf"],
+    )
+    def test_invalid_entries_are_rejected(self, text: str) -> None:
+        with pytest.raises(ValueError):
+            backends.parse_model_specs(text)
+
+    def test_configured_specs_fall_back_to_model_name(self) -> None:
+        with (
+            patch.object(backends.settings, "detector_ensemble", ""),
+            patch.object(backends.settings, "model_name", "org/model"),
+            patch.object(backends.settings, "model_revision", "v7"),
+        ):
+            assert backends.configured_specs() == [backends.ModelSpec("org/model", "v7")]
+
+
+class _SplitBackend(backends.DetectorBackend):
+    """Backend whose forward pass reads one value per image from its input."""
+
+    name = "split"
+
+    def __init__(self, key: str | None, scale: float) -> None:
+        self.ai_index = 1
+        self.preprocess_key = key
+        self.scale = scale
+        self.preprocessed = 0
+        self.closed = False
+
+    def preprocess(self, images: list[Image.Image]) -> object:
+        self.preprocessed += 1
+        return [image.width for image in images]
+
+    def forward(self, inputs: object) -> list[float]:
+        return [self.scale * value / 100 for value in inputs]
+
+    def predict(self, images: list[Image.Image]) -> list[float]:
+        return self.forward(self.preprocess(images))
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class TestEnsembleBackend:
+    """Weighted-mean ensembles over shared preprocessing."""
+
+    def test_weighted_mean(self) -> None:
+        a, b = _SplitBackend("k", 1.0), _SplitBackend("k", 0.5)
+        ensemble = backends.EnsembleBackend([(a, 3.0), (b, 1.0)])
+
+        probs = ensemble.predict([Image.new("RGB", (40, 8)), Image.new("RGB", (80, 8))])
+
+        assert probs == pytest.approx([(3 * 0.4 + 0.2) / 4, (3 * 0.8 + 0.4) / 4])
+        ensemble.close()
+
+    def test_matching_processors_preprocess_once(self) -> None:
+        shared = [_SplitBackend("k", 1.0), _SplitBackend("k", 1.0)]
+        own = _SplitBackend(None, 1.0)
+        ensemble = backends.EnsembleBackend([(m, 1.0) for m in [*shared, own]])
+
+        ensemble.predict([Image.new("RGB", (8, 8))])
+
+        assert [m.preprocessed for m in shared] == [1, 0]
+        assert own.preprocessed == 1
+        ensemble.close()
+
+    def test_close_closes_members(self) -> None:
+        members = [_SplitBackend("k", 1.0), _SplitBackend("k", 1.0)]
+        backends.EnsembleBackend([(m, 1.0) for m in members]).close()
+
+        assert all(m.closed for m in members)
+
+    def test_partial_load_is_closed_on_failure(self) -> None:
+        loaded = _SplitBackend("k", 1.0)
+        specs = backends.parse_model_specs("org/a,org/b")
+
+        with patch.object(backends, "create_backend", side_effect=[loaded, OSError("missing")]):
+            with pytest.raises(OSError):
+                backends.create_model_backend(specs)
+
+        assert loaded.closed
@@ -0,0 +1,138 @@
+"""Tests for the micro-batching layer in front of the detector model."""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+
+from app.batching import MicroBatcher
+
+
+class _RecordingModel:
+    """Stand-in for a batched forward pass that records batch sizes."""
+
+    def __init__(self) -> None:
+        self.batches: list[list[int]] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, items: list[int]) -> list[int]:
+        with self._lock:
+            self.batches.append(list(items))
+        return [item * 10 for item in items]
+
+
+class TestMicroBatcher:
+    """Unit tests for MicroBatcher."""
+
+    def test_each_caller_gets_its_own_result(self) -> None:
+        model = _RecordingModel()
+        batcher = MicroBatcher(model, max_batch_size=8, max_wait_seconds=0.05)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(batcher.submit, range(8)))
+
+        assert results == [i * 10 for i in range(8)]
+
+    def test_concurrent_calls_are_coalesced(self) -> None:
+        model = _RecordingModel()
+        batcher = MicroBatcher(model, max_batch_size=8, max_wait_seconds=0.2)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(batcher.submit, range(8)))
+
+        assert len(model.batches) < 8
+        assert sorted(i for batch in model.batches for i in batch) == list(range(8))
+
+    def test_batch_size_is_capped(self) -> None:
+        model = _RecordingModel()
+        batcher = MicroBatcher(model, max_batch_size=3, max_wait_seconds=0.2)
+
+        with ThreadPoolExecutor(max_workers=9) as pool:
+            list(pool.map(batcher.submit, range(9)))
+
+        assert all(len(batch) <= 3 for batch in model.batches)
+
+    def test_submit_many_preserves_order(self) -> None:
+        model = _RecordingModel()
+        batcher = MicroBatcher(model, max_batch_size=4, max_wait_seconds=0.05)
+
+        assert batcher.submit_many([3, 1, 2, 5, 4]) == [30, 10, 20, 50, 40]
+        assert all(len(batch) <= 4 for batch in model.batches)
+
+    def test_disabled_runs_inline(self) -> None:
+        model = _RecordingModel()
+        batcher = MicroBatcher(model, max_batch_size=1, max_wait_seconds=0.2)
+
+        assert not batcher.enabled
+        assert batcher.submit(4) == 40
+        assert model.batches == [[4]]
+
+    def test_batch_failure_propagates_to_every_caller(self) -> None:
+        def _boom(items: list[int]) -> list[int]:
+            raise ValueError("forward pass failed")
+
+        batcher = MicroBatcher(_boom, max_batch_size=4, max_wait_seconds=0.05)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(batcher.submit, i) for i in range(4)]
+            for future in futures:
+                with pytest.raises(ValueError, match="forward pass failed"):
+                    future.result()
+
+    def test_recovers_after_failed_batch(self) -> None:
+        calls = {"n": 0}
+
+        def _flaky(items: list[int]) -> list[int]:
+            calls["n"] += 1
+            if calls["n"] == 1:
+                raise RuntimeError("transient")
+            return items
+
+        batcher = MicroBatcher(_flaky, max_batch_size=4, max_wait_seconds=0.0)
+
+        with pytest.raises(RuntimeError):
+            batcher.submit(1)
+        assert batcher.submit(2) == 2
+
+    def test_close_finishes_queued_items(self) -> None:
+        model = _RecordingModel()
+        batcher = MicroBatcher(model, max_batch_size=8, max_wait_seconds=0.2)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(batcher.submit, i) for i in range(4)]
+            batcher.close()
+            results = [future.result() for future in futures]
+
+        assert results == [0, 10, 20, 30]
+        batcher._thread.join(timeout=1)
+        assert not batcher._thread.is_alive()
+
+    def test_item_queued_as_worker_exits_still_runs(self) -> None:
+        model = _RecordingModel()
+        batcher = MicroBatcher(model, max_batch_size=8, max_wait_seconds=0.2)
+        release = threading.Event()
+        # A worker that has drained the queue after close() but not exited yet.
+        batcher._thread = threading.Thread(target=release.wait, daemon=True)
+        batcher._thread.start()
+
+        try:
+            batcher.close()
+            # submit() passed its _closed check before close() ran.
+            future = Future()
+            batcher._queue.put((5, future))
+            batcher._ensure_worker()
+
+            assert future.result(timeout=1) == 50
+        finally:
+            release.set()
+
+    def test_submit_after_close_runs_inline(self) -> None:
+        model = _RecordingModel()
+        batcher = MicroBatcher(model, max_batch_size=8, max_wait_seconds=0.2)
+        batcher.submit(1)
+        batcher.close()
+
+        assert batcher.submit(2) == 20
+        assert batcher.submit_many([3, 4]) == [30, 40]
@@ -0,0 +1,82 @@
+"""Smoke tests for the benchmark suite (not the benchmarks themselves)."""
+
+from __future__ import annotations
+
+import argparse
+import io
+
+import pytest
+from PIL import Image
+
+from benchmarks import compare, run, standin
+from benchmarks.images import FORMATS, synthetic_image
+
+
+class TestSyntheticImages:
+    """Inputs must be identical across runs for results to be comparable."""
+
+    @pytest.mark.parametrize("fmt", FORMATS)
+    def test_every_format_decodes(self, fmt: str) -> None:
+        with Image.open(io.BytesIO(synthetic_image(256, fmt))) as img:
+            assert img.format == fmt
+            assert img.size == (256, 192)
+
+    def test_deterministic(self) -> None:
+        first = synthetic_image(256, "PNG", seed=7)
+        synthetic_image.cache_clear()
+        assert synthetic_image(256, "PNG", seed=7) == first
+
+
+class TestRun:
+    """A minimal run produces the documented result shape."""
+
+    def test_quick_run_shape(self) -> None:
+        args = argparse.Namespace(
+            sizes=[256], formats=["JPEG"], stages=list(run.STAGES), repeat=1,
+            pipeline_jobs=2, model="pillow", memory=False, startup_runs=0,
+        )
+        document = run.run(args)
+
+        assert document["meta"]["model"] == "pillow"
+        assert [r["stage"] for r in document["results"]] == list(run.STAGES)
+        assert document["results"][0]["latency_ms"]["median"] >= 0
+        assert document["pipeline"][0]["failed"] == 0
+        assert document["startup"] == []
+
+    def test_standin_is_uninstalled_afterwards(self) -> None:
+        from app import detector
+
+        before = detector._registry
+        with standin.installed(standin.PillowBackend(), batching=False):
+            assert detector._registry.active.backend.name == "pillow"
+        assert detector._registry is before
+
+
+class TestCompare:
+    """Regressions are flagged relative to the threshold."""
+
+    @staticmethod
+    def _doc(median: float, jobs_per_second: float) -> dict:
+        return {
+            "results": [{
+                "stage": "detector", "format": "JPEG", "size": 256,
+                "latency_ms": {"median": median},
+            }],
+            "pipeline": [{"format": "JPEG", "size": 256, "jobs_per_second": jobs_per_second}],
+        }
+
+    def test_flags_slower_stage_and_lower_throughput(self) -> None:
+        rows = compare.compare(self._doc(10.0, 100.0), self._doc(12.0, 80.0), threshold=0.1)
+        assert [row["regression"] for row in rows] == [True, True]
+
+    def test_slower_cold_start_is_a_regression(self) -> None:
+        base = {"startup": [{"load": "mmap", "first_inference_seconds": 1.0}]}
+        head = {"startup": [{"load": "mmap", "first_inference_seconds": 1.5}]}
+
+        rows = compare.compare(base, head, threshold=0.1)
+
+        assert [(row["benchmark"], row["regression"]) for row in rows] == [("startup/mmap", True)]
+
+    def test_within_threshold_is_not_a_regression(self) -> None:
+        rows = compare.compare(self._doc(10.0, 100.0), self._doc(10.5, 98.0), threshold=0.1)
+        assert not any(row["regression"] for row in rows)
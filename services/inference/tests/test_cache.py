@@ -0,0 +1,149 @@
+"""Tests for the content-addressed result cache."""
+
+from __future__ import annotations
+
+import io
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from PIL import Image
+
+from app.cache import CachedResult, ResultCache, cache_key
+from app.schemas import MetadataResult, ProvenanceResult
+
+
+def _result(score: int | None = 42) -> CachedResult:
+    return CachedResult(
+        ai_likelihood=score,
+        metadata=MetadataResult(has_exif=False, width=640, height=480, format="JPEG"),
+        provenance=ProvenanceResult(c2pa_present=False),
+    )
+
+
+def _jpeg(color: tuple[int, int, int]) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (300, 300), color=color).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+class TestCacheKey:
+    """cache_key() covers both the content and the model version."""
+
+    def test_same_bytes_same_key(self) -> None:
+        assert cache_key(b"abc", "m@v1") == cache_key(b"abc", "m@v1")
+
+    def test_model_version_changes_key(self) -> None:
+        assert cache_key(b"abc", "m@v1") != cache_key(b"abc", "m@v2")
+
+    def test_content_changes_key(self) -> None:
+        assert cache_key(b"abc", "m@v1") != cache_key(b"abd", "m@v1")
+
+
+class TestMemoryTier:
+    """In-memory LRU behaviour."""
+
+    def test_hit_and_miss_counters(self) -> None:
+        cache = ResultCache(max_entries=4, ttl_seconds=60)
+        assert cache.get("k") is None
+        cache.put("k", _result())
+
+        assert cache.get("k") == _result()
+        stats = cache.stats()
+        assert stats["memory_hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_lru_eviction(self) -> None:
+        cache = ResultCache(max_entries=2, ttl_seconds=60)
+        cache.put("a", _result(1))
+        cache.put("b", _result(2))
+        cache.get("a")  # "b" is now least recently used
+        cache.put("c", _result(3))
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_ttl_expiry(self) -> None:
+        cache = ResultCache(max_entries=4, ttl_seconds=10)
+        with patch("app.cache.time.time", return_value=1000.0):
+            cache.put("k", _result())
+        with patch("app.cache.time.time", return_value=1011.0):
+            assert cache.get("k") is None
+
+    def test_disabled(self) -> None:
+        cache = ResultCache(max_entries=0, ttl_seconds=60)
+        cache.put("k", _result())
+        assert cache.get("k") is None
+
+
+class TestDiskTier:
+    """SQLite-backed tier survives process restarts."""
+
+    def test_persists_across_instances(self, tmp_path) -> None:
+        path = str(tmp_path / "results.sqlite3")
+        ResultCache(max_entries=4, ttl_seconds=60, disk_path=path).put("k", _result(7))
+
+        fresh = ResultCache(max_entries=4, ttl_seconds=60, disk_path=path)
+        assert fresh.get("k") == _result(7)
+        assert fresh.stats()["disk_hits"] == 1
+        # Promoted into memory on the first disk hit.
+        assert fresh.get("k") is not None
+        assert fresh.stats()["memory_hits"] == 1
+
+    def test_expired_disk_entry_is_a_miss(self, tmp_path) -> None:
+        path = str(tmp_path / "results.sqlite3")
+        with patch("app.cache.time.time", return_value=1000.0):
+            ResultCache(max_entries=4, ttl_seconds=10, disk_path=path).put("k", _result())
+
+        fresh = ResultCache(max_entries=4, ttl_seconds=10, disk_path=path)
+        with patch("app.cache.time.time", return_value=1011.0):
+            assert fresh.get("k") is None
+
+    def test_size_eviction(self, tmp_path) -> None:
+        path = str(tmp_path / "results.sqlite3")
+        cache = ResultCache(max_entries=1, ttl_seconds=3600, disk_path=path, disk_max_entries=10)
+        with patch("app.cache._DISK_EVICT_EVERY", 1):
+            for i in range(15):
+                with patch("app.cache.time.time", return_value=1000.0 + i):
+                    cache.put(f"k{i}", _result(i))
+
+        rows = cache._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        assert rows == 10
+        with patch("app.cache.time.time", return_value=1020.0):
+            assert cache.get("k0") is None
+            assert cache.get("k14") is not None
+
+
+class TestPipelineCaching:
+    """_run_pipeline skips every stage for an image it has already scored."""
+
+    @pytest.mark.asyncio
+    async def test_repeat_image_skips_detector(self) -> None:
+        from app.main import _run_pipeline
+
+        image_bytes = _jpeg((1, 2, 3))
+
+        with (
+            patch("app.detector.detect", return_value=64) as detect,
+            patch("app.clients.post_callback", new_callable=AsyncMock, return_value=True),
+        ):
+            await _run_pipeline("job-a", None, "https://cb.example.com", image_bytes)
+            await _run_pipeline("job-b", None, "https://cb.example.com", image_bytes)
+
+        assert detect.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_missing_score_is_not_cached(self) -> None:
+        from app.main import _run_pipeline
+
+        image_bytes = _jpeg((4, 5, 6))
+
+        with (
+            patch("app.detector.detect", return_value=None) as detect,
+            patch("app.clients.post_callback", new_callable=AsyncMock, return_value=True),
+        ):
+            await _run_pipeline("job-a", None, "https://cb.example.com", image_bytes)
+            await _run_pipeline("job-b", None, "https://cb.example.com", image_bytes)
+
+        assert detect.call_count == 2
@@ -0,0 +1,284 @@
+"""Tests for the pooled HTTP clients and callback retries."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+from app import clients
+
+
+def _client_for(responses: list) -> tuple[httpx.AsyncClient, list[httpx.Request]]:
+    """A client whose transport replays ``responses`` (or raises them)."""
+    seen: list[httpx.Request] = []
+    pending = list(responses)
+
+    def _handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        outcome = pending.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(_handler)), seen
+
+
+@pytest.fixture(autouse=True)
+def _no_sleep():
+    with patch("app.clients.asyncio.sleep", new_callable=AsyncMock) as sleep:
+        yield sleep
+
+
+class TestPostCallback:
+    """Unit tests for clients.post_callback()."""
+
+    @pytest.mark.asyncio
+    async def test_success_first_try(self) -> None:
+        client, seen = _client_for([200])
+        with patch.object(clients, "callback_client", return_value=client):
+            assert await clients.post_callback("https://cb.test/report", {"a": 1}, job_id="j") is True
+
+        assert len(seen) == 1
+        assert seen[0].headers["Authorization"].startswith("Bearer ")
+
+    @pytest.mark.asyncio
+    async def test_retries_server_errors_then_succeeds(self, _no_sleep) -> None:
+        client, seen = _client_for([503, 502, 200])
+        with patch.object(clients, "callback_client", return_value=client):
+            assert await clients.post_callback("https://cb.test/report", {}, job_id="j") is True
+
+        assert len(seen) == 3
+        assert _no_sleep.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_retries_transport_errors(self) -> None:
+        client, seen = _client_for([httpx.ConnectError("refused"), 200])
+        with patch.object(clients, "callback_client", return_value=client):
+            assert await clients.post_callback("https://cb.test/report", {}, job_id="j") is True
+
+        assert len(seen) == 2
+
+    @pytest.mark.asyncio
+    async def test_client_errors_are_not_retried(self) -> None:
+        client, seen = _client_for([404])
+        with patch.object(clients, "callback_client", return_value=client):
+            assert await clients.post_callback("https://cb.test/report", {}, job_id="j") is False
+
+        assert len(seen) == 1
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_attempts(self) -> None:
+        client, seen = _client_for([500] * 10)
+        with (
+            patch.object(clients, "callback_client", return_value=client),
+            patch.object(clients.settings, "callback_max_attempts", 3),
+        ):
+            assert await clients.post_callback("https://cb.test/report", {}, job_id="j") is False
+
+        assert len(seen) == 3
+
+    def test_backoff_is_bounded_and_jittered(self) -> None:
+        with (
+            patch.object(clients.settings, "callback_backoff_seconds", 1.0),
+            patch.object(clients.settings, "callback_backoff_max_seconds", 4.0),
+        ):
+            delays = [clients._backoff_delay(attempt) for attempt in range(1, 10) for _ in range(20)]
+
+        assert all(0 <= d <= 4.0 for d in delays)
+        assert len(set(delays)) > 1
+
+
+class TestReportBatcher:
+    """Reports finishing together go out in one bulk callback."""
+
+    @staticmethod
+    def _batcher() -> clients.ReportBatcher:
+        return clients.ReportBatcher(window_seconds=0.01, max_reports=10, suffix="/batch")
+
+    @staticmethod
+    def _worker(handler) -> tuple[httpx.AsyncClient, list[httpx.Request]]:
+        seen: list[httpx.Request] = []
+
+        def _handler(request: httpx.Request) -> httpx.Response:
+            seen.append(request)
+            return handler(request)
+
+        return httpx.AsyncClient(transport=httpx.MockTransport(_handler)), seen
+
+    @pytest.mark.asyncio
+    async def test_reports_are_coalesced(self) -> None:
+        def _bulk(request: httpx.Request) -> httpx.Response:
+            ids = [report["job_id"] for report in json.loads(request.content)["reports"]]
+            results = [{"job_id": job_id, "ok": job_id != "b"} for job_id in ids]
+            return httpx.Response(200, json={"ok": True, "results": results})
+
+        client, seen = self._worker(_bulk)
+        batcher = self._batcher()
+        with patch.object(clients, "callback_client", return_value=client):
+            delivered = await asyncio.gather(*(
+                batcher.post("https://cb.test/report", {"job_id": job_id}, job_id=job_id)
+                for job_id in "abc"
+            ))
+
+        assert delivered == [True, False, True]
+        assert [str(request.url) for request in seen] == ["https://cb.test/report/batch"]
+
+    @pytest.mark.asyncio
+    async def test_single_report_uses_plain_endpoint(self) -> None:
+        client, seen = self._worker(lambda request: httpx.Response(200))
+        with patch.object(clients, "callback_client", return_value=client):
+            assert await self._batcher().post("https://cb.test/report", {}, job_id="a") is True
+
+        assert [str(request.url) for request in seen] == ["https://cb.test/report"]
+
+    @pytest.mark.asyncio
+    async def test_full_batch_is_sent_without_waiting(self) -> None:
+        client, seen = self._worker(lambda request: httpx.Response(200, json={"ok": True}))
+        batcher = clients.ReportBatcher(window_seconds=60.0, max_reports=2, suffix="/batch")
+        with patch.object(clients, "callback_client", return_value=client):
+            delivered = await asyncio.wait_for(asyncio.gather(
+                batcher.post("https://cb.test/report", {}, job_id="a"),
+                batcher.post("https://cb.test/report", {}, job_id="b"),
+            ), timeout=1.0)
+
+        assert delivered == [True, True]
+        assert len(seen) == 1
+
+    @pytest.mark.asyncio
+    async def test_missing_bulk_endpoint_falls_back(self) -> None:
+        def _no_bulk(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(404 if request.url.path.endswith("/batch") else 200)
+
+        client, seen = self._worker(_no_bulk)
+        batcher = self._batcher()
+        with patch.object(clients, "callback_client", return_value=client):
+            first = await asyncio.gather(*(
+                batcher.post("https://cb.test/report", {}, job_id=job_id) for job_id in "ab"
+            ))
+            second = await asyncio.gather(*(
+                batcher.post("https://cb.test/report", {}, job_id=job_id) for job_id in "cd"
+            ))
+
+        assert first == second == [True, True]
+        paths = [request.url.path for request in seen]
+        assert paths.count("/report/batch") == 1
+        assert paths.count("/report") == 4
+
+
+class TestDownloadImage:
+    """Unit tests for clients.download_image()."""
+
+    @staticmethod
+    def _client(body: bytes, headers: dict[str, str] | None = None) -> httpx.AsyncClient:
+        async def _chunks():
+            for i in range(0, len(body), 4):
+                yield body[i:i + 4]
+
+        def _handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, headers=headers, content=_chunks())
+
+        return httpx.AsyncClient(transport=httpx.MockTransport(_handler))
+
+    @pytest.mark.asyncio
+    async def test_returns_body(self) -> None:
+        with patch.object(clients, "download_client", return_value=self._client(b"x" * 10)):
+            assert await clients.download_image("https://img.test/a", max_bytes=10) == b"x" * 10
+
+    @pytest.mark.asyncio
+    async def test_declared_length_over_cap_is_refused(self) -> None:
+        client = self._client(b"x" * 8, headers={"Content-Length": "1000"})
+        with patch.object(clients, "download_client", return_value=client):
+            with pytest.raises(clients.ImageTooLargeError, match="1000"):
+                await clients.download_image("https://img.test/a", max_bytes=100)
+
+    @pytest.mark.asyncio
+    async def test_streamed_size_over_cap_is_cut_off(self) -> None:
+        # No Content-Length: the cap is enforced while streaming.
+        with patch.object(clients, "download_client", return_value=self._client(b"x" * 64)):
+            with pytest.raises(clients.ImageTooLargeError):
+                await clients.download_image("https://img.test/a", max_bytes=16)
+
+    @pytest.mark.asyncio
+    async def test_refusal_is_the_shared_size_error(self) -> None:
+        from app import imaging
+
+        with patch.object(clients, "download_client", return_value=self._client(b"x" * 64)):
+            with pytest.raises(imaging.ImageTooLargeError):
+                await clients.download_image("https://img.test/a", max_bytes=16)
+
+    @pytest.mark.asyncio
+    async def test_http_errors_raise(self) -> None:
+        client = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(404)),
+        )
+        with patch.object(clients, "download_client", return_value=client):
+            with pytest.raises(httpx.HTTPStatusError):
+                await clients.download_image("https://img.test/a", max_bytes=16)
+
+
+class TestRangedDownload:
+    """Unit tests for clients.download_head() / download_rest()."""
+
+    @staticmethod
+    def _client(body: bytes, *, ranges: bool = True) -> httpx.AsyncClient:
+        def _handler(request: httpx.Request) -> httpx.Response:
+            if not ranges:
+                return httpx.Response(200, content=body)
+            start, _, end = request.headers["Range"].removeprefix("bytes=").partition("-")
+            last = min(int(end) if end else len(body) - 1, len(body) - 1)
+            return httpx.Response(
+                206,
+                headers={"Content-Range": f"bytes {start}-{last}/{len(body)}"},
+                content=body[int(start):last + 1],
+            )
+
+        return httpx.AsyncClient(transport=httpx.MockTransport(_handler))
+
+    @pytest.mark.asyncio
+    async def test_head_then_rest(self) -> None:
+        body = bytes(range(100))
+        with patch.object(clients, "download_client", return_value=self._client(body)):
+            head = await clients.download_head("https://img.test/a", head_bytes=30, max_bytes=1000)
+            assert (head.data, head.size, head.complete) == (body[:30], 100, False)
+            assert await clients.download_rest("https://img.test/a", head, max_bytes=1000) == body
+
+    @pytest.mark.asyncio
+    async def test_small_file_is_complete(self) -> None:
+        with patch.object(clients, "download_client", return_value=self._client(b"tiny")):
+            head = await clients.download_head("https://img.test/a", head_bytes=30, max_bytes=1000)
+
+        assert head.complete and head.data == b"tiny"
+
+    @pytest.mark.asyncio
+    async def test_server_without_ranges_sends_everything(self) -> None:
+        client = self._client(b"x" * 100, ranges=False)
+        with patch.object(clients, "download_client", return_value=client):
+            head = await clients.download_head("https://img.test/a", head_bytes=30, max_bytes=1000)
+
+        assert head.complete and len(head.data) == 100
+
+    @pytest.mark.asyncio
+    async def test_size_over_cap_is_refused_from_content_range(self) -> None:
+        with patch.object(clients, "download_client", return_value=self._client(b"x" * 100)):
+            with pytest.raises(clients.ImageTooLargeError, match="100"):
+                await clients.download_head("https://img.test/a", head_bytes=30, max_bytes=50)
+
+
+class TestClientLifecycle:
+    """Clients are shared until closed."""
+
+    @pytest.mark.asyncio
+    async def test_clients_are_reused_and_closed(self) -> None:
+        await clients.close_clients()
+        first = clients.callback_client()
+        assert clients.callback_client() is first
+        assert clients.download_client() is not first
+
+        await clients.close_clients()
+        assert first.is_closed
+        assert clients.callback_client() is not first
+        await clients.close_clients()
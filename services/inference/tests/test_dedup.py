@@ -0,0 +1,163 @@
+"""Tests for perceptual hashing and near-duplicate score reuse."""
+
+from __future__ import annotations
+
+import functools
+import io
+import random
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from PIL import Image
+
+from app.dedup import BKTree, NearDuplicateIndex, dhash, hamming, is_distinctive
+
+
+@functools.lru_cache(maxsize=None)
+def _scene(seed: int) -> Image.Image:
+    """A photo-like image: random blobs over a gradient."""
+    rng = random.Random(seed)
+    img = Image.linear_gradient("L").resize((640, 480)).convert("RGB")
+    for _ in range(12):
+        x, y = rng.randrange(600), rng.randrange(440)
+        size = rng.randrange(40, 160)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        img.paste(color, (x, y, min(640, x + size), min(480, y + size)))
+    return img
+
+
+def _encode(img: Image.Image, fmt: str = "JPEG", **kwargs) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, **kwargs)
+    return buf.getvalue()
+
+
+def _reopen(data: bytes) -> Image.Image:
+    return Image.open(io.BytesIO(data)).convert("RGB")
+
+
+class TestDHash:
+    """dHash is stable under resizing and recompression, not across images."""
+
+    def test_resized_and_recompressed_copies_match(self) -> None:
+        original = dhash(_scene(1))
+        resized = dhash(_reopen(_encode(_scene(1).resize((320, 240)), quality=40)))
+        as_png = dhash(_reopen(_encode(_scene(1).resize((1280, 960)), "PNG")))
+
+        assert hamming(original, resized) <= 4
+        assert hamming(original, as_png) <= 4
+
+    def test_different_images_are_far_apart(self) -> None:
+        assert hamming(dhash(_scene(1)), dhash(_scene(2))) > 10
+
+    def test_flat_images_are_not_distinctive(self) -> None:
+        assert not is_distinctive(dhash(Image.new("RGB", (64, 64), (200, 10, 10))))
+        assert is_distinctive(dhash(_scene(1)))
+
+
+class TestBKTree:
+    """Radius search returns exactly what a linear scan would."""
+
+    def test_matches_brute_force(self) -> None:
+        rng = random.Random(7)
+        values = [rng.getrandbits(64) for _ in range(500)]
+        tree = BKTree()
+        for value in values:
+            tree.add(value)
+        query = values[123] ^ 0b1011  # three bits away
+
+        expected = sorted((hamming(query, v), v) for v in values if hamming(query, v) <= 6)
+        assert sorted(tree.search(query, 6)) == expected
+        assert len(tree) == len(set(values))
+
+
+class TestNearDuplicateIndex:
+    """Bounded, versioned, expiring score lookups."""
+
+    _HASH = dhash(_scene(1))
+
+    def _index(self, **kwargs) -> NearDuplicateIndex:
+        defaults = dict(max_entries=8, ttl_seconds=60, max_distance=4)
+        defaults.update(kwargs)
+        return NearDuplicateIndex(**defaults)
+
+    def test_nearest_match(self) -> None:
+        index = self._index()
+        index.add(self._HASH, "m@1", 80)
+        index.add(self._HASH ^ 0b1, "m@1", 20)
+
+        match = index.find(self._HASH ^ 0b11, "m@1")
+        assert (match.score, match.distance) == (20, 1)
+        assert index.find(self._HASH ^ 0b11111111, "m@1") is None
+
+    def test_model_version_isolated(self) -> None:
+        index = self._index()
+        index.add(self._HASH, "m@1", 80)
+        assert index.find(self._HASH, "m@2") is None
+
+    def test_lru_eviction_and_rebuild(self) -> None:
+        index = self._index(max_entries=2)
+        hashes = [self._HASH ^ (0xFF << shift) for shift in (8, 24, 40, 56)]
+        for score, value in enumerate(hashes):
+            index.add(value, "m@1", score)
+
+        assert len(index) == 2
+        assert index.find(hashes[0], "m@1") is None
+        assert index.find(hashes[3], "m@1").score == 3
+
+    def test_ttl(self) -> None:
+        index = self._index(ttl_seconds=10)
+        with patch("app.dedup.time.time", return_value=1000.0):
+            index.add(self._HASH, "m@1", 80)
+        with patch("app.dedup.time.time", return_value=1011.0):
+            assert index.find(self._HASH, "m@1") is None
+
+    def test_disabled(self) -> None:
+        index = self._index(max_entries=0)
+        index.add(self._HASH, "m@1", 80)
+        assert index.find(self._HASH, "m@1") is None
+
+
+class TestPipelineReuse:
+    """_run_pipeline reuses the score of a near-duplicate upload."""
+
+    @pytest.mark.asyncio
+    async def test_resized_copy_skips_detector(self) -> None:
+        from app import main
+
+        original = _encode(_scene(3))
+        copy = _encode(_scene(3).resize((480, 360)), quality=50)
+        callback = AsyncMock(return_value=True)
+
+        with (
+            patch.object(main, "_near_duplicates", NearDuplicateIndex(
+                max_entries=8, ttl_seconds=60, max_distance=4,
+            )),
+            patch("app.detector.detect", return_value=91) as detect,
+            patch("app.clients.post_callback", callback),
+        ):
+            await main._run_pipeline("job-a", None, "https://cb.example.com", original)
+            await main._run_pipeline("job-b", None, "https://cb.example.com", copy)
+
+        assert detect.call_count == 1
+        first, second = (call.args[1] for call in callback.call_args_list)
+        assert second["ai_likelihood"] == 91
+        assert not any("near-duplicate" in line for line in first["evidence"])
+        assert any("near-duplicate" in line for line in second["evidence"])
+
+    def test_batch_reuses_scores(self) -> None:
+        from app import main
+
+        blobs = [_encode(_scene(4)), _encode(_scene(4).resize((500, 375)), quality=60)]
+        index = NearDuplicateIndex(max_entries=8, ttl_seconds=60, max_distance=4)
+
+        with (
+            patch.object(main, "_near_duplicates", index),
+            patch("app.detector.detect_many", side_effect=lambda images: [77] * len(images)) as many,
+        ):
+            main._analyze_images(blobs[:1])
+            (result,) = main._analyze_images(blobs[1:])
+
+        assert many.call_args_list[-1].args == ([],)
+        assert result.ai_likelihood == 77
+        assert result.near_duplicate_distance is not None
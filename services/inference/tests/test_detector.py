@@ -0,0 +1,387 @@
+"""Tests for the detector's model loader, warm-up and readiness reporting.
+
+A fake ``transformers`` module stands in for the real one so the loader
+logic can be exercised without downloading weights.
+"""
+
+from __future__ import annotations
+
+import functools
+import io
+import sys
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from PIL import Image
+
+from app import backends, detector, registry
+from app.backends import ModelSpec
+from app.imaging import ImageContext
+from app.main import app
+
+
+class _FakeModel:
+    config = types.SimpleNamespace(id2label={0: "human", 1: "artificial"})
+
+    def eval(self) -> None:
+        pass
+
+
+def _fake_transformers(load_model) -> types.ModuleType:
+    module = types.ModuleType("transformers")
+    module.AutoFeatureExtractor = MagicMock()
+    module.AutoModelForImageClassification = types.SimpleNamespace(from_pretrained=load_model)
+    return module
+
+
+class _ConstantBackend(backends.DetectorBackend):
+    name = "constant"
+
+    def __init__(self, prob: float) -> None:
+        self.ai_index = 1
+        self.prob = prob
+        self.closed = False
+
+    def predict(self, images: list[Image.Image]) -> list[float]:
+        return [self.prob] * len(images)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def _jpeg(width: int = 64) -> ImageContext:
+    buf = io.BytesIO()
+    Image.new("RGB", (width, 64), (200, 10, 10)).save(buf, format="JPEG")
+    return ImageContext(buf.getvalue())
+
+
+def _deployment(backend, version: str = "test/model@v1") -> registry.Deployment:
+    return registry.Deployment(
+        version,
+        backend,
+        functools.partial(detector._predict_batch, backend),
+        max_batch_size=detector.settings.detector_batch_max_size,
+        max_wait_seconds=0.005,
+    )
+
+
+def _serve(backend) -> None:
+    """Make ``backend`` the loaded model."""
+    detector._registry.activate(_deployment(backend))
+
+
+@pytest.fixture(autouse=True)
+def _fresh_loader(monkeypatch):
+    """Give every test an unloaded detector."""
+    monkeypatch.setattr(detector, "_registry", registry.ModelRegistry())
+    monkeypatch.setattr(detector, "_state", "unloaded")
+    monkeypatch.setattr(detector, "_load_failures", 0)
+    monkeypatch.setattr(detector, "_next_load_attempt", 0.0)
+    monkeypatch.setattr(detector, "_last_error", None)
+    # The fake transformers module only provides from_pretrained loading.
+    monkeypatch.setattr(detector.settings, "torch_mmap_weights", False)
+    yield
+    detector._registry.clear()
+
+
+class TestModelLoader:
+    """Unit tests for detector._load_model()."""
+
+    def test_concurrent_first_calls_load_once(self) -> None:
+        calls = []
+
+        def _slow_load(*args, **kwargs):
+            calls.append(args)
+            time.sleep(0.05)
+            return _FakeModel()
+
+        with patch.dict(sys.modules, {"transformers": _fake_transformers(_slow_load)}):
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                for future in [pool.submit(detector._load_model) for _ in range(8)]:
+                    future.result()
+
+        assert len(calls) == 1
+        assert detector.status()["state"] == "ready"
+        assert detector._registry.active.backend.name == "torch"
+        assert detector._registry.active.backend.ai_index == 1
+
+    def test_failure_backs_off(self) -> None:
+        load = MagicMock(side_effect=OSError("hub unreachable"))
+
+        with patch.dict(sys.modules, {"transformers": _fake_transformers(load)}):
+            detector._load_model()
+            detector._load_model()  # within the backoff window: no retry
+
+            assert load.call_count == 1
+            state = detector.status()
+            assert state["state"] == "failed"
+            assert state["load_failures"] == 1
+            assert state["retry_in_seconds"] > 0
+            assert "hub unreachable" in state["last_error"]
+
+            # Once the backoff has elapsed the loader tries again.
+            detector._next_load_attempt = 0.0
+            detector._load_model()
+            assert load.call_count == 2
+            assert detector._next_load_attempt - time.monotonic() > 1.5 * (
+                detector.settings.model_load_backoff_seconds
+            )
+
+    def test_missing_ml_dependencies_disable_detection(self) -> None:
+        with patch.dict(sys.modules, {"transformers": None}):
+            detector._load_model()
+
+        assert detector.status()["state"] == "disabled"
+
+    def test_warm_up_runs_synthetic_inferences(self) -> None:
+        load = MagicMock(return_value=_FakeModel())
+        predicted = []
+
+        with (
+            patch.dict(sys.modules, {"transformers": _fake_transformers(load)}),
+            patch.object(detector, "_predict_batch", side_effect=lambda _, imgs: predicted.append(imgs) or [0.5]),
+        ):
+            detector.warm_up(3)
+
+        assert len(predicted) == 3
+        assert all(img.mode == "RGB" for batch in predicted for img in batch)
+
+
+class TestDetectMany:
+    """detect_many() scores a whole batch in one batcher call."""
+
+    @staticmethod
+    def _jpeg(width: int) -> ImageContext:
+        buf = io.BytesIO()
+        Image.new("RGB", (width, 64), (200, 10, 10)).save(buf, format="JPEG")
+        return ImageContext(buf.getvalue())
+
+    def test_scores_each_image(self, monkeypatch) -> None:
+        backend = MagicMock()
+        backend.predict.side_effect = lambda imgs: [0.1 * (i + 1) for i in range(len(imgs))]
+        _serve(backend)
+
+        scores = detector.detect_many([self._jpeg(64), self._jpeg(96), self._jpeg(128)])
+
+        assert scores == [10, 20, 30]
+
+    def test_undecodable_image_scores_none(self, monkeypatch) -> None:
+        backend = MagicMock()
+        backend.predict.side_effect = lambda imgs: [0.5] * len(imgs)
+        _serve(backend)
+
+        scores = detector.detect_many([self._jpeg(64), ImageContext(b"not an image")])
+
+        assert scores == [50, None]
+
+    def test_unavailable_model_scores_none(self) -> None:
+        with patch.dict(sys.modules, {"transformers": None}):
+            assert detector.detect_many([self._jpeg(64)] * 2) == [None, None]
+
+
+class TestMultiCrop:
+    """Crops are scored only when the whole-image score is inconclusive."""
+
+    @staticmethod
+    def _photo(width: int, height: int) -> ImageContext:
+        buf = io.BytesIO()
+        Image.effect_noise((width, height), 40).convert("RGB").save(buf, format="JPEG")
+        return ImageContext(buf.getvalue())
+
+    @staticmethod
+    def _backend(monkeypatch, global_prob: float, crop_prob: float = 0.9) -> MagicMock:
+        """Backend scoring crops (exactly input-sized) apart from whole views."""
+        size = detector.settings.detector_input_size
+        backend = MagicMock()
+        backend.predict.side_effect = lambda imgs: [
+            crop_prob if img.size == (size, size) else global_prob for img in imgs
+        ]
+        _serve(backend)
+        return backend
+
+    def test_confident_score_uses_one_view(self, monkeypatch) -> None:
+        backend = self._backend(monkeypatch, global_prob=0.95)
+
+        assert detector.detect(self._photo(1024, 768)) == 95
+        assert backend.predict.call_count == 1
+
+    def test_uncertain_score_is_refined_with_crops(self, monkeypatch) -> None:
+        monkeypatch.setattr(detector.settings, "detector_crop_count", 4)
+        backend = self._backend(monkeypatch, global_prob=0.5, crop_prob=0.9)
+
+        score = detector.detect(self._photo(1024, 768))
+
+        crops = backend.predict.call_args_list[-1].args[0]
+        assert len(crops) == 4
+        assert len({img.tobytes() for img in crops}) == 4
+        assert score == round((0.5 + 4 * 0.9) / 5 * 100)
+
+    def test_small_image_is_not_cropped(self, monkeypatch) -> None:
+        backend = self._backend(monkeypatch, global_prob=0.5)
+
+        assert detector.detect(self._photo(300, 300)) == 50
+        assert backend.predict.call_count == 1
+
+    def test_disabled(self, monkeypatch) -> None:
+        monkeypatch.setattr(detector.settings, "detector_crop_count", 0)
+        backend = self._backend(monkeypatch, global_prob=0.5)
+
+        assert detector.detect(self._photo(1024, 768)) == 50
+        assert backend.predict.call_count == 1
+
+    def test_batch_refines_only_uncertain_images(self, monkeypatch) -> None:
+        monkeypatch.setattr(detector.settings, "detector_crop_count", 2)
+        size = detector.settings.detector_input_size
+        backend = MagicMock()
+        backend.predict.side_effect = lambda imgs: [
+            0.9 if img.size == (size, size) else (0.5 if img.height > 300 else 0.05)
+            for img in imgs
+        ]
+        _serve(backend)
+
+        scores = detector.detect_many([self._photo(1024, 768), self._photo(512, 256)])
+
+        assert scores == [round((0.5 + 2 * 0.9) / 3 * 100), 5]
+        crop_batch = backend.predict.call_args_list[-1].args[0]
+        assert [img.size for img in crop_batch] == [(size, size)] * 2
+
+    def test_model_version_includes_crop_settings(self, monkeypatch) -> None:
+        monkeypatch.setattr(detector.settings, "detector_crop_count", 4)
+        with_crops = detector.model_version()
+        monkeypatch.setattr(detector.settings, "detector_crop_count", 0)
+
+        assert "+crops4" in with_crops
+        assert "+crops" not in detector.model_version()
+
+
+class TestReadyEndpoint:
+    """/ready reflects the loader state; /health does not."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        ("state", "expected"),
+        [("loading", 503), ("failed", 503), ("ready", 200), ("disabled", 200)],
+    )
+    async def test_ready_status_codes(self, state: str, expected: int) -> None:
+        detector._state = state
+
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            ready = await client.get("/ready")
+            health = await client.get("/health")
+
+        assert ready.status_code == expected
+        assert ready.json()["model"]["state"] == state
+        assert health.status_code == 200
+
+
+
+class TestDeploy:
+    """deploy() swaps models without dropping or mixing work."""
+
+    _NEW = [ModelSpec("org/new", "v2")]
+
+    def test_switches_to_warm_model(self) -> None:
+        old, new = _ConstantBackend(0.2), _ConstantBackend(0.9)
+        _serve(old)
+
+        with patch.object(backends, "create_model_backend", return_value=new):
+            version = detector.deploy(self._NEW, warmup_runs=1)
+
+        assert version.startswith("org/new@v2")
+        assert detector.status()["version"] == version
+        assert detector.detect(_jpeg()) == 90
+        assert old.closed
+
+    def test_failed_load_keeps_serving(self) -> None:
+        old = _ConstantBackend(0.2)
+        _serve(old)
+
+        with patch.object(backends, "create_model_backend", side_effect=OSError("no such revision")):
+            with pytest.raises(OSError):
+                detector.deploy(self._NEW, warmup_runs=1)
+
+        assert detector.detect(_jpeg()) == 20
+        assert not old.closed
+        assert detector.status()["deploying"] is None
+
+    def test_failed_warm_up_unloads_new_model(self) -> None:
+        _serve(_ConstantBackend(0.2))
+        broken = _ConstantBackend(0.9)
+        broken.predict = MagicMock(side_effect=RuntimeError("bad weights"))
+
+        with patch.object(backends, "create_model_backend", return_value=broken):
+            with pytest.raises(RuntimeError):
+                detector.deploy(self._NEW, warmup_runs=1)
+
+        assert broken.closed
+        assert detector.detect(_jpeg()) == 20
+
+    def test_concurrent_deploy_is_refused(self) -> None:
+        with detector._deploy_lock:
+            with pytest.raises(detector.DeployInProgressError):
+                detector.deploy(self._NEW, warmup_runs=0)
+
+    def test_pinned_work_finishes_on_old_model(self) -> None:
+        old, new = _ConstantBackend(0.2), _ConstantBackend(0.9)
+        _serve(old)
+
+        with detector.pinned() as version:
+            with patch.object(backends, "create_model_backend", return_value=new):
+                detector.deploy(self._NEW, warmup_runs=0)
+            assert detector.detect(_jpeg()) == 20
+            assert detector.model_version() == version
+            assert not old.closed
+
+        assert old.closed
+        assert detector.detect(_jpeg()) == 90
+
+    def test_ensemble_version_lists_members(self) -> None:
+        specs = backends.parse_model_specs("org/a@v1,org/b@v3*2")
+
+        assert detector.model_version(specs).startswith("ensemble[org/a@v1,org/b@v3*2]")
+
+
+class TestModelsEndpoint:
+    """POST /models starts a deploy in the background."""
+
+    @staticmethod
+    async def _post(models: list[str]):
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/models",
+                json={"models": models},
+                headers={"Authorization": "Bearer test-secret"},
+            )
+
+    @pytest.mark.asyncio
+    async def test_accepts_and_deploys(self) -> None:
+        with patch("app.main._deploy_models") as deploy:
+            resp = await self._post(["org/new@v2"])
+
+        assert resp.status_code == 202
+        assert resp.json()["deploying"].startswith("org/new@v2")
+        assert deploy.call_args.args[0] == [ModelSpec("org/new", "v2")]
+
+    @pytest.mark.asyncio
+    async def test_rejects_invalid_weight(self) -> None:
+        with patch("app.main._deploy_models") as deploy:
+            resp = await self._post(["org/a*0", "org/b"])
+
+        assert resp.status_code == 400
+        deploy.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_conflicts_with_running_deploy(self, monkeypatch) -> None:
+        monkeypatch.setattr(detector, "_deploying", "org/other@v1+torch")
+
+        with patch("app.main._deploy_models") as deploy:
+            resp = await self._post(["org/new@v2"])
+
+        assert resp.status_code == 409
+        deploy.assert_not_called()
@@ -0,0 +1,216 @@
+"""Tests for the bounded pipeline executor and /analyze backpressure."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from unittest.mock import patch
+
+import httpx
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.executor import MemoryBudget, PipelineExecutor, QueueFullError
+from app.jobqueue import JobQueue, JobRunner
+from app.main import app
+
+
+async def _blocking_job(release: asyncio.Event) -> None:
+    await release.wait()
+
+
+class TestPipelineExecutor:
+    """Unit tests for PipelineExecutor."""
+
+    @pytest.mark.asyncio
+    async def test_runs_submitted_job(self) -> None:
+        executor = PipelineExecutor(max_workers=1, max_queue=1)
+
+        async def _double(x: int) -> int:
+            return x * 2
+
+        try:
+            assert await executor.submit(_double, 21) == 42
+        finally:
+            executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_rejects_when_full(self) -> None:
+        executor = PipelineExecutor(max_workers=1, max_queue=1)
+        release = asyncio.Event()
+        try:
+            tasks = [
+                executor.submit(_blocking_job, release),
+                executor.submit(_blocking_job, release),
+            ]
+            with pytest.raises(QueueFullError):
+                executor.submit(_blocking_job, release)
+        finally:
+            release.set()
+            await asyncio.gather(*tasks)
+            executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_capacity_is_released_after_completion(self) -> None:
+        executor = PipelineExecutor(max_workers=1, max_queue=0)
+        release = asyncio.Event()
+        release.set()
+        try:
+            await executor.submit(_blocking_job, release)
+            # Done-callbacks run on the loop right after completion; a
+            # second submit must now be admitted.
+            await asyncio.sleep(0)
+            await executor.submit(_blocking_job, release)
+        finally:
+            executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_stats_report_queue_depth(self) -> None:
+        executor = PipelineExecutor(max_workers=1, max_queue=2)
+        release = asyncio.Event()
+        try:
+            tasks = [
+                executor.submit(_blocking_job, release),
+                executor.submit(_blocking_job, release),
+            ]
+            await asyncio.sleep(0)
+            stats = executor.stats()
+            assert stats == {"queue_depth": 1, "in_flight": 1, "capacity": 3}
+        finally:
+            release.set()
+            await asyncio.gather(*tasks)
+            executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_cpu_stages_run_off_the_event_loop(self) -> None:
+        executor = PipelineExecutor(max_workers=1, max_queue=0, compute_threads=2)
+        try:
+            name = await executor.run_cpu(lambda: threading.current_thread().name)
+        finally:
+            executor.shutdown()
+
+        assert name.startswith("compute")
+        assert name != threading.current_thread().name
+
+
+class TestMemoryBudget:
+    """Byte-weighted admission of the compute stages."""
+
+    async def _hold(
+        self, budget: MemoryBudget, nbytes: int, log: list, name: str, release: asyncio.Event,
+    ) -> None:
+        async with budget.reserve(nbytes):
+            log.append(name)
+            await release.wait()
+
+    @pytest.mark.asyncio
+    async def test_waits_until_image_fits(self) -> None:
+        budget = MemoryBudget(capacity_bytes=100)
+        log: list[str] = []
+        first, second = asyncio.Event(), asyncio.Event()
+        tasks = [
+            asyncio.create_task(self._hold(budget, 60, log, "a", first)),
+            asyncio.create_task(self._hold(budget, 60, log, "b", second)),
+        ]
+        await asyncio.sleep(0.01)
+        assert log == ["a"]
+        assert budget.stats() == {"reserved_bytes": 60, "waiting": 1, "capacity_bytes": 100}
+
+        first.set()
+        await asyncio.sleep(0.01)
+        assert log == ["a", "b"]
+        second.set()
+        await asyncio.gather(*tasks)
+        assert budget.stats()["reserved_bytes"] == 0
+
+    @pytest.mark.asyncio
+    async def test_oversized_runs_alone_and_in_order(self) -> None:
+        budget = MemoryBudget(capacity_bytes=100)
+        log: list[str] = []
+        small, huge, later = asyncio.Event(), asyncio.Event(), asyncio.Event()
+        tasks = [asyncio.create_task(self._hold(budget, 10, log, "small", small))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(self._hold(budget, 500, log, "huge", huge)))
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(self._hold(budget, 10, log, "later", later)))
+        await asyncio.sleep(0.01)
+        # "later" would fit, but must not overtake the waiting "huge".
+        assert log == ["small"]
+
+        small.set()
+        await asyncio.sleep(0.01)
+        assert log == ["small", "huge"]
+        huge.set()
+        later.set()
+        await asyncio.gather(*tasks)
+        assert log == ["small", "huge", "later"]
+
+    @pytest.mark.asyncio
+    async def test_disabled(self) -> None:
+        budget = MemoryBudget(capacity_bytes=0)
+        async with budget.reserve(10**12):
+            assert budget.stats()["reserved_bytes"] == 0
+
+
+class TestAnalyzeBackpressure:
+    """/analyze queues work while busy and refuses it with 503 when the queue is full."""
+
+    _PAYLOAD = {
+        "job_id": "busy-1",
+        "object_key": "uploads/busy-1",
+        "image_url": "data:image/jpeg;base64,",
+        "callback_url": "https://worker.example.com/api/internal/report",
+    }
+
+    async def _post(self) -> httpx.Response:
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/analyze",
+                json=self._PAYLOAD,
+                headers={"Authorization": "Bearer test-secret"},
+            )
+
+    @pytest.mark.asyncio
+    async def test_full_queue_returns_503(self) -> None:
+        queue = JobQueue(None, max_pending=1, lease_seconds=60, retain_seconds=60)
+        queue.enqueue("other-1", "https://r2.example.com/other", "https://cb.example.com")
+
+        with patch("app.main._job_queue", queue):
+            resp = await self._post()
+
+        assert resp.status_code == 503
+        assert int(resp.headers["Retry-After"]) > 0
+        assert resp.headers["X-Queue-Depth"] == "1"
+
+    @pytest.mark.asyncio
+    async def test_busy_executor_queues_job(self) -> None:
+        from app import main
+
+        executor = PipelineExecutor(max_workers=1, max_queue=0)
+        release = asyncio.Event()
+        blocker = executor.submit(_blocking_job, release)
+        await asyncio.sleep(0)  # let the blocker take the only slot
+        runner = JobRunner(main._job_queue, executor, main._run_job, consumers=1, poll_seconds=1)
+
+        try:
+            with patch("app.main._executor", executor), patch("app.main._job_runner", runner):
+                resp = await self._post()
+        finally:
+            release.set()
+            await blocker
+            executor.shutdown()
+
+        assert resp.status_code == 200
+        assert resp.json()["queue_depth"] == 1
+        assert main._job_queue.stats()["queued"] == 1
+
+    @pytest.mark.asyncio
+    async def test_health_reports_queue_stats(self) -> None:
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.get("/health")
+
+        body = resp.json()
+        assert body["status"] == "ok"
+        assert {"queue_depth", "in_flight", "capacity"} <= body.keys()
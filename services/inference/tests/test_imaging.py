@@ -0,0 +1,245 @@
+"""Tests for the shared per-job image context and the stages that use it."""
+
+from __future__ import annotations
+
+import functools
+import io
+import math
+import random
+from unittest.mock import patch
+
+import pytest
+from PIL import Image, ImageChops, ImageFile, ImageFilter
+
+from app.imaging import ImageContext, ImageTooLargeError, estimate_decoded_bytes
+from app.metadata import extract_metadata
+
+
+def _image_bytes(fmt: str = "JPEG", mode: str = "RGB", exif: dict | None = None) -> bytes:
+    img = Image.new(mode, (320, 240), color=(10, 20, 30) if mode == "RGB" else 128)
+    buf = io.BytesIO()
+    kwargs = {}
+    if exif:
+        tags = Image.Exif()
+        for key, value in exif.items():
+            tags[key] = value
+        kwargs["exif"] = tags
+    img.save(buf, format=fmt, **kwargs)
+    return buf.getvalue()
+
+
+def _image_bytes_sized(fmt: str, width: int, height: int) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), color=(90, 60, 30)).save(buf, format=fmt)
+    return buf.getvalue()
+
+
+class TestImageContext:
+    """Unit tests for ImageContext."""
+
+    def test_header_fields(self) -> None:
+        ctx = ImageContext(_image_bytes("PNG"))
+        assert ctx.size == (320, 240)
+        assert ctx.format == "PNG"
+
+    def test_pixels_decoded_once(self) -> None:
+        ctx = ImageContext(_image_bytes())
+        with patch.object(Image, "open", wraps=Image.open) as opened:
+            first = ctx.rgb()
+            second = ctx.rgb()
+            ctx.container  # noqa: B018 - metadata access must not reopen the file
+
+        assert first is second
+        assert first.mode == "RGB"
+        assert opened.call_count == 1
+
+    def test_non_rgb_is_converted(self) -> None:
+        ctx = ImageContext(_image_bytes("PNG", mode="L"))
+        assert ctx.rgb().mode == "RGB"
+
+    def test_metadata_does_not_decode_jpeg_pixels(self) -> None:
+        ctx = ImageContext(_image_bytes())
+        original = ImageFile.ImageFile.load
+        with patch.object(ImageFile.ImageFile, "load", autospec=True, side_effect=original) as load:
+            extract_metadata(ctx)
+            assert load.call_count == 0
+            ctx.rgb()
+            assert load.call_count == 1
+
+    def test_close_is_idempotent(self) -> None:
+        with ImageContext(_image_bytes()) as ctx:
+            ctx.rgb()
+        ctx.close()
+
+
+class TestPixelLimit:
+    """Oversized images are refused from the header, before decoding."""
+
+    def test_refused_without_decoding(self) -> None:
+        ctx = ImageContext(_image_bytes_sized("PNG", 1200, 1000))
+        original = ImageFile.ImageFile.load
+        with (
+            patch("app.imaging.settings.max_image_pixels", 1_000_000),
+            patch.object(ImageFile.ImageFile, "load", autospec=True, side_effect=original) as load,
+        ):
+            with pytest.raises(ImageTooLargeError, match="1200x1000"):
+                extract_metadata(ctx)
+            assert load.call_count == 0
+
+    def test_pillow_bomb_error_is_mapped(self) -> None:
+        with (
+            patch("app.imaging.settings.max_image_pixels", 0),
+            patch.object(Image, "MAX_IMAGE_PIXELS", 1000),
+        ):
+            with pytest.raises(ImageTooLargeError):
+                ImageContext(_image_bytes()).size
+
+    def test_estimate(self) -> None:
+        assert estimate_decoded_bytes(_image_bytes()) == 320 * 240 * 6
+        assert estimate_decoded_bytes(_image_bytes("PNG", mode="L")) == 320 * 240 * 4
+        assert estimate_decoded_bytes(b"not an image") == 0
+        with patch("app.imaging.settings.max_image_pixels", 1000):
+            assert estimate_decoded_bytes(_image_bytes()) == 0
+
+
+class TestExtractMetadata:
+    """extract_metadata reads EXIF from the shared header."""
+
+    def test_camera_and_software_tags(self) -> None:
+        data = _image_bytes(exif={0x010F: "Canon", 0x0110: "EOS R5", 0x0131: "GIMP 2.10"})
+        meta = extract_metadata(ImageContext(data))
+
+        assert meta.has_exif is True
+        assert meta.camera_make_model == "Canon EOS R5"
+        assert meta.software_tag == "GIMP 2.10"
+        assert (meta.width, meta.height, meta.format) == (320, 240, "JPEG")
+
+    def test_no_exif(self) -> None:
+        meta = extract_metadata(ImageContext(_image_bytes()))
+
+        assert meta.has_exif is False
+        assert meta.camera_make_model is None
+        assert meta.software_tag is None
+
+
+# ---------------------------------------------------------------------------
+# Reduced-resolution decode
+# ---------------------------------------------------------------------------
+
+_MODEL_SIZE = 224
+
+
+@functools.lru_cache(maxsize=None)
+def _photo_like(width: int, height: int, fmt: str = "JPEG") -> bytes:
+    """Synthetic image with smooth regions, edges and sensor-like noise."""
+    base = Image.effect_mandelbrot(
+        (width // 4, height // 4), (-2.2, -1.2, 1.0, 1.2), 64,
+    ).resize((width, height), Image.BICUBIC)
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 24)
+    img = Image.merge(
+        "RGB", (base, gradient, ImageChops.add(base.rotate(90), noise, 2)),
+    ).filter(ImageFilter.SMOOTH)
+
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, **({"quality": 90} if fmt == "JPEG" else {}))
+    return buf.getvalue()
+
+
+def _model_input(img: Image.Image) -> Image.Image:
+    """What the ViT processor feeds the model: a bilinear 224x224 resize."""
+    return img.resize((_MODEL_SIZE, _MODEL_SIZE), Image.BILINEAR)
+
+
+def _legacy_model_input(data: bytes) -> Image.Image:
+    """The pre-reduced-decode path: full decode, LANCZOS thumbnail, resize."""
+    img = Image.open(io.BytesIO(data)).convert("RGB")
+    img.thumbnail((4096, 4096), Image.LANCZOS)
+    return _model_input(img)
+
+
+def _standin_score(img: Image.Image) -> int:
+    """Deterministic stand-in classifier: a fixed random linear probe.
+
+    Real detector weights can't be downloaded in tests; a random linear
+    readout over the model input is sensitive to the same resampling
+    differences, so it bounds how much the decode path moves a score.
+    """
+    features = [v / 255 - 0.5 for px in img.resize((32, 32), Image.BOX).getdata() for v in px]
+    rng = random.Random(0)
+    logit = sum(rng.gauss(0, 1) * f for f in features) / math.sqrt(len(features)) * 8
+    return round(100 / (1 + math.exp(-logit)))
+
+
+class TestReducedDecode:
+    """ImageContext.reduced_rgb() decodes close to the model input size."""
+
+    def test_jpeg_uses_dct_scaling(self) -> None:
+        ctx = ImageContext(_photo_like(1600, 1200))
+        reduced = ctx.reduced_rgb(_MODEL_SIZE)
+
+        assert min(reduced.size) >= _MODEL_SIZE
+        assert max(reduced.size) <= 2 * 1600 // 8 + 1
+        assert reduced.mode == "RGB"
+        # Header fields still describe the original image.
+        assert ctx.size == (1600, 1200)
+
+    def test_other_formats_are_reduced(self) -> None:
+        ctx = ImageContext(_image_bytes_sized("PNG", 1000, 900))
+        reduced = ctx.reduced_rgb(_MODEL_SIZE)
+
+        assert reduced.size == (250, 225)
+
+    def test_small_image_reuses_full_decode(self) -> None:
+        ctx = ImageContext(_image_bytes_sized("PNG", 300, 240))
+        assert ctx.reduced_rgb(_MODEL_SIZE) is ctx.rgb()
+
+    def test_full_decode_after_draft_is_full_size(self) -> None:
+        ctx = ImageContext(_photo_like(1600, 1200))
+        ctx.reduced_rgb(_MODEL_SIZE)
+
+        assert ctx.rgb().size == (1600, 1200)
+
+    def test_model_input_matches_legacy_path(self) -> None:
+        for fmt in ("JPEG", "PNG"):
+            data = _photo_like(1600, 1200, fmt)
+            legacy = _legacy_model_input(data)
+            reduced = _model_input(ImageContext(data).reduced_rgb(_MODEL_SIZE))
+
+            diff = ImageChops.difference(legacy, reduced)
+            mean_abs = sum(sum(px) for px in diff.getdata()) / (_MODEL_SIZE * _MODEL_SIZE * 3)
+            assert mean_abs < 2.0, fmt
+
+    def test_scores_within_tolerance_of_legacy_path(self) -> None:
+        for fmt in ("JPEG", "PNG"):
+            for size in ((1600, 1200), (1200, 1600)):
+                data = _photo_like(*size, fmt)
+                legacy = _standin_score(_legacy_model_input(data))
+                reduced = _standin_score(_model_input(ImageContext(data).reduced_rgb(_MODEL_SIZE)))
+                assert abs(legacy - reduced) <= 2, (fmt, size, legacy, reduced)
+
+    def test_real_model_scores_within_tolerance(self) -> None:
+        """Same check through a (tiny, randomly initialised) HF ViT."""
+        torch = pytest.importorskip("torch")
+        transformers = pytest.importorskip("transformers")
+
+        torch.manual_seed(0)
+        model = transformers.ViTForImageClassification(
+            transformers.ViTConfig(
+                image_size=_MODEL_SIZE, patch_size=16, hidden_size=32,
+                num_hidden_layers=2, num_attention_heads=2, intermediate_size=64,
+                num_labels=2,
+            ),
+        ).eval()
+        processor = transformers.ViTImageProcessor()
+
+        def _score(img: Image.Image) -> int:
+            with torch.inference_mode():
+                logits = model(**processor(images=[img], return_tensors="pt")).logits
+            return round(float(torch.softmax(logits, dim=-1)[0, 1]) * 100)
+
+        data = _photo_like(1600, 1200)
+        legacy = Image.open(io.BytesIO(data)).convert("RGB")
+        reduced = ImageContext(data).reduced_rgb(_MODEL_SIZE)
+        assert abs(_score(legacy) - _score(reduced)) <= 2
+
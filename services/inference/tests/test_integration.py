@@ -38,25 +38,22 @@ def _make_data_url(image_bytes: bytes, media_type: str = "image/jpeg") -> str:
     return f"data:{media_type};base64,{encoded}"
 
 
-def _mock_sync_client(captured: dict):
-    """Build a mock httpx.Client (sync) that captures the callback POST.
+def _mock_callback_client(captured: dict):
+    """Build a stand-in for the pooled callback client that captures the POST.
 
-    Patches the ``httpx.Client`` reference used by the background pipeline.
+    Patches ``app.clients.callback_client`` used by the background pipeline.
     """
     mock_client = MagicMock()
 
-    def _capture_post(url, *, json=None, headers=None, **kwargs):
+    async def _capture_post(url, *, json=None, headers=None, **kwargs):
         captured["url"] = str(url)
         captured["body"] = json
         captured["headers"] = dict(headers) if headers else {}
         return httpx.Response(200, json={"status": "ok"})
 
     mock_client.post = _capture_post
-    mock_client.__enter__ = MagicMock(return_value=mock_client)
-    mock_client.__exit__ = MagicMock(return_value=False)
 
-    mock_cls = MagicMock(return_value=mock_client)
-    return mock_cls
+    return MagicMock(return_value=mock_client)
 
 
 # ---------------------------------------------------------------------------
@@ -94,7 +91,7 @@ class TestAnalyzeEndpoint:
 
         with (
             patch("app.detector.detect", return_value=72),
-            patch("app.main.httpx.Client", _mock_sync_client(captured)),
+            patch("app.clients.callback_client", _mock_callback_client(captured)),
         ):
             transport = ASGITransport(app=app)
             async with AsyncClient(transport=transport, base_url="http://test") as client:
@@ -137,7 +134,7 @@ class TestAnalyzeEndpoint:
 
         with (
             patch("app.detector.detect", return_value=None),
-            patch("app.main.httpx.Client", _mock_sync_client(captured)),
+            patch("app.clients.callback_client", _mock_callback_client(captured)),
         ):
             transport = ASGITransport(app=app)
             async with AsyncClient(transport=transport, base_url="http://test") as client:
@@ -182,7 +179,7 @@ class TestAnalyzeEndpoint:
 
         with (
             patch("app.detector.detect", return_value=50),
-            patch("app.main.httpx.Client", _mock_sync_client(captured)),
+            patch("app.clients.callback_client", _mock_callback_client(captured)),
         ):
             transport = ASGITransport(app=app)
             async with AsyncClient(transport=transport, base_url="http://test") as client:
@@ -217,7 +214,7 @@ class TestAnalyzeEndpoint:
 
         with (
             patch("app.detector.detect", return_value=95),
-            patch("app.main.httpx.Client", _mock_sync_client(captured)),
+            patch("app.clients.callback_client", _mock_callback_client(captured)),
         ):
             transport = ASGITransport(app=app)
             async with AsyncClient(transport=transport, base_url="http://test") as client:
@@ -246,7 +243,7 @@ class TestAnalyzeEndpoint:
 
         with (
             patch("app.detector.detect", return_value=5),
-            patch("app.main.httpx.Client", _mock_sync_client(captured)),
+            patch("app.clients.callback_client", _mock_callback_client(captured)),
         ):
             transport = ASGITransport(app=app)
             async with AsyncClient(transport=transport, base_url="http://test") as client:
@@ -260,3 +257,357 @@ class TestAnalyzeEndpoint:
         body = captured["body"]
         assert body["ai_likelihood"] == 5
         assert "likely authentic" in body["verdict_text"]
+
+
+class TestAnalyzeBinaryEndpoint:
+    """Integration tests for POST /analyze/binary (raw image body)."""
+
+    @staticmethod
+    def _headers(job_id: str = "binary-1") -> dict[str, str]:
+        return {
+            "Authorization": "Bearer test-secret",
+            "Content-Type": "image/jpeg",
+            "X-Job-Id": job_id,
+            "X-Object-Key": f"uploads/{job_id}",
+            "X-Callback-Url": "https://worker.example.com/api/internal/report",
+        }
+
+    @pytest.mark.asyncio
+    async def test_full_pipeline_from_raw_body(self, jpeg_bytes):
+        """Raw bytes go through the same pipeline as data URLs."""
+        captured: dict = {}
+
+        with (
+            patch("app.detector.detect", return_value=72),
+            patch("app.clients.callback_client", _mock_callback_client(captured)),
+        ):
+            transport = ASGITransport(app=app)
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                resp = await client.post(
+                    "/analyze/binary",
+                    content=jpeg_bytes,
+                    headers=self._headers(),
+                )
+
+        assert resp.status_code == 200
+        assert resp.json()["job_id"] == "binary-1"
+
+        body = captured["body"]
+        assert body["job_id"] == "binary-1"
+        assert body["ai_likelihood"] == 72
+        assert body["metadata"]["width"] == 640
+        assert body["metadata"]["format"] == "JPEG"
+
+    @pytest.mark.asyncio
+    async def test_rejects_oversized_body(self, jpeg_bytes):
+        """Bodies larger than max_upload_bytes get 413."""
+        with patch("app.main.settings.max_upload_bytes", len(jpeg_bytes) - 1):
+            transport = ASGITransport(app=app)
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                resp = await client.post(
+                    "/analyze/binary",
+                    content=jpeg_bytes,
+                    headers=self._headers(),
+                )
+
+        assert resp.status_code == 413
+
+    @pytest.mark.asyncio
+    async def test_requires_job_headers(self, jpeg_bytes):
+        """Missing job metadata headers are a validation error."""
+        headers = self._headers()
+        del headers["X-Callback-Url"]
+
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.post("/analyze/binary", content=jpeg_bytes, headers=headers)
+
+        assert resp.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_rejects_missing_auth(self, jpeg_bytes):
+        """The binary route uses the same shared-secret auth."""
+        headers = self._headers()
+        del headers["Authorization"]
+
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.post("/analyze/binary", content=jpeg_bytes, headers=headers)
+
+        assert resp.status_code == 401
+
+
+class TestAnalyzeDownload:
+    """Jobs whose image_url points at object storage are streamed in."""
+
+    @staticmethod
+    def _download_client(image_bytes: bytes) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            transport=httpx.MockTransport(
+                lambda request: httpx.Response(200, content=image_bytes),
+            ),
+        )
+
+    @pytest.mark.asyncio
+    async def test_downloaded_image_is_analyzed(self, jpeg_bytes):
+        from app.main import _run_pipeline
+
+        captured: dict = {}
+        with (
+            patch("app.detector.detect", return_value=40),
+            patch("app.clients.download_client", return_value=self._download_client(jpeg_bytes)),
+            patch("app.clients.callback_client", _mock_callback_client(captured)),
+        ):
+            await _run_pipeline("download-1", "https://r2.test/img", "https://cb.test/report")
+
+        assert captured["body"]["status"] == "done"
+        assert captured["body"]["metadata"]["width"] == 640
+
+    @pytest.mark.asyncio
+    async def test_oversized_download_fails_the_job(self, jpeg_bytes):
+        from app.main import _run_pipeline
+
+        captured: dict = {}
+        with (
+            patch("app.main.settings.max_upload_bytes", len(jpeg_bytes) - 1),
+            patch("app.detector.detect") as detect,
+            patch("app.clients.download_client", return_value=self._download_client(jpeg_bytes)),
+            patch("app.clients.callback_client", _mock_callback_client(captured)),
+        ):
+            await _run_pipeline("download-2", "https://r2.test/img", "https://cb.test/report")
+
+        assert captured["body"]["status"] == "failed"
+        assert "ImageTooLargeError" in captured["body"]["error"]
+        detect.assert_not_called()
+
+
+class TestAnalyzeRangedDownload:
+    """Headers are read first; the rest is downloaded only when needed."""
+
+    @staticmethod
+    def _storage(image_bytes: bytes) -> tuple[httpx.AsyncClient, list[str]]:
+        """Object storage honouring ``Range: bytes=a-b`` / ``bytes=a-``."""
+        ranges: list[str] = []
+
+        def _handler(request: httpx.Request) -> httpx.Response:
+            ranges.append(request.headers.get("Range", ""))
+            start, _, end = request.headers["Range"].removeprefix("bytes=").partition("-")
+            last = min(int(end) if end else len(image_bytes) - 1, len(image_bytes) - 1)
+            return httpx.Response(
+                206,
+                headers={"Content-Range": f"bytes {start}-{last}/{len(image_bytes)}"},
+                content=image_bytes[int(start):last + 1],
+            )
+
+        return httpx.AsyncClient(transport=httpx.MockTransport(_handler)), ranges
+
+    @pytest.mark.asyncio
+    async def test_rest_fetched_for_detector(self, jpeg_bytes):
+        from app.main import _run_pipeline
+
+        captured: dict = {}
+        client, ranges = self._storage(jpeg_bytes)
+        with (
+            patch("app.main.settings.image_head_bytes", 1024),
+            patch("app.detector.detect", return_value=40) as detect,
+            patch("app.clients.download_client", return_value=client),
+            patch("app.clients.callback_client", _mock_callback_client(captured)),
+        ):
+            await _run_pipeline("ranged-1", "https://worker.test/img", "https://cb.test/report")
+
+        assert ranges == ["bytes=0-1023", "bytes=1024-"]
+        assert detect.call_args.args[0].data == jpeg_bytes
+        assert captured["body"]["ai_likelihood"] == 40
+
+    @pytest.mark.asyncio
+    async def test_headers_settle_report_without_model(self, jpeg_bytes):
+        from app.main import _run_pipeline
+
+        captured: dict = {}
+        client, ranges = self._storage(jpeg_bytes)
+        with (
+            patch("app.main.settings.image_head_bytes", 1024),
+            patch("app.detector.is_disabled", return_value=True),
+            patch("app.clients.download_client", return_value=client),
+            patch("app.clients.callback_client", _mock_callback_client(captured)),
+        ):
+            await _run_pipeline("ranged-2", "https://worker.test/img", "https://cb.test/report")
+
+        assert ranges == ["bytes=0-1023"]
+        assert captured["body"]["status"] == "done"
+        assert captured["body"]["metadata"]["width"] == 640
+        assert captured["body"]["ai_likelihood"] is None
+
+    @pytest.mark.asyncio
+    async def test_headers_longer_than_head_fetch_the_rest(self):
+        from app.main import _run_pipeline
+
+        # An ICC profile (APP2) before the frame header, larger than the head.
+        buf = io.BytesIO()
+        Image.new("RGB", (640, 480), color=(120, 180, 60)).save(
+            buf, format="JPEG", icc_profile=bytes(range(256)) * 32,
+        )
+        image_bytes = buf.getvalue()
+
+        captured: dict = {}
+        client, ranges = self._storage(image_bytes)
+        with (
+            patch("app.main.settings.image_head_bytes", 1024),
+            patch("app.detector.detect", return_value=40),
+            patch("app.clients.download_client", return_value=client),
+            patch("app.clients.callback_client", _mock_callback_client(captured)),
+        ):
+            await _run_pipeline("ranged-4", "https://worker.test/img", "https://cb.test/report")
+
+        assert ranges == ["bytes=0-1023", "bytes=1024-"]
+        assert captured["body"]["status"] == "done"
+        assert captured["body"]["metadata"]["width"] == 640
+
+    @pytest.mark.asyncio
+    async def test_oversized_canvas_refused_from_headers(self, jpeg_bytes):
+        from app.main import _run_pipeline
+
+        captured: dict = {}
+        client, ranges = self._storage(jpeg_bytes)
+        with (
+            patch("app.main.settings.image_head_bytes", 1024),
+            patch("app.imaging.settings.max_image_pixels", 1000),
+            patch("app.clients.download_client", return_value=client),
+            patch("app.clients.callback_client", _mock_callback_client(captured)),
+        ):
+            await _run_pipeline("ranged-3", "https://worker.test/img", "https://cb.test/report")
+
+        assert ranges == ["bytes=0-1023"]
+        assert "ImageTooLargeError" in captured["body"]["error"]
+
+
+class TestAnalyzeBatchEndpoint:
+    """Integration tests for POST /analyze/batch."""
+
+    @staticmethod
+    def _items(image_urls: list[str]) -> list[dict[str, str]]:
+        return [
+            {"job_id": f"batch-{i}", "object_key": f"uploads/batch-{i}", "image_url": url}
+            for i, url in enumerate(image_urls)
+        ]
+
+    @pytest.mark.asyncio
+    async def test_streams_ndjson_reports_in_order(self, jpeg_bytes):
+        """Without a callback_url, reports come back as NDJSON lines."""
+        urls = [_make_data_url(_make_jpeg_bytes(100 + i, 80)) for i in range(5)]
+        urls.insert(2, "data:image/jpeg;base64,bm90IGFuIGltYWdl")  # "not an image"
+        scored: list[int] = []
+
+        def _detect_many(images):
+            scored.append(len(images))
+            return [60] * len(images)
+
+        with (
+            patch("app.detector.detect_many", side_effect=_detect_many),
+            patch("app.main.settings.detector_batch_max_size", 4),
+        ):
+            transport = ASGITransport(app=app)
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                resp = await client.post(
+                    "/analyze/batch",
+                    json={"items": self._items(urls)},
+                    headers={"Authorization": "Bearer test-secret"},
+                )
+
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in resp.text.splitlines()]
+
+        assert [line["job_id"] for line in lines] == [f"batch-{i}" for i in range(6)]
+        assert lines[2]["status"] == "failed"
+        assert [line["status"] for i, line in enumerate(lines) if i != 2] == ["done"] * 5
+        assert lines[0]["ai_likelihood"] == 60
+        assert lines[0]["metadata"]["width"] == 100
+        # Two chunks of four items; the undecodable one never reaches the detector.
+        assert scored == [3, 2]
+
+    @pytest.mark.asyncio
+    async def test_single_batched_callback(self, jpeg_bytes):
+        """With a callback_url, all reports are POSTed in one callback."""
+        captured: dict = {}
+        payload = {
+            "items": self._items([_make_data_url(jpeg_bytes)] * 3),
+            "callback_url": "https://worker.example.com/api/internal/report/batch",
+        }
+
+        with (
+            patch("app.detector.detect_many", side_effect=lambda images: [20] * len(images)),
+            patch("app.clients.callback_client", _mock_callback_client(captured)),
+        ):
+            transport = ASGITransport(app=app)
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                resp = await client.post(
+                    "/analyze/batch",
+                    json=payload,
+                    headers={"Authorization": "Bearer test-secret"},
+                )
+
+        assert resp.status_code == 200
+        assert resp.json()["jobs"] == 3
+        assert captured["url"] == payload["callback_url"]
+        reports = captured["body"]["reports"]
+        assert [r["job_id"] for r in reports] == ["batch-0", "batch-1", "batch-2"]
+        assert all(r["ai_likelihood"] == 20 for r in reports)
+
+    @pytest.mark.asyncio
+    async def test_large_batch_callback_is_split(self, jpeg_bytes):
+        """Reports beyond the Worker's per-POST limit go in further callbacks."""
+        posted: list[list[str]] = []
+        mock_client = MagicMock()
+
+        async def _post(url, *, json=None, headers=None, **kwargs):
+            posted.append([report["job_id"] for report in json["reports"]])
+            return httpx.Response(200, json={"ok": True})
+
+        mock_client.post = _post
+        payload = {
+            "items": self._items([_make_data_url(jpeg_bytes)] * 5),
+            "callback_url": "https://worker.example.com/api/internal/report/batch",
+        }
+
+        with (
+            patch("app.main.settings.callback_batch_max_reports", 2),
+            patch("app.detector.detect_many", side_effect=lambda images: [20] * len(images)),
+            patch("app.clients.callback_client", MagicMock(return_value=mock_client)),
+        ):
+            transport = ASGITransport(app=app)
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                resp = await client.post(
+                    "/analyze/batch",
+                    json=payload,
+                    headers={"Authorization": "Bearer test-secret"},
+                )
+
+        assert resp.status_code == 200
+        assert posted == [["batch-0", "batch-1"], ["batch-2", "batch-3"], ["batch-4"]]
+
+    @pytest.mark.asyncio
+    async def test_rejects_oversized_batch(self, jpeg_bytes):
+        """Batches over batch_max_items get 413."""
+        with patch("app.main.settings.batch_max_items", 2):
+            transport = ASGITransport(app=app)
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                resp = await client.post(
+                    "/analyze/batch",
+                    json={"items": self._items([_make_data_url(jpeg_bytes)] * 3)},
+                    headers={"Authorization": "Bearer test-secret"},
+                )
+
+        assert resp.status_code == 413
+
+    @pytest.mark.asyncio
+    async def test_rejects_missing_auth(self, jpeg_bytes):
+        """The batch route uses the same shared-secret auth."""
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.post(
+                "/analyze/batch",
+                json={"items": self._items([_make_data_url(jpeg_bytes)])},
+            )
+
+        assert resp.status_code == 401
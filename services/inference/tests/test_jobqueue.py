@@ -0,0 +1,180 @@
+"""Tests for the durable job queue and the runner draining it."""
+
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.executor import PipelineExecutor, QueueFullError
+from app.jobqueue import Job, JobQueue, JobRunner
+
+_CALLBACK = "https://worker.example.com/api/internal/report"
+
+
+def _queue(path: str | None = None, **overrides) -> JobQueue:
+    options = {"max_pending": 8, "lease_seconds": 60.0, "retain_seconds": 60.0, **overrides}
+    return JobQueue(path, **options)
+
+
+class TestJobQueue:
+    """Persistence, leases and de-duplication."""
+
+    def test_claims_in_arrival_order(self) -> None:
+        queue = _queue()
+        queue.enqueue("a", "https://r2/a", _CALLBACK)
+        queue.enqueue("b", None, _CALLBACK, b"raw")
+
+        first, second = queue.claim(), queue.claim()
+
+        assert (first.job_id, first.attempts) == ("a", 1)
+        assert (second.job_id, second.image_bytes) == ("b", b"raw")
+        assert queue.claim() is None
+        assert queue.stats() == {"queued": 0, "running": 2, "max_pending": 8}
+
+    def test_duplicate_job_id_is_not_queued_twice(self) -> None:
+        queue = _queue()
+        assert queue.enqueue("a", "https://r2/a", _CALLBACK) is not None
+        assert queue.enqueue("a", "https://r2/a", _CALLBACK) is None
+
+        queue.complete(queue.claim().job_id)
+
+        assert queue.enqueue("a", "https://r2/a", _CALLBACK) is None
+        assert queue.pending == 0
+
+    def test_full_queue_is_refused(self) -> None:
+        queue = _queue(max_pending=1)
+        queue.enqueue("a", "https://r2/a", _CALLBACK)
+
+        assert queue.is_full
+        with pytest.raises(QueueFullError):
+            queue.enqueue("b", "https://r2/b", _CALLBACK)
+
+    def test_expired_lease_is_redelivered(self) -> None:
+        queue = _queue(lease_seconds=-1.0)
+        queue.enqueue("a", "https://r2/a", _CALLBACK, claim=True)
+
+        job = queue.claim()
+
+        assert (job.job_id, job.attempts) == ("a", 2)
+
+    def test_release_does_not_count_the_attempt(self) -> None:
+        queue = _queue()
+        queue.enqueue("a", "https://r2/a", _CALLBACK, claim=True)
+
+        queue.release("a")
+
+        assert queue.claim().attempts == 1
+
+    def test_jobs_survive_reopening(self, tmp_path) -> None:
+        path = str(tmp_path / "jobs.sqlite3")
+        # A process that crashed while running "a", whose lease has run out.
+        queue = _queue(path, lease_seconds=-1.0)
+        queue.enqueue("a", None, _CALLBACK, b"raw", claim=True)
+        queue.enqueue("b", "https://r2/b", _CALLBACK)
+        queue.close()
+
+        reopened = _queue(path)
+
+        crashed = reopened.claim()
+        assert (crashed.job_id, crashed.image_bytes, crashed.attempts) == ("a", b"raw", 2)
+        assert reopened.claim().job_id == "b"
+
+
+class TestJobRunner:
+    """Jobs run at once when there is room and from the queue otherwise."""
+
+    @staticmethod
+    def _runner(queue: JobQueue, executor: PipelineExecutor, run) -> JobRunner:
+        return JobRunner(queue, executor, run, consumers=2, poll_seconds=0.01)
+
+    @pytest.mark.asyncio
+    async def test_dispatched_job_is_completed(self) -> None:
+        queue, executor = _queue(), PipelineExecutor(max_workers=1, max_queue=0)
+        run = AsyncMock()
+        runner = self._runner(queue, executor, run)
+
+        try:
+            await runner.dispatch(queue.enqueue("a", "https://r2/a", _CALLBACK, claim=True))
+        finally:
+            executor.shutdown()
+
+        run.assert_awaited_once()
+        assert queue.pending == 0
+
+    @pytest.mark.asyncio
+    async def test_consumers_run_jobs_left_waiting(self) -> None:
+        queue, executor = _queue(), PipelineExecutor(max_workers=1, max_queue=0)
+        ran: list[str] = []
+
+        async def _run(job: Job) -> None:
+            ran.append(job.job_id)
+
+        runner = self._runner(queue, executor, _run)
+        queue.enqueue("old", "https://r2/old", _CALLBACK)
+        release = asyncio.Event()
+        blocker = executor.submit(release.wait)
+
+        try:
+            new = queue.enqueue("new", "https://r2/new", _CALLBACK, claim=True)
+            assert runner.dispatch(new) is None
+            runner.start()
+            await asyncio.sleep(0.05)
+            assert ran == []  # the executor is still busy
+
+            release.set()
+            await blocker
+            for _ in range(100):
+                if len(ran) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            await runner.drain(1.0)
+        finally:
+            executor.shutdown()
+
+        assert ran == ["old", "new"]
+        assert queue.pending == 0
+
+    @pytest.mark.asyncio
+    async def test_drain_hands_unfinished_jobs_back(self) -> None:
+        queue, executor = _queue(), PipelineExecutor(max_workers=1, max_queue=0)
+        started = asyncio.Event()
+
+        async def _hang(job: Job) -> None:
+            started.set()
+            await asyncio.Event().wait()
+
+        runner = self._runner(queue, executor, _hang)
+        runner.start()
+        try:
+            runner.dispatch(queue.enqueue("a", "https://r2/a", _CALLBACK, claim=True))
+            await started.wait()
+            await runner.drain(0.01)
+        finally:
+            executor.shutdown()
+
+        assert queue.stats()["queued"] == 1
+        assert queue.claim().attempts == 1
+
+
+class TestGivingUp:
+    """A job that keeps failing to finish is reported failed."""
+
+    @pytest.mark.asyncio
+    async def test_exhausted_attempts_post_failure(self) -> None:
+        from app import main
+
+        job = Job("a", "https://r2/a", _CALLBACK, None, main.settings.job_queue_max_attempts + 1)
+        callback = AsyncMock(return_value=True)
+
+        with (
+            patch("app.clients.post_callback", callback),
+            patch.object(main, "_run_pipeline", AsyncMock()) as pipeline,
+        ):
+            await main._run_job(job)
+
+        pipeline.assert_not_called()
+        payload = callback.call_args.args[1]
+        assert payload["status"] == "failed"
+        assert "attempts" in payload["error"]
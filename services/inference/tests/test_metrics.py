@@ -0,0 +1,111 @@
+"""Tests for the Prometheus metrics registry and the /metrics endpoint."""
+
+from __future__ import annotations
+
+import base64
+import io
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from PIL import Image
+
+from app import metrics
+from app.main import app
+
+
+class TestRendering:
+    """Text exposition format of each metric type."""
+
+    def test_counter_with_labels(self) -> None:
+        counter = metrics.Counter("t_events_total", "Events.", ("kind",))
+        counter.inc(kind="a")
+        counter.inc(2, kind='quote"d')
+
+        assert counter.render().splitlines() == [
+            "# HELP t_events_total Events.",
+            "# TYPE t_events_total counter",
+            't_events_total{kind="a"} 1',
+            't_events_total{kind="quote\\"d"} 2',
+        ]
+
+    def test_unlabelled_metrics_start_at_zero(self) -> None:
+        assert metrics.Gauge("t_gauge", "G.").render().endswith("t_gauge 0")
+        assert "t_hist_count 0" in metrics.Histogram("t_hist", "H.", buckets=(1.0,)).render()
+
+    def test_histogram_buckets_are_cumulative(self) -> None:
+        hist = metrics.Histogram("t_seconds", "S.", ("stage",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            hist.observe(value, stage="x")
+
+        lines = hist.render().splitlines()[2:]
+        assert lines == [
+            't_seconds_bucket{stage="x",le="0.1"} 1',
+            't_seconds_bucket{stage="x",le="1"} 3',
+            't_seconds_bucket{stage="x",le="+Inf"} 4',
+            't_seconds_sum{stage="x"} 4.25',
+            't_seconds_count{stage="x"} 4',
+        ]
+
+    def test_wrong_labels_are_rejected(self) -> None:
+        counter = metrics.Counter("t_total", "T.", ("kind",))
+        with pytest.raises(ValueError, match="kind"):
+            counter.inc(other="x")
+
+
+def _jpeg_data_url() -> str:
+    buf = io.BytesIO()
+    Image.new("RGB", (320, 240), (1, 2, 3)).save(buf, format="JPEG")
+    return "data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode()
+
+
+class TestMetricsEndpoint:
+    """/metrics reflects pipeline activity."""
+
+    @pytest.mark.asyncio
+    async def test_pipeline_stages_are_recorded(self) -> None:
+        before = {
+            stage: metrics.STAGE_SECONDS.count(stage=stage)
+            for stage in ("data_url_decode", "metadata", "provenance", "scoring", "callback")
+        }
+        done_before = metrics.JOBS.value(status="done")
+
+        payload = {
+            "job_id": "metrics-1",
+            "object_key": "uploads/metrics-1",
+            "image_url": _jpeg_data_url(),
+            "callback_url": "https://worker.example.com/api/internal/report",
+        }
+        with (
+            patch("app.detector.detect", return_value=40),
+            patch("app.clients._post_with_retries", new_callable=AsyncMock, return_value=True),
+        ):
+            transport = ASGITransport(app=app)
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                await client.post(
+                    "/analyze", json=payload, headers={"Authorization": "Bearer test-secret"},
+                )
+                resp = await client.get("/metrics")
+
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+        for stage, count in before.items():
+            assert metrics.STAGE_SECONDS.count(stage=stage) == count + 1, stage
+        assert metrics.JOBS.value(status="done") == done_before + 1
+
+        body = resp.text
+        assert 'verifai_stage_duration_seconds_bucket{stage="metadata",le="+Inf"}' in body
+        assert 'verifai_image_pixels_count{format="JPEG"}' in body
+        assert "verifai_jobs_in_flight " in body
+        assert "verifai_queue_depth 0" in body
+        assert "verifai_model_loaded " in body
+
+    @pytest.mark.asyncio
+    async def test_callback_failures_are_counted(self) -> None:
+        from app import clients
+
+        failures_before = metrics.CALLBACK_FAILURES.value()
+        with patch.object(clients, "_post_with_retries", new_callable=AsyncMock, return_value=None):
+            assert await clients.post_callback("https://cb.test", {}, job_id="j") is False
+
+        assert metrics.CALLBACK_FAILURES.value() == failures_before + 1
@@ -0,0 +1,145 @@
+"""Tests for the shared model server and its remote backend."""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from app import backends, detector
+from app.model_server import ModelServer, RemoteBackend
+
+
+class _MeanBackend(backends.DetectorBackend):
+    """Scores an image by the mean of its red channel, in [0, 1]."""
+
+    name = "fake"
+    ai_index = 1
+
+    def __init__(self) -> None:
+        self.batches: list[int] = []
+
+    def predict(self, images: list[Image.Image]) -> list[float]:
+        self.batches.append(len(images))
+        if any(img.width == 13 for img in images):
+            raise RuntimeError("unsupported width")
+        return [img.getpixel((0, 0))[0] / 255 for img in images]
+
+
+@pytest.fixture()
+def server():
+    backend = _MeanBackend()
+    # Unix socket paths are length-limited; keep them short.
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="vms-"), "model.sock")
+    srv = ModelServer(backend, socket_path=socket_path, max_batch_size=8, max_wait_seconds=0.01)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    assert srv.wait_ready(timeout=5)
+    yield srv, backend, socket_path
+    srv.shutdown()
+    thread.join(timeout=5)
+
+
+def _shm_names() -> set[str]:
+    return {name for name in os.listdir("/dev/shm") if name.startswith("psm_")}
+
+
+class TestRemoteBackend:
+    """Images round-trip through shared memory to the server's backend."""
+
+    def test_predict_round_trip(self, server) -> None:
+        _, backend, socket_path = server
+        remote = RemoteBackend(socket_path, timeout=5)
+        try:
+            images = [
+                Image.new("RGB", (40, 30), (51, 0, 0)),
+                Image.new("L", (20, 20), 204),
+            ]
+            probs = remote.predict(images)
+        finally:
+            remote.close()
+
+        assert probs == pytest.approx([0.2, 0.8])
+        assert remote.ai_index == 1
+
+    def test_shared_memory_is_released(self, server) -> None:
+        _, _, socket_path = server
+        before = _shm_names()
+        remote = RemoteBackend(socket_path, timeout=5)
+        try:
+            remote.predict([Image.new("RGB", (64, 64))])
+        finally:
+            remote.close()
+
+        assert _shm_names() == before
+
+    def test_server_errors_are_raised(self, server) -> None:
+        _, _, socket_path = server
+        remote = RemoteBackend(socket_path, timeout=5)
+        try:
+            with pytest.raises(RuntimeError, match="unsupported width"):
+                remote.predict([Image.new("RGB", (13, 13))])
+            # The connection stays usable after an error reply.
+            assert remote.predict([Image.new("RGB", (8, 8))]) == [0.0]
+        finally:
+            remote.close()
+
+    def test_concurrent_workers_share_batches(self, server) -> None:
+        _, backend, socket_path = server
+        remotes = [RemoteBackend(socket_path, timeout=5) for _ in range(4)]
+        barrier = threading.Barrier(len(remotes))
+
+        def _call(remote: RemoteBackend) -> None:
+            barrier.wait()
+            remote.predict([Image.new("RGB", (8, 8))])
+
+        threads = [threading.Thread(target=_call, args=(r,)) for r in remotes]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=5)
+        for remote in remotes:
+            remote.close()
+
+        assert sum(backend.batches) == len(remotes)
+
+    def test_unreachable_server_fails_construction(self, tmp_path) -> None:
+        with pytest.raises(OSError):
+            RemoteBackend(str(tmp_path / "missing.sock"), timeout=1)
+
+    def test_reconnects_after_server_restart(self, server) -> None:
+        srv, backend, socket_path = server
+        remote = RemoteBackend(socket_path, timeout=5)
+        try:
+            remote.predict([Image.new("RGB", (8, 8))])
+            srv.shutdown()
+
+            restarted = ModelServer(
+                backend, socket_path=socket_path, max_batch_size=1, max_wait_seconds=0,
+            )
+            thread = threading.Thread(target=restarted.serve_forever, daemon=True)
+            thread.start()
+            assert restarted.wait_ready(timeout=5)
+            try:
+                assert remote.predict([Image.new("RGB", (8, 8), (255, 0, 0))]) == [1.0]
+            finally:
+                restarted.shutdown()
+                thread.join(timeout=5)
+        finally:
+            remote.close()
+
+
+class TestRemoteModelVersion:
+    """Cache keys follow the backend the server actually runs."""
+
+    def test_version_uses_server_backend(self) -> None:
+        with (
+            patch.object(detector.settings, "detector_backend", "remote"),
+            patch.object(detector.settings, "model_server_backend", "onnx"),
+            patch.object(detector.settings, "onnx_quantize", True),
+        ):
+            assert detector.model_version().endswith("+onnx-int8")
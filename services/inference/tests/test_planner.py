@@ -0,0 +1,129 @@
+"""Tests for cost-ordered stage planning and detector skipping."""
+
+from __future__ import annotations
+
+import io
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from PIL import Image
+
+from app import planner
+from app.imaging import ImageContext
+from app.schemas import ProvenanceResult
+
+_AI_PROVENANCE = ProvenanceResult(
+    c2pa_present=True,
+    c2pa_valid=True,
+    notes=["Manifest declares AI-generated content (trainedAlgorithmicMedia)."],
+    claim_generator="Adobe Firefly 1.0",
+)
+
+
+def _jpeg(color: tuple[int, int, int] = (40, 80, 120)) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (320, 320), color=color).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def _fresh_main():
+    from app import main
+    from app.cache import ResultCache
+
+    return patch.object(main, "_result_cache", ResultCache(max_entries=8, ttl_seconds=60))
+
+
+class TestPlan:
+    """Stage order and skip decisions."""
+
+    def test_stages_ordered_by_cost(self) -> None:
+        assert [stage.name for stage in planner.STAGES] == ["metadata", "provenance", "detector"]
+
+    def test_no_credentials_keeps_detector(self) -> None:
+        findings = planner.run_header_stages(ImageContext(_jpeg()))
+
+        assert findings.metadata is not None
+        assert findings.provenance.c2pa_present is False
+        assert findings.needs(planner.DETECTOR)
+
+    def test_ai_credentials_skip_detector(self) -> None:
+        with patch("app.provenance.check_provenance", return_value=_AI_PROVENANCE):
+            findings = planner.run_header_stages(ImageContext(_jpeg()))
+
+        assert not findings.needs(planner.DETECTOR)
+        assert "C2PA" in findings.skipped["detector"]
+
+    def test_unverified_credentials_keep_detector(self) -> None:
+        unverified = _AI_PROVENANCE.model_copy(update={"c2pa_valid": None})
+        with patch("app.provenance.check_provenance", return_value=unverified):
+            findings = planner.run_header_stages(ImageContext(_jpeg()))
+
+        assert findings.needs(planner.DETECTOR)
+
+    def test_disabled(self) -> None:
+        with (
+            patch("app.provenance.check_provenance", return_value=_AI_PROVENANCE),
+            patch.object(planner.settings, "planner_skip_decided_stages", False),
+        ):
+            findings = planner.run_header_stages(ImageContext(_jpeg()))
+
+        assert findings.needs(planner.DETECTOR)
+
+
+class TestPipelineSkip:
+    """The pipeline honours the plan and the report records it."""
+
+    @pytest.mark.asyncio
+    async def test_detector_not_run(self) -> None:
+        from app import main
+
+        callback = AsyncMock(return_value=True)
+        with (
+            _fresh_main(),
+            patch("app.provenance.check_provenance", return_value=_AI_PROVENANCE),
+            patch("app.detector.detect", return_value=12) as detect,
+            patch("app.clients.post_callback", callback),
+        ):
+            await main._run_pipeline("job-c2pa", None, "https://cb.example.com", _jpeg())
+
+        detect.assert_not_called()
+        report = callback.call_args.args[1]
+        assert report["ai_likelihood"] is None
+        assert report["confidence"] == "high"
+        assert any("was not run" in line for line in report["evidence"])
+        assert any("not run" in line for line in report["limitations"])
+
+    def test_skipped_result_is_cached(self) -> None:
+        from app import main
+
+        with (
+            _fresh_main(),
+            patch("app.provenance.check_provenance", return_value=_AI_PROVENANCE) as check,
+            patch("app.detector.detect", return_value=None),
+        ):
+            first = main._analyze_image(_jpeg())
+            second = main._analyze_image(_jpeg())
+
+        assert check.call_count == 1
+        assert second == first
+        assert "detector" in second.skipped_stages
+
+    def test_batch_scores_only_undecided_images(self) -> None:
+        from app import main
+
+        decided, undecided = _jpeg((200, 10, 10)), _jpeg((10, 200, 10))
+        plain = ProvenanceResult(c2pa_present=False, c2pa_valid=None, notes=[])
+
+        def _check(image):
+            return _AI_PROVENANCE if image.data == decided else plain
+
+        with (
+            _fresh_main(),
+            patch("app.provenance.check_provenance", side_effect=_check),
+            patch("app.detector.detect_many", side_effect=lambda images: [64] * len(images)) as many,
+        ):
+            first, second = main._analyze_images([decided, undecided])
+
+        assert len(many.call_args.args[0]) == 1
+        assert first.ai_likelihood is None and "detector" in first.skipped_stages
+        assert second.ai_likelihood == 64 and second.skipped_stages == {}
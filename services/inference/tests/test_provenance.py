@@ -0,0 +1,280 @@
+"""Tests for C2PA manifest discovery, parsing and the trust-chain cache."""
+
+from __future__ import annotations
+
+import io
+import struct
+import time
+import zlib
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from app import jumbf, provenance
+from app.imaging import ImageContext
+from app.provenance import ChainVerdict, TrustCache, check_provenance
+
+_AI_SOURCE = "http://cv.iptc.org/newscodes/digitalsourcetype/trainedAlgorithmicMedia"
+_CERT = b"\x30\x82fake-der-certificate"
+
+
+# ---------------------------------------------------------------------------
+# Builders
+# ---------------------------------------------------------------------------
+
+def _cbor(value: object) -> bytes:
+    def head(major: int, arg: int) -> bytes:
+        if arg < 24:
+            return bytes([major << 5 | arg])
+        if arg < 256:
+            return bytes([major << 5 | 24, arg])
+        if arg < 65536:
+            return bytes([major << 5 | 25]) + struct.pack(">H", arg)
+        return bytes([major << 5 | 26]) + struct.pack(">I", arg)
+
+    if value is None:
+        return b"\xf6"
+    if isinstance(value, bool):
+        return b"\xf5" if value else b"\xf4"
+    if isinstance(value, int):
+        return head(0, value) if value >= 0 else head(1, -1 - value)
+    if isinstance(value, bytes):
+        return head(2, len(value)) + value
+    if isinstance(value, str):
+        raw = value.encode()
+        return head(3, len(raw)) + raw
+    if isinstance(value, list):
+        return head(4, len(value)) + b"".join(_cbor(item) for item in value)
+    if isinstance(value, dict):
+        return head(5, len(value)) + b"".join(_cbor(k) + _cbor(v) for k, v in value.items())
+    raise TypeError(value)
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I", len(payload) + 8) + box_type + payload
+
+
+def _superbox(type_code: bytes, label: str, *children: bytes) -> bytes:
+    uuid = type_code + bytes.fromhex("00110010800000aa00389b71")
+    description = _box(b"jumd", uuid + b"\x03" + label.encode() + b"\x00")
+    return _box(b"jumb", description + b"".join(children))
+
+
+def _cbor_box(type_code: bytes, label: str, value: object) -> bytes:
+    return _superbox(type_code, label, _box(b"cbor", _cbor(value)))
+
+
+def _store(*, generator: str = "Adobe Firefly 1.0", source: str | None = _AI_SOURCE) -> bytes:
+    actions = {"actions": [{"action": "c2pa.created", **({"digitalSourceType": source} if source else {})}]}
+    cose = [_cbor({1: -7}), {33: [_CERT]}, None, b"signature"]
+    manifest = _superbox(
+        b"c2ma",
+        "urn:uuid:0000",
+        _superbox(b"c2as", "c2pa.assertions", _cbor_box(b"cbor", "c2pa.actions", actions)),
+        _cbor_box(b"c2cl", "c2pa.claim", {"claim_generator": generator}),
+        _cbor_box(b"c2cs", "c2pa.signature", cose),
+    )
+    return _superbox(b"c2pa", "c2pa", manifest)
+
+
+def _jpeg(store: bytes | None = None, *, packet_size: int = 60000) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48), color=(40, 80, 120)).save(buf, format="JPEG")
+    data = buf.getvalue()
+    if store is None:
+        return data
+    header, body = store[:8], store[8:]
+    segments = b""
+    for sequence, start in enumerate(range(0, len(body), packet_size), start=1):
+        payload = b"JP" + struct.pack(">HI", 1, sequence) + header + body[start:start + packet_size]
+        segments += b"\xff\xeb" + struct.pack(">H", len(payload) + 2) + payload
+    return data[:2] + segments + data[2:]
+
+
+def _png(store: bytes) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48)).save(buf, format="PNG")
+    data = buf.getvalue()
+    chunk = struct.pack(">I", len(store)) + b"caBX" + store
+    chunk += struct.pack(">I", zlib.crc32(b"caBX" + store) & 0xFFFFFFFF)
+    return data[:33] + chunk + data[33:]
+
+
+@pytest.fixture(autouse=True)
+def _fresh_trust_cache():
+    with patch.object(provenance, "_trust_cache", TrustCache(max_entries=16, ttl_seconds=60)):
+        yield
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestManifestStore:
+    """Locating and parsing manifest stores."""
+
+    def test_no_manifest_skips_parsing(self) -> None:
+        with patch.object(jumbf, "parse_store") as parse:
+            result = check_provenance(ImageContext(_jpeg()))
+
+        assert result.c2pa_present is False
+        assert result.c2pa_valid is None
+        assert result.notes == []
+        parse.assert_not_called()
+
+    def test_multi_segment_jpeg_store_reassembled(self) -> None:
+        store = _store()
+        ctx = ImageContext(_jpeg(store, packet_size=100))
+
+        assert len(ctx.container.jumbf) > 1
+        assert jumbf.manifest_store(ctx.container) == store
+
+    def test_manifest_fields(self) -> None:
+        (manifest,) = jumbf.parse_store(_store())
+
+        assert manifest.claim_generator == "Adobe Firefly 1.0"
+        assert manifest.digital_source_types == [_AI_SOURCE]
+        assert manifest.certificate_chain == [_CERT]
+
+    def test_non_c2pa_jumbf_ignored(self) -> None:
+        other = _superbox(b"xyzw", "other", _box(b"json", b"{}"))
+        assert check_provenance(ImageContext(_png(other))).c2pa_present is False
+
+    def test_deeply_nested_boxes(self) -> None:
+        nested = _box(b"json", b"{}")
+        for _ in range(2000):
+            nested = _box(b"jumb", nested)
+        store = _superbox(b"c2pa", "c2pa", nested)
+
+        with pytest.raises(jumbf.JumbfError, match="nested too deeply"):
+            jumbf.parse_store(store)
+        result = check_provenance(ImageContext(_png(store)))
+        assert result.c2pa_present is True
+        assert result.c2pa_valid is False
+
+    def test_malformed_store(self) -> None:
+        store = _store()
+        corrupt = store[:40] + b"\xff\xff\xff\xff" + store[44:]
+        result = check_provenance(ImageContext(_png(corrupt)))
+
+        assert result.c2pa_present is True
+        assert result.c2pa_valid is False
+
+
+class TestCheckProvenance:
+    """End-to-end results with the verification steps stubbed."""
+
+    def test_ai_manifest(self) -> None:
+        with (
+            patch.object(provenance, "_verify_signature", return_value=(True, None)),
+            patch.object(provenance, "validate_chain", return_value=ChainVerdict(True, "Adobe Inc.")),
+        ):
+            result = check_provenance(ImageContext(_png(_store())))
+
+        assert result.c2pa_present is True
+        assert result.c2pa_valid is True
+        assert result.claim_generator == "Adobe Firefly 1.0"
+        assert result.signer == "Adobe Inc."
+        assert result.digital_source_type == _AI_SOURCE
+        assert any("AI-generated" in note for note in result.notes)
+
+    def test_untrusted_signer_invalidates(self) -> None:
+        verdict = ChainVerdict(False, "Someone", "Signer is not on the C2PA trust list.")
+        with (
+            patch.object(provenance, "_verify_signature", return_value=(True, None)),
+            patch.object(provenance, "validate_chain", return_value=verdict),
+        ):
+            result = check_provenance(ImageContext(_jpeg(_store(source=None))))
+
+        assert result.c2pa_valid is False
+        assert result.digital_source_type is None
+        assert result.notes == ["Signer is not on the C2PA trust list."]
+
+    def test_without_c2pa_library(self) -> None:
+        with (
+            patch.dict("sys.modules", {"c2pa": None}),
+            patch.object(provenance, "validate_chain", return_value=ChainVerdict(None)),
+        ):
+            result = check_provenance(ImageContext(_jpeg(_store())))
+
+        assert result.c2pa_present is True
+        assert result.c2pa_valid is None
+        assert any("not verified" in note for note in result.notes)
+
+    def test_chain_validated_once_per_certificate(self) -> None:
+        with (
+            patch.object(provenance, "_verify_signature", return_value=(True, None)),
+            patch.object(provenance, "validate_chain", return_value=ChainVerdict(True)) as validate,
+        ):
+            for _ in range(3):
+                check_provenance(ImageContext(_jpeg(_store())))
+
+        validate.assert_called_once_with([_CERT])
+
+
+class TestTrustCache:
+    """Bounded, expiring fingerprint cache."""
+
+    def test_lru_eviction(self) -> None:
+        cache = TrustCache(max_entries=2, ttl_seconds=60)
+        for key in ("a", "b", "c"):
+            cache.put(key, ChainVerdict(True))
+
+        assert cache.get("a") is None
+        assert cache.get("c") == ChainVerdict(True)
+        assert len(cache) == 2
+
+    def test_ttl(self) -> None:
+        cache = TrustCache(max_entries=2, ttl_seconds=10)
+        cache.put("a", ChainVerdict(True))
+        with patch.object(time, "monotonic", return_value=time.monotonic() + 11):
+            assert cache.get("a") is None
+
+    def test_disabled(self) -> None:
+        cache = TrustCache(max_entries=0, ttl_seconds=10)
+        cache.put("a", ChainVerdict(True))
+        assert cache.get("a") is None
+
+
+class TestValidateChain:
+    """Chain validation against trust anchors (needs ``cryptography``)."""
+
+    def test_chain_to_anchor(self, tmp_path) -> None:
+        pytest.importorskip("cryptography")
+        import datetime
+
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.x509.oid import NameOID
+
+        def _cert(subject, issuer, key, issuer_key, ca):
+            now = datetime.datetime.now(datetime.timezone.utc)
+            return (
+                x509.CertificateBuilder()
+                .subject_name(x509.Name([x509.NameAttribute(NameOID.ORGANIZATION_NAME, subject)]))
+                .issuer_name(x509.Name([x509.NameAttribute(NameOID.ORGANIZATION_NAME, issuer)]))
+                .public_key(key.public_key())
+                .serial_number(x509.random_serial_number())
+                .not_valid_before(now)
+                .not_valid_after(now + datetime.timedelta(days=1))
+                .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True)
+                .sign(issuer_key, hashes.SHA256())
+            )
+
+        root_key, leaf_key = ec.generate_private_key(ec.SECP256R1()), ec.generate_private_key(ec.SECP256R1())
+        root = _cert("Root CA", "Root CA", root_key, root_key, True)
+        leaf = _cert("Camera Maker", "Root CA", leaf_key, root_key, False)
+        der = leaf.public_bytes(serialization.Encoding.DER)
+
+        anchors = tmp_path / "anchors.pem"
+        anchors.write_bytes(root.public_bytes(serialization.Encoding.PEM))
+        with patch.object(provenance.settings, "c2pa_trust_anchors_path", str(anchors)):
+            assert provenance.validate_chain([der]) == ChainVerdict(True, "Camera Maker")
+            other = tmp_path / "other.pem"
+            other.write_bytes(leaf.public_bytes(serialization.Encoding.PEM))
+            with patch.object(provenance.settings, "c2pa_trust_anchors_path", str(other)):
+                assert provenance.validate_chain(
+                    [root.public_bytes(serialization.Encoding.DER)]
+                ).trusted is False
@@ -0,0 +1,86 @@
+"""Tests for model deployments and the registry that switches between them."""
+
+from __future__ import annotations
+
+import threading
+
+from PIL import Image
+
+from app.backends import DetectorBackend
+from app.registry import Deployment, ModelRegistry
+
+
+class _Backend(DetectorBackend):
+    name = "fake"
+
+    def __init__(self, prob: float) -> None:
+        self.ai_index = 1
+        self.prob = prob
+        self.closed = False
+
+    def predict(self, images: list[Image.Image]) -> list[float]:
+        return [self.prob] * len(images)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def _deployment(version: str, prob: float) -> Deployment:
+    backend = _Backend(prob)
+    return Deployment(version, backend, backend.predict, max_batch_size=4, max_wait_seconds=0.0)
+
+
+class TestModelRegistry:
+    """Activation, in-flight tracking and unloading."""
+
+    def test_empty_registry_yields_none(self) -> None:
+        with ModelRegistry().acquire() as deployment:
+            assert deployment is None
+
+    def test_swap_waits_for_work_in_flight(self) -> None:
+        models = ModelRegistry()
+        old, new = _deployment("v1", 0.1), _deployment("v2", 0.9)
+        models.activate(old)
+
+        with models.acquire() as held:
+            models.activate(new)
+            assert models.active is new
+            assert held is old and not old.closed
+            assert held.batcher.submit(Image.new("RGB", (8, 8))) == 0.1
+
+        assert old.closed and old.backend.closed
+        assert not new.closed
+
+    def test_idle_deployment_unloads_on_swap(self) -> None:
+        models = ModelRegistry()
+        old = _deployment("v1", 0.1)
+        models.activate(old)
+
+        models.activate(_deployment("v2", 0.9))
+
+        assert old.closed
+
+    def test_concurrent_acquires_are_counted(self) -> None:
+        models = ModelRegistry()
+        deployment = _deployment("v1", 0.5)
+        models.activate(deployment)
+        inside = threading.Barrier(5)
+        release = threading.Event()
+
+        def _hold() -> None:
+            with models.acquire():
+                inside.wait()
+                release.wait()
+
+        threads = [threading.Thread(target=_hold) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        inside.wait()
+        assert deployment.in_flight == 4
+        models.clear()
+        assert not deployment.closed
+
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert deployment.closed
@@ -0,0 +1,234 @@
+"""Tests for the bounded container metadata scanner."""
+
+from __future__ import annotations
+
+import io
+import struct
+import time
+import zlib
+from unittest.mock import patch
+
+import pytest
+from PIL import Image, ImageFile, PngImagePlugin
+
+from app.imaging import ImageContext
+from app.metadata import extract_metadata
+from app.scanner import TAG_MAKE, TAG_MODEL, TAG_SOFTWARE, ContainerMetadata, scan
+
+_XMP = (
+    '<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF '
+    'xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">'
+    '<rdf:Description xmp:CreatorTool="Adobe Firefly" '
+    'xmlns:xmp="http://ns.adobe.com/xap/1.0/" '
+    'xmlns:Iptc4xmpExt="http://iptc.org/std/Iptc4xmpExt/2008-02-29/">'
+    "<Iptc4xmpExt:DigitalSourceType>"
+    "http://cv.iptc.org/newscodes/digitalsourcetype/trainedAlgorithmicMedia"
+    "</Iptc4xmpExt:DigitalSourceType>"
+    "</rdf:Description></rdf:RDF></x:xmpmeta>"
+)
+
+_CAMERA_EXIF = {TAG_MAKE: "Canon", TAG_MODEL: "EOS R5", TAG_SOFTWARE: "GIMP 2.10"}
+
+
+def _exif(tags: dict[int, str]) -> Image.Exif:
+    exif = Image.Exif()
+    for key, value in tags.items():
+        exif[key] = value
+    return exif
+
+
+def _encode(fmt: str, size: tuple[int, int] = (64, 48), **kwargs) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", size, color=(40, 80, 120)).save(buf, format=fmt, **kwargs)
+    return buf.getvalue()
+
+
+def _jpeg_with_segment(marker: int, payload: bytes) -> bytes:
+    """A JPEG with an extra APPn segment inserted straight after SOI."""
+    data = _encode("JPEG")
+    segment = bytes([0xFF, marker]) + struct.pack(">H", len(payload) + 2) + payload
+    return data[:2] + segment + data[2:]
+
+
+def _png_chunk(ctype: bytes, payload: bytes) -> bytes:
+    crc = zlib.crc32(ctype + payload) & 0xFFFFFFFF
+    return struct.pack(">I", len(payload)) + ctype + payload + struct.pack(">I", crc)
+
+
+class TestJpeg:
+    """APP1 / APP11 segments before the first SOS."""
+
+    def test_exif_fields(self) -> None:
+        found = scan(_encode("JPEG", exif=_exif(_CAMERA_EXIF)))
+
+        assert found.format == "JPEG"
+        assert found.has_exif is True
+        assert found.ifd0 == {TAG_MAKE: "Canon", TAG_MODEL: "EOS R5", TAG_SOFTWARE: "GIMP 2.10"}
+
+    def test_xmp_fields(self) -> None:
+        data = _jpeg_with_segment(0xE1, b"http://ns.adobe.com/xap/1.0/\x00" + _XMP.encode())
+        found = scan(data)
+
+        assert found.xmp_field("CreatorTool") == "Adobe Firefly"
+        assert found.xmp_field("DigitalSourceType").endswith("/trainedAlgorithmicMedia")
+
+    def test_app11_jumbf_collected(self) -> None:
+        payload = b"JP\x00\x01\x00\x00\x00\x01" + b"jumb-box"
+        assert scan(_jpeg_with_segment(0xEB, payload)).jumbf == [payload]
+
+    def test_stops_at_start_of_scan(self) -> None:
+        data = _encode("JPEG", size=(1024, 768))
+        found = scan(data)
+
+        assert found.has_exif is False
+        assert found.bytes_read == 0
+        # Metadata segments after SOS (i.e. inside image data) are not seen.
+        sos = data.index(b"\xff\xda")
+        trailer = b"\xff\xe1" + struct.pack(">H", 8) + b"Exif\x00\x00"
+        assert scan(data[:sos] + trailer + data[sos:]).bytes_read > 0
+        assert scan(data + trailer).bytes_read == 0
+
+
+class TestPng:
+    """Text and eXIf chunks before the first IDAT."""
+
+    def test_text_chunks(self) -> None:
+        info = PngImagePlugin.PngInfo()
+        info.add_text("parameters", "a cat, Steps: 20, Sampler: Euler a, Seed: 1")
+        info.add_text("workflow", '{"nodes": []}', zip=True)
+        info.add_itxt("Description", "une photo", lang="fr")
+        found = scan(_encode("PNG", pnginfo=info))
+
+        assert found.format == "PNG"
+        assert found.text == {
+            "parameters": "a cat, Steps: 20, Sampler: Euler a, Seed: 1",
+            "workflow": '{"nodes": []}',
+            "Description": "une photo",
+        }
+
+    def test_compressed_itxt_xmp(self) -> None:
+        info = PngImagePlugin.PngInfo()
+        info.add_itxt("XML:com.adobe.xmp", _XMP, zip=True)
+        found = scan(_encode("PNG", pnginfo=info))
+
+        assert found.xmp_field("CreatorTool") == "Adobe Firefly"
+        assert "XML:com.adobe.xmp" not in found.text
+
+    def test_exif_chunk(self) -> None:
+        found = scan(_encode("PNG", exif=_exif(_CAMERA_EXIF)))
+        assert found.ifd0[TAG_MAKE] == "Canon"
+
+    def test_chunks_after_idat_ignored(self) -> None:
+        data = _encode("PNG")
+        iend = data.rindex(b"IEND") - 4
+        late = _png_chunk(b"tEXt", b"parameters\x00late")
+        assert scan(data[:iend] + late + data[iend:]).text == {}
+
+
+class TestWebpAndTiff:
+    """RIFF metadata chunks and TIFF IFD0."""
+
+    def test_webp_exif_and_xmp(self) -> None:
+        data = _encode("WEBP", exif=_exif(_CAMERA_EXIF), xmp=_XMP.encode())
+        found = scan(data)
+
+        assert found.format == "WEBP"
+        assert found.ifd0[TAG_SOFTWARE] == "GIMP 2.10"
+        assert found.xmp_field("CreatorTool") == "Adobe Firefly"
+
+    def test_tiff_ifd0(self) -> None:
+        found = scan(_encode("TIFF", exif=_exif(_CAMERA_EXIF)))
+
+        assert found.format == "TIFF"
+        assert found.has_exif is True
+        assert found.ifd0[TAG_MODEL] == "EOS R5"
+
+
+class TestBounds:
+    """Malformed or oversized metadata never raises or reads past the cap."""
+
+    @pytest.mark.parametrize("fmt", ["JPEG", "PNG", "WEBP", "TIFF"])
+    def test_truncated_input(self, fmt: str) -> None:
+        data = _encode(fmt, exif=_exif(_CAMERA_EXIF))
+        for cut in (4, 16, 40, len(data) // 2):
+            scan(data[:cut])
+
+    @pytest.mark.parametrize("fmt", ["JPEG", "PNG"])
+    def test_headers_complete_only_once_image_data_is_reached(self, fmt: str) -> None:
+        data = _encode(fmt, exif=_exif(_CAMERA_EXIF))
+
+        assert scan(data).headers_complete is True
+        assert scan(data[:40]).headers_complete is False
+
+    def test_unknown_container(self) -> None:
+        found = scan(b"GIF89a" + b"\x00" * 32)
+        assert found.format is None
+
+    def test_max_bytes(self) -> None:
+        info = PngImagePlugin.PngInfo()
+        info.add_text("parameters", "x" * 5000)
+        found = scan(_encode("PNG", pnginfo=info), max_bytes=1000)
+
+        assert found.text == {}
+        assert found.bytes_read <= 1000
+
+    @pytest.mark.parametrize(
+        "filler",
+        ["a" * 1_000_000, "a:" * 500_000, "<a:Creator" * 100_000],
+        ids=["name-chars", "colons", "near-misses"],
+    )
+    def test_xmp_search_is_linear(self, filler: str) -> None:
+        started = time.perf_counter()
+        assert ContainerMetadata(xmp=filler).xmp_field("CreatorTool") is None
+        assert time.perf_counter() - started < 0.5
+
+    def test_xmp_element_and_prefix_bounds(self) -> None:
+        data = _jpeg_with_segment(
+            0xE1,
+            b"http://ns.adobe.com/xap/1.0/\x00"
+            + ("<" + "p" * 100 + ':CreatorTool>too long</x><xmp:CreatorTool>'
+               "<rdf:Alt><rdf:li xml:lang='x-default'> GIMP </rdf:li></rdf:Alt>").encode(),
+        )
+
+        assert scan(data).xmp_field("CreatorTool") == "GIMP"
+
+    def test_decompression_is_bounded(self) -> None:
+        bomb = b"workflow\x00\x00" + zlib.compress(b"A" * 50_000_000, 9)
+        data = _encode("PNG")
+        found = scan(data[:33] + _png_chunk(b"zTXt", bomb) + data[33:])
+
+        assert len(found.text["workflow"]) <= 16 * 1024
+
+
+class TestExtractMetadata:
+    """extract_metadata reports what the scanner found."""
+
+    def test_png_generation_parameters(self) -> None:
+        info = PngImagePlugin.PngInfo()
+        info.add_text("parameters", "a cat, Steps: 20")
+        info.add_text("Software", "NovelAI")
+        meta = extract_metadata(ImageContext(_encode("PNG", pnginfo=info)))
+
+        assert meta.has_exif is False
+        assert meta.generation_parameters == "a cat, Steps: 20"
+        assert meta.software_tag == "NovelAI"
+
+    def test_xmp_generator_fields(self) -> None:
+        data = _jpeg_with_segment(0xE1, b"http://ns.adobe.com/xap/1.0/\x00" + _XMP.encode())
+        meta = extract_metadata(ImageContext(data))
+
+        assert meta.xmp_creator_tool == "Adobe Firefly"
+        assert meta.digital_source_type.endswith("/trainedAlgorithmicMedia")
+
+    def test_png_pixels_not_decoded(self) -> None:
+        ctx = ImageContext(_encode("PNG", size=(512, 512), exif=_exif(_CAMERA_EXIF)))
+        original = ImageFile.ImageFile.load
+        with patch.object(ImageFile.ImageFile, "load", autospec=True, side_effect=original) as load:
+            meta = extract_metadata(ctx)
+
+        assert meta.camera_make_model == "Canon EOS R5"
+        assert load.call_count == 0
+
+    def test_other_formats_fall_back_to_pillow(self) -> None:
+        meta = extract_metadata(ImageContext(_encode("GIF")))
+        assert (meta.format, meta.has_exif) == ("GIF", False)
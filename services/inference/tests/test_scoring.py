@@ -83,6 +83,15 @@ class TestComputeConfidence:
         meta = _meta()
         assert compute_confidence(85, meta, prov) == "high"
 
+    def test_c2pa_valid_ai_without_score_returns_high(self) -> None:
+        prov = _prov(present=True, valid=True, notes=["generated by AI model"])
+        assert compute_confidence(None, _meta(), prov) == "high"
+        assert compute_confidence(None, _meta(width=100, height=100), prov) == "low"
+
+    def test_c2pa_note_without_ai_word_is_not_high(self) -> None:
+        prov = _prov(present=True, valid=True, notes=["Signer trust chain not checked."])
+        assert compute_confidence(85, _meta(), prov) == "medium"
+
     def test_moderate_score_returns_medium(self) -> None:
         meta = _meta(has_exif=True)
         assert compute_confidence(75, meta, _prov()) == "medium"
@@ -164,3 +173,21 @@ class TestBuildReport:
     def test_evidence_no_score(self) -> None:
         report = build_report("job-5", None, _meta(), _prov())
         assert any("did not return" in e for e in report.evidence)
+
+    def test_skipped_detector_recorded(self) -> None:
+        prov = _prov(present=True, valid=True, notes=["Manifest declares AI-generated content."])
+        report = build_report(
+            "job-6", None, _meta(), prov,
+            skipped_stages={"detector": "credentials already decide it"},
+        )
+        assert report.confidence == "high"
+        assert "content credentials" in report.verdict_text
+        assert "AI detection model was not run: credentials already decide it." in report.evidence
+        assert any("not run" in lim for lim in report.limitations)
+        assert not any("unavailable" in lim for lim in report.limitations)
+
+    def test_model_version_only_with_score(self) -> None:
+        scored = build_report("job-7", 42, _meta(), _prov(), model_version="org/model@v1+torch")
+        unscored = build_report("job-8", None, _meta(), _prov(), model_version="org/model@v1+torch")
+        assert scored.model_version == "org/model@v1+torch"
+        assert unscored.model_version is None